@@ -6,6 +6,7 @@ import concurrent.futures
 import datetime
 import base64
 import functools
+import hmac
 import html
 import json
 import os
@@ -17,12 +18,22 @@ import zlib
 
 import jinja2
 import loky
-from tornado.web import Application, RequestHandler, StaticFileHandler
+from tornado.web import Application, RequestHandler, StaticFileHandler, stream_request_body
+import tornado.iostream
 import tornado.log
 
+from . import bulk
+from . import jobs
 from . import markdown_tools
 from . import model_generator
-from .report_generator import ReportGenerator
+from . import report_api
+from .emulator import Emulator
+from .jobs import Job, JobProgress, JobStore, JobStoreFull
+from ...monte_carlo import sample_export
+from ...monte_carlo.sample_bank import SampleBank
+from .report_cache import ReportCache
+from .report_generator import Deferred, ReportGenerator
+from .single_flight import SingleFlight
 from .user import AuthenticatedUser, AnonymousUser
 
 
@@ -91,7 +102,154 @@ class Missing404Handler(BaseRequestHandler):
         ))
 
 
-class ConcentrationModel(BaseRequestHandler):
+class _ReportHandler(BaseRequestHandler):
+    async def build_report(
+            self,
+            form: model_generator.FormData,
+            progress: typing.Optional[JobProgress] = None,
+    ) -> str:
+        """
+        Build the report of the given form in a report worker. Concurrent
+        requests for the same report wait for a single computation (whose
+        progress is reported to the ``progress`` of the first one).
+
+        """
+        base_url = self.request.protocol + "://" + self.request.host
+        report_generator: ReportGenerator = self.settings['report_generator']
+
+        async def compute() -> str:
+            executor = loky.get_reusable_executor(
+                max_workers=self.settings['handler_worker_pool_size'],
+                timeout=300,
+            )
+            kwargs = {} if progress is None else {'progress': progress}
+            report_task = executor.submit(
+                report_generator.build_report, base_url, form,
+                executor_factory=functools.partial(
+                    concurrent.futures.ThreadPoolExecutor,
+                    self.settings['report_generation_parallelism'],
+                ),
+                **kwargs,
+            )
+            return await asyncio.wrap_future(report_task)
+
+        coalescer: SingleFlight = self.settings['report_coalescer']
+        return await coalescer.run((report_generator.cache_key(form), base_url), compute)
+
+
+    async def stream_report(self, form: model_generator.FormData) -> None:
+        """
+        Respond with the report of the given form, sending its main results
+        before its alternative scenarios are computed. Like
+        :meth:`build_report`, the context of the report is taken from (and
+        kept in) the report cache, and concurrent identical requests wait
+        for a single computation.
+
+        """
+        base_url = self.request.protocol + "://" + self.request.host
+        report_generator: ReportGenerator = self.settings['report_generator']
+        report = report_generator.cached_report(base_url, form)
+        if report is not None:
+            self.finish(report)
+            return
+
+        context = report_generator.cached_context(base_url, form)
+        scenarios: typing.Optional[concurrent.futures.Future] = None
+        if context is None:
+            context, scenarios = await self.streamed_context(base_url, form)
+            context['alternative_scenarios'] = Deferred(scenarios)
+
+        # Render in a thread, sending the chunks as they come.
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def write(chunk: str) -> None:
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        rendering = loop.run_in_executor(None, functools.partial(report_generator.stream, context, write))
+        rendering.add_done_callback(lambda _: chunks.put_nowait(None))
+        sent = []
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            sent.append(chunk)
+            self.write(chunk)
+            await self.flush()
+        try:
+            await rendering
+        except Exception:
+            if not sent:
+                raise
+            # The response has already started, so the error is reported
+            # at the end of what has been sent.
+            error_id = uuid.uuid4()
+            tornado.log.app_log.exception(f"Error {error_id} while streaming a report")
+            self.finish(
+                f'<p><strong>Unfortunately an error occurred when generating the rest of this '
+                f'report.</strong> Please let us know about this issue at '
+                f'<a href="mailto:CARA-dev@cern.ch">CARA-dev@cern.ch</a>, reporting the error '
+                f'id of "{error_id}".</p>'
+            )
+            return
+        if scenarios is not None:
+            report_generator.cache_context(form, dict(context, alternative_scenarios=scenarios.result()))
+        report_generator.cache_report(base_url, form, ''.join(sent))
+        self.finish()
+
+    async def streamed_context(
+            self,
+            base_url: str,
+            form: model_generator.FormData,
+    ) -> typing.Tuple[dict, concurrent.futures.Future]:
+        """
+        The main context of the report of the given form, and the (future)
+        alternative scenarios of its context, each computed once for the
+        concurrent identical requests.
+
+        """
+        report_generator: ReportGenerator = self.settings['report_generator']
+        coalescer: SingleFlight = self.settings['report_coalescer']
+        key = (report_generator.cache_key(form), base_url)
+        executor = loky.get_reusable_executor(
+            max_workers=self.settings['handler_worker_pool_size'],
+            timeout=300,
+        )
+
+        async def main_context() -> typing.Tuple[dict, dict]:
+            return await asyncio.wrap_future(
+                executor.submit(report_generator.streamed_context, base_url, form),
+            )
+
+        context, scenario_arguments = await coalescer.run(key + ('main_context',), main_context)
+
+        async def alternative_scenarios() -> dict:
+            return await asyncio.wrap_future(executor.submit(
+                report_generator.alternative_scenarios, form,
+                executor_factory=functools.partial(
+                    concurrent.futures.ThreadPoolExecutor,
+                    self.settings['report_generation_parallelism'],
+                ),
+                **scenario_arguments,
+            ))
+
+        # The rendering thread waits for the alternative scenarios.
+        scenarios = asyncio.run_coroutine_threadsafe(
+            coalescer.run(key + ('alternative_scenarios',), alternative_scenarios),
+            asyncio.get_running_loop(),
+        )
+        # The (shared) main context is copied for each of the requests.
+        return dict(context), scenarios
+
+    async def respond_with_report(self, form: model_generator.FormData) -> None:
+        if self.settings.get('stream_reports'):
+            await self.stream_report(form)
+        else:
+            report: str = await self.build_report(form)
+            self.finish(report)
+
+
+class ConcentrationModel(_ReportHandler):
     async def post(self):
         requested_model_config = {
             name: self.get_argument(name) for name in self.request.arguments
@@ -112,38 +270,364 @@ class ConcentrationModel(BaseRequestHandler):
             self.finish(json.dumps(response_json))
             return
 
-        base_url = self.request.protocol + "://" + self.request.host
-        report_generator: ReportGenerator = self.settings['report_generator']
+        await self.respond_with_report(form)
+
+
+class _ApiHandler(BaseRequestHandler):
+    def check_xsrf_cookie(self):
+        # Scripts may authenticate with one of the configured API tokens
+        # (sent as "Authorization: Bearer <token>") instead of sending the
+        # XSRF cookie of the calculator form (and its "X-XSRFToken" header).
+        if not self.has_api_token():
+            super().check_xsrf_cookie()
+
+    def has_api_token(self) -> bool:
+        scheme, _, token = self.request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            return False
+        return any(
+            hmac.compare_digest(token.encode(), api_token.encode())
+            for api_token in self.settings['api_tokens']
+        )
+
+    def form_arguments(self) -> typing.Tuple[dict, dict]:
+        """
+        The fields of the posted form (urlencoded, or as a JSON object), and
+        the :data:`report_api.SELECTORS` of the request.
+
+        """
+        if self.request.headers.get('Content-Type', '').startswith('application/json'):
+            arguments = json.loads(self.request.body or b'{}')
+        else:
+            arguments = {name: self.get_argument(name) for name in self.request.arguments}
+        selectors = {name: arguments.pop(name, None) for name in report_api.SELECTORS}
+        return arguments, selectors
+
+
+class ReportData(_ApiHandler):
+    async def post(self):
+        """
+        The statistics of the report of the posted form as JSON or
+        MessagePack, without rendering the report (see
+        :mod:`cara.apps.calculator.report_api`).
+
+        """
+        arguments, selectors = self.form_arguments()
+        try:
+            data_format = report_api.negotiate_format(
+                selectors['format'], self.request.headers.get('Accept', ''),
+            )
+            form = model_generator.FormData.from_dict(arguments)
+        except Exception as err:
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            self.finish(json.dumps(response_json))
+            return
+
         executor = loky.get_reusable_executor(
             max_workers=self.settings['handler_worker_pool_size'],
             timeout=300,
         )
-        report_task = executor.submit(
-            report_generator.build_report, base_url, form,
+        data_task = executor.submit(
+            report_api.encoded_report_data, self.settings['report_generator'], form,
             executor_factory=functools.partial(
                 concurrent.futures.ThreadPoolExecutor,
                 self.settings['report_generation_parallelism'],
             ),
+            format=data_format,
+            statistics=report_api.parse_selection(selectors['statistics']),
+            scenarios=report_api.parse_selection(selectors['scenarios']),
         )
-        report: str = await asyncio.wrap_future(report_task)
-        self.finish(report)
+        try:
+            data: bytes = await asyncio.wrap_future(data_task)
+        except ValueError as err:
+            # An unknown statistic or scenario.
+            self.set_status(400)
+            self.finish(json.dumps({'code': 400, 'error': html.escape(str(err))}))
+            return
+        self.set_header('Content-Type', report_api.MEDIA_TYPES[data_format])
+        self.finish(data)
 
 
-class StaticModel(BaseRequestHandler):
-    async def get(self):
-        form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
-        base_url = self.request.protocol + "://" + self.request.host
-        report_generator: ReportGenerator = self.settings['report_generator']
-        executor = loky.get_reusable_executor(max_workers=self.settings['handler_worker_pool_size'])
-        report_task = executor.submit(
-            report_generator.build_report, base_url, form,
+class SampleData(_ApiHandler):
+    async def post(self):
+        """
+        The per-sample values of the base scenario of the posted form and of
+        its alternative ``scenarios`` (all of them by default), as an Arrow
+        IPC stream (see :mod:`cara.monte_carlo.sample_export`).
+
+        """
+        if not sample_export.available():
+            self.set_status(501)
+            self.finish(json.dumps({'code': 501, 'error': 'The export of the samples is not available'}))
+            return
+        arguments, selectors = self.form_arguments()
+        try:
+            form = model_generator.FormData.from_dict(arguments)
+        except Exception as err:
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            self.finish(json.dumps(response_json))
+            return
+
+        executor = loky.get_reusable_executor(
+            max_workers=self.settings['handler_worker_pool_size'],
+            timeout=300,
+        )
+        samples_task = executor.submit(
+            report_api.sample_stream, self.settings['report_generator'], form,
+            scenarios=report_api.parse_selection(selectors['scenarios']),
+        )
+        try:
+            samples: bytes = await asyncio.wrap_future(samples_task)
+        except ValueError as err:
+            # An unknown scenario.
+            self.set_status(400)
+            self.finish(json.dumps({'code': 400, 'error': html.escape(str(err))}))
+            return
+        self.set_header('Content-Type', 'application/vnd.apache.arrow.stream')
+        self.finish(samples)
+
+
+class ReportWorkbook(_ApiHandler):
+    async def post(self):
+        """The report of the posted form as an XLSX workbook."""
+        arguments, _ = self.form_arguments()
+        try:
+            form = model_generator.FormData.from_dict(arguments)
+        except Exception as err:
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            self.finish(json.dumps(response_json))
+            return
+
+        executor = loky.get_reusable_executor(
+            max_workers=self.settings['handler_worker_pool_size'],
+            timeout=300,
+        )
+        workbook_task = executor.submit(
+            report_api.report_workbook, self.settings['report_generator'],
+            self.request.protocol + "://" + self.request.host, form,
             executor_factory=functools.partial(
                 concurrent.futures.ThreadPoolExecutor,
                 self.settings['report_generation_parallelism'],
             ),
         )
-        report: str = await asyncio.wrap_future(report_task)
-        self.finish(report)
+        workbook: bytes = await asyncio.wrap_future(workbook_task)
+        self.set_header('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.set_header('Content-Disposition', 'attachment; filename="cara-report.xlsx"')
+        self.finish(workbook)
+
+
+@stream_request_body
+class BatchReport(_ApiHandler):
+    async def prepare(self):
+        """
+        Start evaluating the posted NDJSON forms as they are received (see
+        :mod:`cara.apps.calculator.bulk`). The ``statistics`` and
+        ``scenarios`` query arguments select the report data of each row.
+
+        """
+        await super().prepare()
+        self._lines = bulk.LineSplitter()
+        self._next_row = 0
+        self._pending: typing.Set[asyncio.Future] = set()
+        # Reading of the request waits while too many rows are in flight.
+        self._in_flight = asyncio.Semaphore(self.settings['batch_max_in_flight'])
+        self._selection = {
+            name: report_api.parse_selection(self.get_query_argument(name, None))
+            for name in ['statistics', 'scenarios']
+        }
+        self._executor = loky.get_reusable_executor(
+            max_workers=self.settings['handler_worker_pool_size'],
+            timeout=300,
+        )
+        self.set_header('Content-Type', 'application/x-ndjson')
+
+    async def data_received(self, chunk: bytes):
+        for line in self._lines.feed(chunk):
+            await self._submit(line)
+
+    async def _submit(self, line: bytes) -> None:
+        row = self._next_row
+        self._next_row += 1
+        try:
+            form = bulk.parse_row(line)
+        except Exception as err:
+            await self._send(bulk.error_line(row, err))
+            return
+
+        await self._in_flight.acquire()
+        row_task = self._executor.submit(
+            bulk.evaluate_row, self.settings['report_generator'], row, form,
+            executor_factory=functools.partial(
+                concurrent.futures.ThreadPoolExecutor,
+                self.settings['report_generation_parallelism'],
+            ),
+            **self._selection,
+        )
+        pending = asyncio.ensure_future(self._respond(row, row_task))
+        self._pending.add(pending)
+        pending.add_done_callback(self._pending.discard)
+
+    async def _respond(self, row: int, row_task: concurrent.futures.Future) -> None:
+        try:
+            line = await asyncio.wrap_future(row_task)
+        except Exception as err:
+            # E.g. the worker died.
+            line = bulk.error_line(row, err)
+        finally:
+            self._in_flight.release()
+        await self._send(line)
+
+    async def _send(self, line: bytes) -> None:
+        try:
+            self.write(line)
+            await self.flush()
+        except tornado.iostream.StreamClosedError:
+            # The client has gone, the remaining rows are still computed.
+            pass
+
+    async def post(self):
+        for line in self._lines.close():
+            await self._submit(line)
+        await asyncio.gather(*self._pending)
+        self.finish()
+
+
+class ReportJobs(_ReportHandler):
+    async def post(self):
+        """
+        Submit a report job for the posted form, returning its id and URLs
+        immediately (see :mod:`cara.apps.calculator.jobs`).
+
+        """
+        requested_model_config = {
+            name: self.get_argument(name) for name in self.request.arguments
+        }
+        try:
+            form = model_generator.FormData.from_dict(requested_model_config)
+        except Exception as err:
+            response_json = {'code': 400, 'error': f'Your request was invalid {html.escape(str(err))}'}
+            self.set_status(400)
+            self.finish(json.dumps(response_json))
+            return
+
+        report_generator: ReportGenerator = self.settings['report_generator']
+        base_url = self.request.protocol + "://" + self.request.host
+        job_store: JobStore = self.settings['job_store']
+        try:
+            job = job_store.submit(
+                (report_generator.cache_key(form), base_url),
+                functools.partial(self.build_report, form),
+            )
+        except JobStoreFull as err:
+            self.set_status(503)
+            self.finish(json.dumps({'code': 503, 'error': str(err)}))
+            return
+
+        job_url = f'{self.settings["calculator_prefix"]}/jobs/{job.id}'
+        self.set_status(202)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps({
+            **job.to_dict(),
+            'status_url': job_url,
+            'events_url': f'{job_url}/events',
+            'result_url': f'{job_url}/result',
+        }))
+
+
+class _JobHandler(BaseRequestHandler):
+    def job(self, job_id: str) -> typing.Optional[Job]:
+        """The requested job, or None (having responded 404) if it is unknown."""
+        job = self.settings['job_store'].get(job_id)
+        if job is None:
+            self.set_status(404)
+            self.finish(json.dumps({'code': 404, 'error': 'Unknown (or expired) job'}))
+        return job
+
+
+class ReportJobStatus(_JobHandler):
+    def get(self, job_id: str):
+        job = self.job(job_id)
+        if job is not None:
+            self.set_header('Content-Type', 'application/json')
+            self.finish(json.dumps(job.to_dict()))
+
+
+class ReportJobEvents(_JobHandler):
+    async def get(self, job_id: str):
+        """The status of the job as Server-Sent Events, until it finishes."""
+        job = self.job(job_id)
+        if job is None:
+            return
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+        try:
+            async for job in job.changes():
+                self.write(f'event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n')
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            return
+        self.finish()
+
+
+class ReportJobResult(_JobHandler):
+    def get(self, job_id: str):
+        job = self.job(job_id)
+        if job is None:
+            return
+        if job.status == jobs.DONE:
+            self.finish(job.result)
+        elif job.status == jobs.FAILED:
+            self.set_status(500)
+            self.finish(json.dumps({'code': 500, 'error': job.error}))
+        else:
+            self.set_status(202)
+            self.set_header('Content-Type', 'application/json')
+            self.finish(json.dumps(job.to_dict()))
+
+
+class RiskPreview(BaseRequestHandler):
+    async def post(self):
+        """
+        An instant estimate of the risk of the posted form, interpolated by
+        the emulator (if one has been configured).
+
+        """
+        emulator: typing.Optional[Emulator] = self.settings.get('emulator')
+        if emulator is None:
+            self.set_status(404)
+            self.finish(json.dumps({'code': 404, 'error': 'No preview is available'}))
+            return
+
+        requested_model_config = {
+            name: self.get_argument(name) for name in self.request.arguments
+        }
+        try:
+            form = model_generator.FormData.from_dict(requested_model_config)
+            preview = emulator.preview(form)
+        except Exception as err:
+            response_json = {'code': 400, 'error': f'No preview is available: {html.escape(str(err))}'}
+            self.set_status(400)
+            self.finish(json.dumps(response_json))
+            return
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps(preview))
+
+
+class StaticModel(_ReportHandler):
+    async def get(self):
+        form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
+        await self.respond_with_report(form)
+
+
+class ReportMetrics(BaseRequestHandler):
+    def get(self):
+        """The counters of the coalescing of the report requests."""
+        coalescer: SingleFlight = self.settings['report_coalescer']
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps({'report_requests': coalescer.metrics()}))
 
 
 class LandingPage(BaseRequestHandler):
@@ -222,7 +706,17 @@ def make_app(
         (r'/static/(.*)', StaticFileHandler, {'path': static_dir}),
         (calculator_prefix + r'/?', CalculatorForm),
         (calculator_prefix + r'/report', ConcentrationModel),
+        (calculator_prefix + r'/api/report', ReportData),
+        (calculator_prefix + r'/api/report.xlsx', ReportWorkbook),
+        (calculator_prefix + r'/api/batch', BatchReport),
+        (calculator_prefix + r'/api/samples', SampleData),
+        (calculator_prefix + r'/preview', RiskPreview),
         (calculator_prefix + r'/baseline-model/result', StaticModel),
+        (calculator_prefix + r'/metrics', ReportMetrics),
+        (calculator_prefix + r'/jobs', ReportJobs),
+        (calculator_prefix + r'/jobs/([0-9a-f]+)', ReportJobStatus),
+        (calculator_prefix + r'/jobs/([0-9a-f]+)/events', ReportJobEvents),
+        (calculator_prefix + r'/jobs/([0-9a-f]+)/result', ReportJobResult),
         (calculator_prefix + r'/user-guide', ReadmeHandler),
         (calculator_prefix + r'/static/(.*)', StaticFileHandler, {'path': calculator_static_dir}),
     ]
@@ -245,14 +739,68 @@ def make_app(
     if debug:
         tornado.log.enable_pretty_logging()
 
+    # Serve the standard distributions from pre-generated sample banks, if a
+    # directory for them has been configured. The missing banks are
+    # generated in the background, so as not to delay the start of the
+    # server (until then, the report workers generate those they need).
+    sample_bank = None
+    if os.environ.get('CARA_SAMPLE_BANK_DIR'):
+        sample_bank = SampleBank(
+            os.environ['CARA_SAMPLE_BANK_DIR'],
+            bank_size=int(float(os.environ.get('CARA_SAMPLE_BANK_SIZE', 1000000))),
+        )
+        sample_bank.generate_in_background()
+
+    # The cache of the computed reports: in memory (per report worker) and,
+    # if a directory has been configured, on disk (shared by the workers).
+    report_cache = ReportCache(
+        Path(os.environ['CARA_REPORT_CACHE_DIR']) / 'reports.sqlite'
+        if os.environ.get('CARA_REPORT_CACHE_DIR') else None,
+        ttl=float(os.environ.get('CARA_REPORT_CACHE_TTL', 7 * 24 * 3600)),
+        max_disk_bytes=int(float(os.environ.get('CARA_REPORT_CACHE_MAX_MB', 1024)) * 2 ** 20),
+    )
+
+    # The emulator of the instant risk previews, built offline (see
+    # cara.apps.calculator.emulator).
+    emulator = None
+    if os.environ.get('CARA_EMULATOR_PATH'):
+        emulator = Emulator.load(os.environ['CARA_EMULATOR_PATH'])
+
     return Application(
         urls,
         debug=debug,
         calculator_prefix=calculator_prefix,
         template_environment=template_environment,
         default_handler_class=Missing404Handler,
-        report_generator=ReportGenerator(loader, calculator_prefix),
+        report_generator=ReportGenerator(
+            loader, calculator_prefix, sample_bank=sample_bank, report_cache=report_cache,
+            # Estimate the upper tail of the probability of infection from
+            # importance sampled models.
+            tail_sampling=bool(os.environ.get('CARA_TAIL_SAMPLING')),
+            # Bootstrap the confidence intervals of the headline figures,
+            # rather than computing them from the batch means.
+            bootstrap_intervals=bool(os.environ.get('CARA_BOOTSTRAP_INTERVALS')),
+            # The number of built sub-models and samples which each report
+            # worker keeps, for the forms which are edited and resubmitted
+            # (off by default): a size of 32 takes up to about 15 MB per worker.
+            build_cache_size=int(os.environ.get('CARA_BUILD_CACHE_SIZE', 0)),
+        ),
+        emulator=emulator,
+        report_coalescer=SingleFlight(),
+        # Send the main results of the reports before their alternative
+        # scenarios are computed.
+        stream_reports=bool(os.environ.get('CARA_STREAM_REPORTS')),
+        # The maximum number of the rows of a batch which are evaluated (or
+        # waiting for a report worker) at once.
+        batch_max_in_flight=int(os.environ.get('CARA_BATCH_MAX_IN_FLIGHT', 16)),
+        job_store=JobStore(
+            max_jobs=int(os.environ.get('CARA_MAX_REPORT_JOBS', 100)),
+            ttl=float(os.environ.get('CARA_REPORT_JOB_TTL', 3600)),
+        ),
         xsrf_cookies=True,
+        # The (comma separated) tokens with which scripts may use the API
+        # without an XSRF cookie.
+        api_tokens=frozenset(filter(None, os.environ.get('CARA_API_TOKENS', '').split(','))),
         # COOKIE_SECRET being undefined will result in no login information being
         # presented to the user.
         cookie_secret=os.environ.get('COOKIE_SECRET', '<undefined>'),
@@ -38,7 +38,10 @@ def main():
         assert theme_dir.exists()
     app = make_app(debug=args.no_debug, calculator_prefix=args.prefix, theme_dir=theme_dir)
     app.listen(args.port)
-    IOLoop.instance().start()
+    try:
+        IOLoop.instance().start()
+    finally:
+        app.settings['job_store'].close()
 
 
 if __name__ == '__main__':
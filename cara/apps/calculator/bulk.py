@@ -0,0 +1,87 @@
+"""
+The evaluation of many forms (e.g. all of the rooms of a building) in a
+single request.
+
+The forms are posted as NDJSON (one JSON object of form fields per line),
+and the result (or the error) of each of them is sent back as an NDJSON
+line as soon as it is computed, in the order in which they finish::
+
+    {"row": 0, "result": {"statistics": {...}, "alternative_scenarios": {...}}}
+    {"row": 1, "error": "..."}
+
+The rows are numbered from 0, ignoring the blank lines. The results are
+those of the report data API (see :mod:`cara.apps.calculator.report_api`).
+
+"""
+import concurrent.futures
+import json
+import typing
+
+from . import report_api
+from .model_generator import FormData
+from .report_generator import ReportGenerator
+
+
+class LineSplitter:
+    """Splits a stream of chunks into its (non-blank) lines."""
+    def __init__(self, max_line_bytes: int = 1 << 20):
+        #: The maximum length of a line, which bounds the memory held for
+        #: an incomplete line.
+        self.max_line_bytes = max_line_bytes
+        self._partial = b''
+
+    def feed(self, chunk: bytes) -> typing.List[bytes]:
+        """The lines completed by the given chunk."""
+        *lines, self._partial = (self._partial + chunk).split(b'\n')
+        if len(self._partial) > self.max_line_bytes:
+            raise ValueError(f"A line is longer than {self.max_line_bytes} bytes")
+        return [line for line in lines if line.strip()]
+
+    def close(self) -> typing.List[bytes]:
+        """The last line, if it wasn't terminated."""
+        line, self._partial = self._partial, b''
+        return [line] if line.strip() else []
+
+
+def parse_row(line: bytes) -> FormData:
+    """The (validated) form of a line of the request."""
+    form_data = json.loads(line)
+    if not isinstance(form_data, dict):
+        raise ValueError("Each line must be a JSON object of the fields of a form")
+    return FormData.from_dict(form_data)
+
+
+def result_line(row: int, result: typing.Any) -> bytes:
+    return json.dumps(
+        {'row': row, 'result': report_api.to_wire(result, binary=False)},
+        separators=(',', ':'),
+    ).encode() + b'\n'
+
+
+def error_line(row: int, error: Exception) -> bytes:
+    message = str(error) or type(error).__name__
+    return json.dumps({'row': row, 'error': message}, separators=(',', ':')).encode() + b'\n'
+
+
+def evaluate_row(
+        report_generator: ReportGenerator,
+        row: int,
+        form: FormData,
+        executor_factory: typing.Callable[[], concurrent.futures.Executor],
+        statistics: typing.Optional[typing.Collection[str]] = None,
+        scenarios: typing.Optional[typing.Collection[str]] = None,
+) -> bytes:
+    """
+    The response line of the given row, computed (and encoded) in a report
+    worker. The samples (of the sample bank of the report generator, if
+    any) and the weather lookups are shared by all of the rows evaluated
+    by the worker.
+
+    """
+    try:
+        result = report_generator.report_data(
+            form, executor_factory, statistics=statistics, scenarios=scenarios,
+        )
+    except Exception as err:
+        return error_line(row, err)
+    return result_line(row, result)
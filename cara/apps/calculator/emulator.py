@@ -0,0 +1,297 @@
+"""
+A precomputed surrogate of the calculator, for instant risk previews.
+
+The emulator is a table of the statistics of the probability of infection
+computed by the full Monte Carlo model (see :mod:`.sweep`) over a grid of
+the main continuous drivers of the risk: the room volume, the effective
+air exchange rate (including infiltration, filtration and UV) and the
+exposure duration. A separate table is computed for each of the
+"scenarios" (the activities, expirations, masks, virus, ...) which it
+covers. At request time the risk is interpolated multilinearly (in the
+logarithm of the volume and of the air exchange rate), and reported with
+the interpolation error measured when the table was built.
+
+The tables are computed for a continuous presence of the occupants,
+without breaks: the exposure duration of a form with breaks is the total
+time its exposed occupants are present.
+
+"""
+import dataclasses
+import itertools
+import json
+import typing
+
+import numpy as np
+
+from cara import models
+from .model_generator import FormData, minutes_since_midnight
+from .sweep import sweep
+
+
+#: The form fields, other than the drivers, which define a scenario.
+SCENARIO_FIELDS = (
+    'role_type',
+    'role_type2',
+    'mask_wearing_option',
+    'mask_type',
+    'mask_wearing_option2',
+    'mask_type2',
+    'virus_type',
+    'infected_people',
+    'room_heating_option',
+)
+
+#: The names of the driver axes, in the order of the axes of the tables.
+DRIVERS = ('volume', 'air_exchange', 'duration')
+
+# The infiltration (h^-1) which the form always adds to the ventilation.
+_INFILTRATION = 0.25
+
+# The start of the presence of the occupants in the emulated forms.
+_START = 9 * 60
+
+ScenarioKey = typing.Tuple[str, ...]
+
+
+def scenario_key(form: FormData) -> ScenarioKey:
+    """The scenario of the given form, as a tuple of :data:`SCENARIO_FIELDS`."""
+    return tuple(str(getattr(form, name)) for name in SCENARIO_FIELDS)
+
+
+def drivers(form: FormData) -> typing.Tuple[float, float, float]:
+    """
+    The room volume (m³), mean effective air exchange rate (h^-1) while the
+    exposed occupants are present, and exposure duration (h), of the given
+    form.
+
+    """
+    if form.volume_type == 'room_volume_explicit':
+        volume = form.room_volume
+    else:
+        volume = form.floor_area * form.ceiling_height
+    room = models.Room(volume=volume, humidity=0.3 if form.room_heating_option else 0.5)
+
+    presence = form.exposed_present_interval().boundaries()
+    duration = sum(stop - start for start, stop in presence)
+    times = np.concatenate([
+        np.linspace(start, stop, 20, endpoint=False) for start, stop in presence
+    ])
+    ventilation = form.ventilation()
+    air_exchange = np.mean([np.mean(ventilation.air_exchange(room, time)) for time in times])
+    return float(volume), float(air_exchange), float(duration)
+
+
+def _emulated_form(form: FormData, max_duration: float) -> FormData:
+    # A form with a continuous presence and a mechanical ventilation whose
+    # air exchange rate can be swept.
+    return dataclasses.replace(
+        form,
+        volume_type='room_volume_explicit',
+        ventilation_type='mechanical_ventilation',
+        mechanical_ventilation_type='mech_type_air_changes',
+        uv_device='not-applicable',
+        hepa_option=False,
+        exposed_lunch_option=False,
+        exposed_coffee_break_option='coffee_break_0',
+        infected_dont_have_breaks_with_exposed=False,
+        exposed_start=minutes_since_midnight(_START),
+        infected_start=minutes_since_midnight(_START),
+        infected_finish=minutes_since_midnight(_START + int(np.ceil(max_duration * 60))),
+    )
+
+
+def _interpolate(axes: typing.Sequence[np.ndarray], table: np.ndarray, point: typing.Sequence[float]):
+    # Multilinear interpolation of the table (whose last axes are those of
+    # ``axes``) at the given point.
+    indices, fractions = [], []
+    for axis, x in zip(axes, point):
+        index = min(max(int(np.searchsorted(axis, x, side='right')) - 1, 0), len(axis) - 2)
+        indices.append(index)
+        fractions.append((x - axis[index]) / (axis[index + 1] - axis[index]))
+    value: typing.Union[float, np.ndarray] = 0.
+    for corner in itertools.product((0, 1), repeat=len(axes)):
+        weight = 1.
+        for offset, fraction in zip(corner, fractions):
+            weight *= fraction if offset else 1 - fraction
+        value = value + weight * table[(...,) + tuple(i + c for i, c in zip(indices, corner))]
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class Emulator:
+    #: The grid of each of the drivers.
+    volumes: np.ndarray
+    air_exchanges: np.ndarray
+    durations: np.ndarray
+
+    #: The scenarios covered by the emulator.
+    scenarios: typing.Tuple[ScenarioKey, ...]
+
+    #: The statistics of the probability of infection (in %), each with
+    #: shape ``(n_scenarios, n_volumes, n_air_exchanges, n_durations)``.
+    tables: typing.Dict[str, np.ndarray]
+
+    #: The largest interpolation error (in %) of the mean probability of
+    #: infection of each scenario, measured off the grid: at the centres of
+    #: the cells and at random points.
+    error_bound: np.ndarray
+
+    @classmethod
+    def build(
+            cls,
+            form: FormData,
+            volumes: typing.Sequence[float],
+            air_exchanges: typing.Sequence[float],
+            durations: typing.Sequence[float],
+            scenarios: typing.Sequence[typing.Mapping[str, typing.Any]] = ({},),
+            sample_size: int = 50000,
+            n_random_points: int = 3,
+            seed: int = 0,
+    ) -> "Emulator":
+        """
+        Build the emulator from the full model. Each of the ``scenarios``
+        gives the values of (some of) the :data:`SCENARIO_FIELDS` to replace
+        in ``form``. Each of the grids needs at least two values, and the
+        air exchange rates can't be smaller than the infiltration of 0.25
+        h^-1 included in any form.
+
+        The interpolation error is measured on a grid of the centres of the
+        cells and of ``n_random_points`` random values of each driver
+        (drawn with the given ``seed``), none of which are nodes of the
+        tables.
+
+        """
+        grids = [np.asarray(grid, dtype=float) for grid in (volumes, air_exchanges, durations)]
+        for name, grid in zip(DRIVERS, grids):
+            if len(grid) < 2 or np.any(np.diff(grid) <= 0):
+                raise ValueError(f"The {name} grid must have at least two increasing values")
+        if grids[1][0] < _INFILTRATION:
+            raise ValueError(f"The air exchange rates must be at least {_INFILTRATION}")
+
+        rng = np.random.default_rng(seed)
+
+        def validation_points(grid, log):
+            # The centres of the cells, and random points, of the grid.
+            if log:
+                centres = np.sqrt(grid[1:] * grid[:-1])
+                points = np.exp(rng.uniform(np.log(grid[0]), np.log(grid[-1]), n_random_points))
+            else:
+                centres = (grid[1:] + grid[:-1]) / 2
+                points = rng.uniform(grid[0], grid[-1], n_random_points)
+            return np.setdiff1d(np.concatenate([centres, points]), grid)
+
+        validation_grids = [
+            validation_points(grid, log) for grid, log in zip(grids, (True, True, False))
+        ]
+        # The durations are swept in whole minutes.
+        validation_grids[2] = np.setdiff1d(np.round(validation_grids[2] * 60) / 60, grids[2])
+
+        keys, tables, error_bound = [], [], []
+        for scenario in scenarios:
+            scenario_form = _emulated_form(dataclasses.replace(form, **scenario), grids[2][-1])
+            keys.append(scenario_key(scenario_form))
+
+            def compute(volume_grid, air_exchange_grid, duration_grid):
+                return sweep(scenario_form, {
+                    'room_volume': volume_grid,
+                    'air_changes': air_exchange_grid - _INFILTRATION,
+                    'exposed_finish': _START + np.round(duration_grid * 60),
+                }, sample_size=sample_size).statistics
+
+            statistics = compute(*grids)
+            tables.append(statistics)
+
+            # Measure the interpolation error off the grid.
+            exact = compute(*validation_grids)['probability_of_infection']
+            table = statistics['probability_of_infection']
+            interpolated = np.array([
+                _interpolate(cls._log_axes(grids), table, cls._log_point(point))
+                for point in itertools.product(*validation_grids)
+            ]).reshape(exact.shape)
+            error_bound.append(np.max(np.abs(interpolated - exact)))
+
+        return cls(
+            volumes=grids[0],
+            air_exchanges=grids[1],
+            durations=grids[2],
+            scenarios=tuple(keys),
+            tables={name: np.stack([table[name] for table in tables]) for name in tables[0]},
+            error_bound=np.array(error_bound),
+        )
+
+    @staticmethod
+    def _log_axes(grids):
+        volumes, air_exchanges, durations = grids
+        return [np.log(volumes), np.log(air_exchanges), durations]
+
+    @staticmethod
+    def _log_point(point):
+        volume, air_exchange, duration = point
+        return [np.log(volume), np.log(air_exchange), duration]
+
+    def evaluate(self, scenario: ScenarioKey, volume: float, air_exchange: float, duration: float) -> dict:
+        """
+        The interpolated statistics of the probability of infection (in %)
+        for the given scenario and drivers, along with the ``error_bound``
+        of the mean.
+
+        """
+        try:
+            index = self.scenarios.index(tuple(scenario))
+        except ValueError:
+            raise ValueError("The scenario is not covered by the emulator") from None
+        point = (volume, air_exchange, duration)
+        grids = (self.volumes, self.air_exchanges, self.durations)
+        for name, value, grid in zip(DRIVERS, point, grids):
+            if not grid[0] <= value <= grid[-1]:
+                raise ValueError(
+                    f"The {name} ({value:g}) is outside the range of the emulator "
+                    f"({grid[0]:g} - {grid[-1]:g})"
+                )
+        axes = self._log_axes(grids)
+        result = {
+            name: float(_interpolate(axes, table[index], self._log_point(point)))
+            for name, table in self.tables.items()
+        }
+        result['error_bound'] = float(self.error_bound[index])
+        return result
+
+    def preview(self, form: FormData) -> dict:
+        """
+        The interpolated statistics of the probability of infection (in %)
+        of the given form, and the corresponding expected number of new
+        cases.
+
+        """
+        result = self.evaluate(scenario_key(form), *drivers(form))
+        exposed = form.total_people - form.infected_people
+        result['expected_new_cases'] = result['probability_of_infection'] * exposed / 100
+        return result
+
+    def save(self, path) -> None:
+        """Save the emulator in a ``.npz`` file."""
+        arrays: typing.Dict[str, typing.Any] = {
+            'volumes': self.volumes,
+            'air_exchanges': self.air_exchanges,
+            'durations': self.durations,
+            'scenarios': np.array([json.dumps(key) for key in self.scenarios]),
+            'error_bound': self.error_bound,
+        }
+        arrays.update({f'table_{name}': table for name, table in self.tables.items()})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path) -> "Emulator":
+        """Load an emulator saved by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                volumes=data['volumes'],
+                air_exchanges=data['air_exchanges'],
+                durations=data['durations'],
+                scenarios=tuple(tuple(json.loads(key)) for key in data['scenarios']),
+                tables={
+                    name[len('table_'):]: data[name]
+                    for name in data.files if name.startswith('table_')
+                },
+                error_bound=data['error_bound'],
+            )
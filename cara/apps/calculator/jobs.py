@@ -0,0 +1,215 @@
+"""
+Asynchronous report jobs.
+
+Rather than holding a request open while a report is built, a client
+submits a job, and then polls its status or subscribes to its progress
+(as Server-Sent Events) before fetching the report. The stages of a job
+are those reported by :meth:`.ReportGenerator.build_report`.
+
+The jobs are held in a bounded in-memory store, in which they expire some
+time after they have finished, and are deduplicated by the hash of their
+form: submitting a form whose report is already being built (or has just
+been built) returns the existing job. A finished job holds its result
+itself, so that it is still served (until it expires) if the report cache
+has since evicted that report.
+
+"""
+import asyncio
+import dataclasses
+import multiprocessing
+import threading
+import time
+import typing
+import uuid
+
+
+#: The statuses of a job.
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobStoreFull(Exception):
+    pass
+
+
+@dataclasses.dataclass
+class Job:
+    #: The identifier of the job.
+    id: str
+
+    #: The key (e.g. the hash of the form) by which jobs are deduplicated.
+    key: typing.Hashable
+
+    #: The time (as given by :func:`time.time`) at which the job was created.
+    created: float
+
+    status: str = PENDING
+
+    #: The completed stages, with the time at which each was completed.
+    stages: typing.List[typing.Tuple[str, float]] = dataclasses.field(default_factory=list)
+
+    #: The result of a job which is done, or the error of a failed one.
+    result: typing.Optional[typing.Any] = None
+    error: typing.Optional[str] = None
+
+    #: The time at which the job finished.
+    finished: typing.Optional[float] = None
+
+    _changed: asyncio.Event = dataclasses.field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> dict:
+        """The JSON serialisable status of the job."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stages': [{'stage': stage, 'time': completed - self.created} for stage, completed in self.stages],
+            'error': self.error,
+        }
+
+    def _notify(self) -> None:
+        # Wake up the current subscribers, and make the new ones wait for
+        # the next change.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def changes(self) -> typing.AsyncIterator["Job"]:
+        """Yield the job now, and then after each of its changes until it finishes."""
+        while True:
+            changed = self._changed
+            yield self
+            if self.is_finished:
+                return
+            await changed.wait()
+
+
+class _ProgressChannel:
+    """
+    Forwards the progress of the jobs running in other processes (e.g. the
+    report workers) to the store, through a queue of a multiprocessing
+    manager. Started when first needed.
+
+    """
+    def __init__(self, store: "JobStore"):
+        self._store = store
+        self._manager = multiprocessing.Manager()
+        self.queue = self._manager.Queue()
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._forward, daemon=True).start()
+
+    def _forward(self) -> None:
+        while True:
+            try:
+                job_id, stage = self.queue.get()
+            except (EOFError, OSError):
+                # The manager has been shut down.
+                return
+            self._loop.call_soon_threadsafe(self._store.record_stage, job_id, stage)
+
+    def close(self) -> None:
+        self._manager.shutdown()
+
+
+class JobProgress:
+    """
+    A (picklable) progress callback of a job, which can be called from any
+    process.
+
+    """
+    def __init__(self, queue, job_id: str):
+        self._queue = queue
+        self._job_id = job_id
+
+    def __call__(self, stage: str) -> None:
+        self._queue.put((self._job_id, stage))
+
+
+class JobStore:
+    def __init__(self, max_jobs: int = 100, ttl: float = 3600.):
+        #: The maximum number of jobs held.
+        self.max_jobs = max_jobs
+
+        #: The time (in seconds) for which a finished job is held.
+        self.ttl = ttl
+
+        self._jobs: typing.Dict[str, Job] = {}
+        self._by_key: typing.Dict[typing.Hashable, Job] = {}
+        self._channel: typing.Optional[_ProgressChannel] = None
+
+    def get(self, job_id: str) -> typing.Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def submit(
+            self,
+            key: typing.Hashable,
+            run: typing.Callable[[JobProgress], typing.Awaitable[typing.Any]],
+    ) -> Job:
+        """
+        Start a job which awaits ``run(progress)``, unless there already is a
+        job (which hasn't failed) with the same key. Raise
+        :class:`JobStoreFull` if the store is full of running jobs.
+
+        """
+        self._expire()
+        job = self._by_key.get(key)
+        if job is not None and job.status != FAILED:
+            return job
+
+        if len(self._jobs) >= self.max_jobs:
+            # Make room by dropping the oldest finished job.
+            finished = [
+                (job.finished, job.id) for job in self._jobs.values() if job.finished is not None
+            ]
+            if not finished:
+                raise JobStoreFull("Too many reports are being built, please try again later")
+            self._remove(self._jobs[min(finished)[1]])
+
+        job = Job(id=uuid.uuid4().hex, key=key, created=time.time())
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        if self._channel is None:
+            self._channel = _ProgressChannel(self)
+        asyncio.ensure_future(self._run(job, run(JobProgress(self._channel.queue, job.id))))
+        return job
+
+    async def _run(self, job: Job, result: typing.Awaitable[typing.Any]) -> None:
+        job.status = RUNNING
+        job._notify()
+        try:
+            job.result = await result
+        except Exception as err:
+            job.status, job.error = FAILED, str(err) or type(err).__name__
+        else:
+            job.status = DONE
+        job.finished = time.time()
+        job._notify()
+
+    def record_stage(self, job_id: str, stage: str) -> None:
+        # The progress of a job may arrive after its result.
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.stages.append((stage, time.time()))
+            job._notify()
+
+    def close(self) -> None:
+        """Stop forwarding the progress of the jobs (e.g. when the app shuts down)."""
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+    def _remove(self, job: Job) -> None:
+        del self._jobs[job.id]
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+    def _expire(self) -> None:
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                self._remove(job)
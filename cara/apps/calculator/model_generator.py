@@ -13,6 +13,8 @@ from cara import models
 from cara import data
 import cara.data.weather
 import cara.monte_carlo as mc
+from cara.monte_carlo.build_cache import BuildCache
+from cara.monte_carlo.sample_bank import SampleBank
 from .. import calculator
 from cara.monte_carlo.data import activity_distributions, activity_distributions2, virus_distributions, mask_distributions, mask_distributions2 
 
@@ -290,8 +292,15 @@ class FormData:
             exposed=self.exposed_population()
         )
 
-    def build_model(self, sample_size=_DEFAULT_MC_SAMPLE_SIZE) -> models.ExposureModel:
-        return self.build_mc_model().build_model(size=sample_size)
+    def build_model(
+            self,
+            sample_size=_DEFAULT_MC_SAMPLE_SIZE,
+            sample_bank: typing.Optional[SampleBank] = None,
+            build_cache: typing.Optional[BuildCache] = None,
+    ) -> models.ExposureModel:
+        if sample_bank is not None:
+            return sample_bank.build_model(self.build_mc_model(), sample_size)
+        return self.build_mc_model().build_model(size=sample_size, cache=build_cache)
 
     def tz_name_and_utc_offset(self) -> typing.Tuple[str, float]:
         """
@@ -993,7 +1002,6 @@ def baseline_raw_form_data():
         'scenario_3': '',
         'simulation_name': 'Test',
         'total_people': '10',
-        'uv_option': False,
         'uv_device': "BR500",
         'uv_number_1': 0,
         'uv_number_2': 0,
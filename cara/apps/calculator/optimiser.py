@@ -0,0 +1,168 @@
+"""
+Search for the design (ventilation, UV units, occupancy, ...) of a
+calculator form which meets a target probability of infection.
+
+The candidate designs of an iteration which have the same structure are
+evaluated in a single model build, stacked along the sample axis (see
+:mod:`cara.monte_carlo.stacking`), and the same samples are used for all of
+the iterations, so that the candidates are compared without sampling noise.
+
+"""
+import dataclasses
+import itertools
+import typing
+
+import numpy as np
+
+from ...monte_carlo import stacking
+from .model_generator import FormData
+
+
+#: The form fields which can be searched.
+CONTROL_VARIABLES = (
+    'air_changes',
+    'air_supply',
+    'uv_number_1',
+    'uv_number_2',
+    'uv_number_3',
+    'uv_number_4',
+    'windows_number',
+    'opening_distance',
+    'total_people',
+)
+
+_INTEGER_VARIABLES = {
+    field.name for field in dataclasses.fields(FormData) if field.type is int
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class OptimisationResult:
+    #: The best design which meets the target, or None if there is none in
+    #: the searched range.
+    design: typing.Optional[typing.Dict[str, float]]
+
+    #: The (mean) probability of infection (in %) of the best design.
+    probability_of_infection: typing.Optional[float]
+
+    #: The form of the best design.
+    form: typing.Optional[FormData]
+
+    #: The number of (stacked) model builds needed by the search.
+    n_builds: int
+
+    #: The number of candidate designs which were evaluated.
+    n_candidates: int
+
+
+def _grid(low: float, high: float, n_points: int, integer: bool) -> np.ndarray:
+    values = np.linspace(low, high, n_points)
+    if integer:
+        values = np.unique(np.round(values))
+    return values
+
+
+def _design_form(form: FormData, design: typing.Mapping[str, float]) -> FormData:
+    # The form with the values of the given design.
+    values: typing.Dict[str, typing.Any] = dict(design)
+    return dataclasses.replace(form, **values)
+
+
+def evaluate_designs(
+        form: FormData,
+        designs: typing.Sequence[typing.Mapping[str, float]],
+        sample_size: int,
+        sample: typing.Optional[stacking.CommonRandomNumbers] = None,
+) -> typing.Tuple[np.ndarray, int]:
+    """
+    The (mean) probability of infection, in %, of each of the given designs
+    (the form values to replace), and the number of model builds needed to
+    evaluate them: one per group of designs with the same structure (see
+    :func:`cara.monte_carlo.stacking.stackable_groups`).
+
+    """
+    sample = sample or stacking.CommonRandomNumbers()
+    mc_models = [_design_form(form, design).build_mc_model() for design in designs]
+    probabilities = np.empty(len(designs))
+    groups = stacking.stackable_groups(mc_models)
+    for group in groups:
+        sample.new_build()
+        model = stacking.build_stacked_model([mc_models[index] for index in group], sample_size, sample)
+        probabilities[group] = stacking.unstack(model.infection_probability(), len(group)).mean(axis=1)
+    return probabilities, len(groups)
+
+
+def optimise(
+        form: FormData,
+        controls: typing.Mapping[str, typing.Tuple[float, float]],
+        target: float,
+        cost: typing.Optional[typing.Mapping[str, float]] = None,
+        n_points: int = 9,
+        max_iterations: int = 6,
+        sample_size: int = 10000,
+) -> OptimisationResult:
+    """
+    Find the cheapest design whose (mean) probability of infection, in %,
+    is at most ``target``.
+
+    ``controls`` gives the range searched for each of the form fields in
+    :data:`CONTROL_VARIABLES`, and ``cost`` the cost per unit of each of
+    them (1 by default; use a negative cost to search for the largest
+    acceptable value, e.g. of the occupancy). The search evaluates a grid of
+    ``n_points`` values per control, then refines the grid around the best
+    design which meets the target.
+
+    """
+    for name in controls:
+        if name not in CONTROL_VARIABLES:
+            raise ValueError(f"{name} is not a valid control variable")
+    cost = {name: 1. for name in controls} if cost is None else cost
+    names = list(controls)
+    bounds = {name: (float(low), float(high)) for name, (low, high) in controls.items()}
+    sample = stacking.CommonRandomNumbers()
+
+    best: typing.Optional[typing.Tuple[typing.Dict[str, float], float]] = None
+    n_builds = n_candidates = 0
+    for _ in range(max_iterations):
+        grids = [
+            _grid(*bounds[name], n_points, name in _INTEGER_VARIABLES) for name in names
+        ]
+        designs = [
+            {name: (int(value) if name in _INTEGER_VARIABLES else float(value))
+             for name, value in zip(names, values)}
+            for values in itertools.product(*grids)
+        ]
+        probabilities, builds = evaluate_designs(form, designs, sample_size, sample)
+        n_builds += builds
+        n_candidates += len(designs)
+
+        feasible = [
+            (sum(cost.get(name, 1.) * design[name] for name in names), index)
+            for index, design in enumerate(designs) if probabilities[index] <= target
+        ]
+        if not feasible:
+            break
+        _, index = min(feasible)
+        best = designs[index], float(probabilities[index])
+
+        # Refine the grid around the best design.
+        converged = True
+        for name, grid in zip(names, grids):
+            step = (grid[-1] - grid[0]) / max(len(grid) - 1, 1)
+            if name in _INTEGER_VARIABLES and step <= 1:
+                bounds[name] = (best[0][name], best[0][name])
+                continue
+            converged = converged and step <= 1e-3 * max(abs(grid[-1]), 1.)
+            low, high = controls[name]
+            bounds[name] = (
+                max(low, best[0][name] - step), min(high, best[0][name] + step),
+            )
+        if converged:
+            break
+
+    if best is None:
+        return OptimisationResult(None, None, None, n_builds, n_candidates)
+    design, probability = best
+    return OptimisationResult(
+        design, probability, _design_form(form, design), n_builds, n_candidates,
+    )
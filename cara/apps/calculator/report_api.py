@@ -0,0 +1,173 @@
+"""
+The machine-readable report data API.
+
+The statistics of a report (see :meth:`.ReportGenerator.report_data`) are
+served as compact JSON or MessagePack rather than as rendered HTML. The
+numeric arrays (e.g. the concentration curve) are sent in binary form,
+as ``{"dtype": "<f8", "shape": [...], "data": ...}`` where the data are the
+little-endian float64 bytes of the array (base64 encoded in JSON).
+
+The per-sample values of the models of a report are served as an Arrow
+IPC stream (see :mod:`cara.monte_carlo.sample_export`), and the report
+itself as an XLSX workbook (see :mod:`cara.apps.calculator.report_xlsx`).
+
+"""
+import base64
+import concurrent.futures
+import io
+import json
+import typing
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from ...monte_carlo import sample_export
+from ...xlsx import XLSXWriter
+from . import report_xlsx
+from .model_generator import FormData
+from .report_generator import ReportGenerator
+
+
+#: The media types of the formats of the report data.
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+}
+
+#: The arguments of a request which select the report data, rather than
+#: being fields of the form.
+SELECTORS = ('statistics', 'scenarios', 'format')
+
+_ARRAY_DTYPE = '<f8'
+
+
+def parse_selection(value: typing.Union[None, str, typing.Sequence[str]]) -> typing.Optional[typing.List[str]]:
+    """
+    The names selected by a (comma separated) selector argument, or None
+    (i.e. all of them) if it wasn't given.
+
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name.strip()]
+
+
+def negotiate_format(requested: typing.Optional[str], accept: str = '') -> str:
+    """The format of the response, given the format argument and the Accept header."""
+    if not requested:
+        requested = 'msgpack' if MEDIA_TYPES['msgpack'] in accept else 'json'
+    if requested not in MEDIA_TYPES:
+        raise ValueError(f"Unknown format {requested} (expected one of {', '.join(MEDIA_TYPES)})")
+    if requested == 'msgpack' and msgpack is None:
+        raise ValueError("The msgpack format isn't available on this server")
+    return requested
+
+
+def _as_array(value: typing.Any) -> typing.Optional[np.ndarray]:
+    # The value as a float array, if it is a (non-empty) numeric sequence.
+    if isinstance(value, np.ndarray):
+        array = value
+    elif isinstance(value, (list, tuple)) and value:
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            # A ragged sequence.
+            return None
+    else:
+        return None
+    if array.dtype.kind not in 'fiu':
+        return None
+    return array.astype(_ARRAY_DTYPE)
+
+
+def to_wire(value: typing.Any, binary: bool) -> typing.Any:
+    """
+    The given (JSON-like) data, with the numeric sequences replaced by
+    encoded arrays whose data are bytes if ``binary``, or base64 otherwise.
+
+    """
+    array = _as_array(value)
+    if array is not None:
+        data = array.tobytes()
+        return {
+            'dtype': _ARRAY_DTYPE,
+            'shape': list(array.shape),
+            'data': data if binary else base64.b64encode(data).decode('ascii'),
+        }
+    if isinstance(value, dict):
+        return {str(key): to_wire(item, binary) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_wire(item, binary) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def decode_array(encoded: dict) -> np.ndarray:
+    """The array of the given encoded array (of either format)."""
+    data = encoded['data']
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    return np.frombuffer(data, dtype=encoded['dtype']).reshape(encoded['shape'])
+
+
+def encode(data: typing.Any, format: str) -> bytes:
+    if format == 'msgpack':
+        return msgpack.packb(to_wire(data, binary=True))
+    return json.dumps(to_wire(data, binary=False), separators=(',', ':')).encode()
+
+
+def encoded_report_data(
+        report_generator: ReportGenerator,
+        form: FormData,
+        executor_factory: typing.Callable[[], concurrent.futures.Executor],
+        format: str,
+        statistics: typing.Optional[typing.Collection[str]] = None,
+        scenarios: typing.Optional[typing.Collection[str]] = None,
+) -> bytes:
+    """
+    The encoded report data of the given form, computed (and encoded) in
+    a report worker so that only the bytes are sent back.
+
+    """
+    data = report_generator.report_data(
+        form, executor_factory, statistics=statistics, scenarios=scenarios,
+    )
+    return encode(data, format)
+
+
+def sample_stream(
+        report_generator: ReportGenerator,
+        form: FormData,
+        scenarios: typing.Optional[typing.Collection[str]] = None,
+) -> bytes:
+    """
+    The samples of the base scenario of the given form and of the given
+    alternative scenarios, as an Arrow IPC stream built in a report worker.
+
+    """
+    return sample_export.ipc_stream(report_generator.sampled_scenarios(form, scenarios))
+
+
+def report_workbook(
+        report_generator: ReportGenerator,
+        base_url: str,
+        form: FormData,
+        executor_factory: typing.Callable[[], concurrent.futures.Executor],
+) -> bytes:
+    """
+    The XLSX workbook of the report of the given form, built in a report
+    worker from the (possibly cached) context of the report.
+
+    """
+    context = report_generator.build_context(base_url, form, executor_factory)
+    workbook = io.BytesIO()
+    with XLSXWriter(workbook) as writer:
+        report_xlsx.write_report(writer, form, context)
+    return workbook.getvalue()
@@ -0,0 +1,183 @@
+"""
+A cache of the computed reports, keyed by the content of their inputs.
+
+Two namespaces are kept apart: the (expensive) computed context of a
+report, keyed by its canonical form, the calculator version and the
+sampling policy; and the rendered HTML, keyed additionally by the
+templates, so that a change of template or theme only costs a rendering.
+
+Each namespace has an in-memory LRU tier (per process) and, if a path is
+given, an SQLite tier shared by all of the processes (e.g. the report
+workers) which use the same file. Both tiers evict the entries older than
+the time to live, and then the least recently used entries beyond their
+size limit.
+
+"""
+import collections
+import hashlib
+import json
+import pickle
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import typing
+import uuid
+import zlib
+
+
+#: The names of the namespaces of a report cache.
+CONTEXT = 'context'
+HTML = 'html'
+
+# The in-memory tiers of this process, shared by the unpickled copies of a
+# cache (e.g. in a report worker).
+_MemoryTier = typing.Tuple[threading.Lock, "collections.OrderedDict[typing.Tuple[str, str], typing.Tuple[float, typing.Any]]"]
+_MEMORY_TIERS: typing.Dict[str, _MemoryTier] = {}
+_MEMORY_TIERS_LOCK = threading.Lock()
+
+
+def content_key(*parts: typing.Any) -> str:
+    """
+    A key for the given (JSON serialisable) parts, which doesn't depend on
+    the order of the keys of the dictionaries.
+
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ReportCache:
+    def __init__(
+            self,
+            path: typing.Optional[typing.Union[str, Path]] = None,
+            max_memory_entries: int = 32,
+            max_disk_bytes: int = 1 << 30,
+            ttl: float = 7 * 24 * 3600.,
+    ):
+        #: The SQLite file of the disk tier, or None for a memory-only cache.
+        self.path = None if path is None else Path(path)
+
+        #: The maximum number of entries in the memory tier.
+        self.max_memory_entries = max_memory_entries
+
+        #: The maximum total size (in bytes) of the entries of the disk tier.
+        self.max_disk_bytes = max_disk_bytes
+
+        #: The time (in seconds) after which an entry is evicted.
+        self.ttl = ttl
+
+        # Identifies the memory tier of this cache (and of its copies).
+        self._token = uuid.uuid4().hex
+        self._reset()
+
+    def _reset(self):
+        # Per-process state, which is re-built lazily.
+        self._connection: typing.Optional[sqlite3.Connection] = None
+        with _MEMORY_TIERS_LOCK:
+            self._lock, self._memory = _MEMORY_TIERS.setdefault(
+                self._token, (threading.Lock(), collections.OrderedDict()),
+            )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ['_connection', '_lock', '_memory']:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _database(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path is None:
+                raise ValueError("The report cache has no database (its path is None)")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'namespace TEXT, key TEXT, created REAL, accessed REAL, size INTEGER, value BLOB, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, namespace: str, key: str) -> typing.Optional[typing.Any]:
+        """The cached value of the given key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((namespace, key))
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end((namespace, key))
+                    return value
+                del self._memory[(namespace, key)]
+
+            if self.path is None:
+                return None
+            database = self._database()
+            row = database.execute(
+                'SELECT created, value FROM entries WHERE namespace = ? AND key = ? AND created >= ?',
+                (namespace, key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            database.execute(
+                'UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                (now, namespace, key),
+            )
+            database.commit()
+            created, blob = row
+            value = pickle.loads(zlib.decompress(blob))
+            self._remember(namespace, key, created, value)
+            return value
+
+    def put(self, namespace: str, key: str, value: typing.Any) -> None:
+        """Cache the given value, which must be picklable."""
+        now = time.time()
+        with self._lock:
+            self._remember(namespace, key, now, value)
+            if self.path is None:
+                return
+            blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            database = self._database()
+            database.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                (namespace, key, now, now, len(blob), blob),
+            )
+            self._evict(database, now)
+            database.commit()
+
+    def _remember(self, namespace: str, key: str, created: float, value: typing.Any) -> None:
+        self._memory[(namespace, key)] = (created, value)
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, database: sqlite3.Connection, now: float) -> None:
+        database.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,))
+        (total,) = database.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if total <= self.max_disk_bytes:
+            return
+        excess = total - self.max_disk_bytes
+        evicted = []
+        for namespace, key, size in database.execute(
+                'SELECT namespace, key, size FROM entries ORDER BY accessed'):
+            if excess <= 0:
+                break
+            evicted.append((namespace, key))
+            excess -= size
+        database.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', evicted)
+
+    def clear(self) -> None:
+        """Remove all of the entries of both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self.path is not None:
+                database = self._database()
+                database.execute('DELETE FROM entries')
+                database.commit()
@@ -2,6 +2,7 @@ import concurrent.futures
 import base64
 import dataclasses
 from datetime import datetime
+import functools
 import io
 import json
 import typing
@@ -14,9 +15,17 @@ import os
 import jinja2
 import numpy as np
 
+import cara
 from cara import models
 from ... import monte_carlo as mc
+from ...monte_carlo import stacking
+from ...monte_carlo import statistics as mc_statistics
+from ...monte_carlo.build_cache import BuildCache
+from ...monte_carlo.sample_bank import SampleBank
+from ...monte_carlo.sampleable import SampleableDistribution, TailBiased
+from . import report_cache
 from .model_generator import FormData, _DEFAULT_MC_SAMPLE_SIZE
+from .report_cache import ReportCache
 from ... import dataclass_utils
 
 
@@ -99,35 +108,204 @@ def interesting_times(model: models.ExposureModel, approx_n_pts=100) -> typing.L
     return nice_times
 
 
-def calculate_report_data(model: models.ExposureModel):
-    times = interesting_times(model)
+#: The probabilities of infection (in %) whose exceedance probability is
+#: reported. These match the thresholds of the report's risk levels.
+_RISK_THRESHOLDS = (1., 5., 15.)
+
+#: The time (in seconds) allowed for bootstrapping the confidence intervals
+#: of the headline figures of a report, if they are bootstrapped.
+_BOOTSTRAP_TIME_BUDGET = 0.25
+
+#: The label of the scenario of the form itself, among its alternatives.
+BASE_SCENARIO = 'Base scenario'
+
+#: The time (in seconds) allowed for computing the alternative scenarios of
+#: a report.
+_SCENARIOS_TIMEOUT = 60
+
+#: The quantities whose difference between the alternative scenarios and
+#: the base scenario is reported.
+_COMPARED_QUANTITIES = ('probability_of_infection', 'expected_new_cases')
+
+
+#: The statistics of :func:`calculate_report_data` which depend on the
+#: time grid of the report.
+TIME_SERIES_STATISTICS = (
+    'times',
+    'exposed_presence_intervals',
+    'cumulative_doses',
+    'prob_inf_curve',
+    'prob_inf_half_time',
+    'concentrations',
+    'highest_const',
+)
+
+#: The statistics of :func:`calculate_report_data` which describe the upper
+#: tail of the distribution of the probability of infection, and which can
+#: be estimated from a tail sampled model (see :func:`tail_sampled_model`).
+TAIL_STATISTICS = (
+    'prob_inf_percentiles',
+    'prob_inf_distribution',
+)
+
+#: All of the statistics of :func:`calculate_report_data`.
+REPORT_STATISTICS = TIME_SERIES_STATISTICS + TAIL_STATISTICS + (
+    'prob_inf',
+    'emission_rate',
+    'exposed_occupants',
+    'expected_new_cases',
+    'statistics_precision',
+    'confidence_intervals',
+)
+
+
+def _checked_statistics(
+        statistics: typing.Optional[typing.Collection[str]],
+) -> typing.Collection[str]:
+    # The requested statistics (all of them if None), which must be known.
+    if statistics is None:
+        return REPORT_STATISTICS
+    for name in statistics:
+        if name not in REPORT_STATISTICS:
+            raise ValueError(f"{name} is not a statistic of the report")
+    return statistics
+
+
+@functools.lru_cache(maxsize=None)
+def _tail_biased(distribution: SampleableDistribution) -> TailBiased:
+    # The tail of each distribution is located (from a large pilot sample)
+    # only once per process.
+    return TailBiased(distribution)
+
+
+def tail_sampled_model(
+        mc_model: mc.ExposureModel,
+        size: int = _DEFAULT_MC_SAMPLE_SIZE,
+) -> typing.Tuple[models.ExposureModel, np.ndarray]:
+    """
+    Build the given model with the viral load of the infected importance
+    sampled towards the upper tail of its distribution (see
+    :class:`cara.monte_carlo.sampleable.TailBiased`), as it drives the upper
+    tail of the probability of infection. Return the model and its
+    per-sample likelihood weights.
 
-    concentrations = [
-        np.array(model.concentration_model.concentration(float(time))).mean()
-        for time in times
-    ]
-    highest_const = max(concentrations)
-    prob = np.array(model.infection_probability()).mean()
-    er = np.array(model.concentration_model.infected.emission_rate_when_present()).mean()
-    exposed_occupants = model.exposed.number
-    expected_new_cases = np.array(model.expected_new_cases()).mean()
-    cumulative_doses = np.cumsum([
-        np.array(model.exposure_between_bounds(float(time1), float(time2))).mean()
-        for time1, time2 in zip(times[:-1], times[1:])
-    ])
-
-    #setups the variables useable in the j2 template
-    return {
-        "times": list(times),
-        "exposed_presence_intervals": [list(interval) for interval in model.exposed.presence.boundaries()],
-        "cumulative_doses": list(cumulative_doses),
-        "concentrations": concentrations,
-        "highest_const": highest_const,
-        "prob_inf": prob,
-        "emission_rate": er,
-        "exposed_occupants": exposed_occupants,
-        "expected_new_cases": expected_new_cases,
-    }
+    """
+    viral_load = mc_model.concentration_model.infected.virus.viral_load_in_sputum
+    if isinstance(viral_load, SampleableDistribution) and not isinstance(viral_load, TailBiased):
+        mc_model = dataclass_utils.nested_replace(mc_model, {
+            'concentration_model.infected.virus.viral_load_in_sputum': _tail_biased(viral_load),
+        })
+    return mc_model.build_weighted_model(size)
+
+
+def calculate_report_data(
+        model: models.ExposureModel,
+        statistics: typing.Optional[typing.Collection[str]] = None,
+        tail_model: typing.Optional[typing.Tuple[models.ExposureModel, np.ndarray]] = None,
+        bootstrap: bool = False,
+):
+    """
+    Compute the statistics of the given model needed by the report. If
+    given, only the ``statistics`` (of :data:`REPORT_STATISTICS`) are
+    computed.
+
+    The confidence intervals of the headline figures are computed from the
+    batch means of the samples (in about a millisecond), or, if
+    ``bootstrap``, by bootstrapping them for up to
+    :data:`_BOOTSTRAP_TIME_BUDGET` seconds.
+
+    If a ``tail_model`` (an importance sampled model of the same scenario,
+    and its weights, see :func:`tail_sampled_model`) is given, the
+    :data:`TAIL_STATISTICS` are estimated from it rather than from ``model``.
+
+    """
+    statistics = _checked_statistics(statistics)
+    data: typing.Dict[str, typing.Any] = {}
+
+    if any(name in statistics for name in TIME_SERIES_STATISTICS):
+        times = interesting_times(model)
+        concentrations = [
+            float(np.mean(model.concentration_model.concentration(float(time))))
+            for time in times
+        ]
+        dose_curves, prob_inf_curves = model.cumulative_exposure_curves(times)
+        # The dose accumulated by the end of each interval between the times.
+        cumulative_doses = [float(np.mean(doses)) for doses in dose_curves[1:]]
+        mean_curve = [float(np.mean(probabilities)) for probabilities in prob_inf_curves]
+        prob_inf_curve = {
+            'mean': mean_curve,
+            'percentiles': {
+                percentile: band.tolist() for percentile, band in
+                mc_statistics.percentile_bands(prob_inf_curves, (5, 50, 95)).items()
+            },
+        }
+        # The time (in minutes) by which half of the probability of infection
+        # has been accumulated.
+        half_time = None
+        if mean_curve[-1] > 0:
+            half_index = int(np.argmax(np.array(mean_curve) >= mean_curve[-1] / 2))
+            half_time = int(round(times[half_index] * 60))
+        data.update({
+            "times": list(times),
+            "exposed_presence_intervals": [list(interval) for interval in model.exposed.presence.boundaries()],
+            "cumulative_doses": cumulative_doses,
+            # The mean, and the P5/P50/P95 bands, of the probability of
+            # infection accumulated at each of the times.
+            "prob_inf_curve": prob_inf_curve,
+            "prob_inf_half_time": half_time,
+            "concentrations": concentrations,
+            "highest_const": max(concentrations),
+        })
+
+    if any(name not in TIME_SERIES_STATISTICS for name in statistics):
+        infection_probability = model.infection_probability()
+        tail_probability, tail_weights = infection_probability, None
+        if tail_model is not None and any(name in TAIL_STATISTICS for name in statistics):
+            tail_probability, tail_weights = tail_model[0].infection_probability(), tail_model[1]
+        headline_samples = {
+            'prob_inf': infection_probability,
+            'emission_rate': model.concentration_model.infected.emission_rate_when_present(),
+            'expected_new_cases': model.expected_new_cases(),
+        }
+        estimates = {
+            name: mc_statistics.mean_estimate(samples)
+            for name, samples in headline_samples.items()
+        }
+        data.update({
+            "prob_inf": estimates['prob_inf'].mean,
+            "prob_inf_percentiles": {
+                percentile: float(mc_statistics.weighted_quantile(tail_probability, percentile / 100, tail_weights))
+                for percentile in (95, 99)
+            },
+            # The P5/P50/P95 percentiles, exceedance probabilities and histogram.
+            "prob_inf_distribution": mc_statistics.distribution_summary(
+                tail_probability, tail_weights, thresholds=_RISK_THRESHOLDS,
+            ),
+            "emission_rate": estimates['emission_rate'].mean,
+            "exposed_occupants": model.exposed.number,
+            "expected_new_cases": estimates['expected_new_cases'].mean,
+            # The standard error of each of the above (plain Monte Carlo) means.
+            "statistics_precision": {
+                name: {'mean': estimate.mean, 'standard_error': estimate.standard_error}
+                for name, estimate in estimates.items()
+            },
+        })
+        if 'confidence_intervals' in statistics:
+            if bootstrap:
+                confidence_intervals = mc_statistics.bootstrap_intervals(
+                    headline_samples, time_budget=_BOOTSTRAP_TIME_BUDGET,
+                )
+            else:
+                confidence_intervals = {
+                    name: mc_statistics.batch_means_interval(samples)
+                    for name, samples in headline_samples.items()
+                }
+            # The 95% confidence interval of each of the above means.
+            data["confidence_intervals"] = {
+                name: dataclasses.asdict(interval) for name, interval in confidence_intervals.items()
+            }
+
+    return {name: value for name, value in data.items() if name in statistics}
 
 
 def generate_permalink(base_url, calculator_prefix, form: FormData):
@@ -221,10 +399,7 @@ def manufacture_alternative_scenarios(form: FormData) -> typing.Dict[str, mc.Exp
     # The remaining scenarios are based on Type I masks (possibly not worn)
     # and no HEPA filtration.
 
-    print("manufacture scenarios")
-    #print(form)
     scenarios_alt = form.scenarios_alt
-    print(scenarios_alt)
     if scenarios_alt=="":
         scenarios_alt="1;2;3"
     if scenarios_alt!="":
@@ -281,53 +456,335 @@ def manufacture_alternative_scenarios(form: FormData) -> typing.Dict[str, mc.Exp
     return scenarios
 
 
-def scenario_statistics(mc_model: mc.ExposureModel, sample_times: np.ndarray):
-    model = mc_model.build_model(size=_DEFAULT_MC_SAMPLE_SIZE)
-    return {
-        'probability_of_infection': np.mean(model.infection_probability()),
-        'expected_new_cases': np.mean(model.expected_new_cases()),
-        'concentrations': [
-            np.mean(model.concentration_model.concentration(time))
-            for time in sample_times
-        ],
-    }
+#: Called with the name of each stage of a report once it is completed.
+ProgressCallback = typing.Callable[[str], None]
+
+
+def _no_progress(stage: str) -> None:
+    pass
+
+
+def stacked_scenario_statistics(
+        mc_models: typing.Sequence[mc.ExposureModel],
+        sample_times: typing.Sequence[float],
+        sample_bank: typing.Optional[SampleBank] = None,
+) -> typing.List[dict]:
+    """
+    Compute the statistics of each of the given scenarios, which must have
+    the same structure (see :func:`cara.monte_carlo.stacking.stackable_groups`),
+    from a single model build stacked along the sample axis. The samples of
+    the distributions are shared by all of the scenarios.
+
+    """
+    if sample_bank is not None:
+        model = stacking.build_stacked_model(mc_models, _DEFAULT_MC_SAMPLE_SIZE, sample_bank.sampler())
+    else:
+        model = stacking.build_stacked_model(mc_models, _DEFAULT_MC_SAMPLE_SIZE)
+    n_models = len(mc_models)
+    infection_probabilities = stacking.unstack(model.infection_probability(), n_models)
+    expected_new_cases = stacking.unstack(model.expected_new_cases(), n_models)
+    concentrations = np.array([
+        stacking.unstack(model.concentration_model.concentration(time), n_models).mean(axis=1)
+        for time in sample_times
+    ]).reshape(len(sample_times), n_models)
+    return [
+        {
+            'probability_of_infection': np.mean(infection_probability),
+            'probability_of_infection_distribution': mc_statistics.distribution_summary(
+                infection_probability, thresholds=_RISK_THRESHOLDS,
+            ),
+            'probability_of_infection_batch_means': mc_statistics.batch_means(infection_probability).tolist(),
+            'expected_new_cases': np.mean(new_cases),
+            'expected_new_cases_batch_means': mc_statistics.batch_means(new_cases).tolist(),
+            'concentrations': list(concentrations[:, index]),
+        }
+        for index, (infection_probability, new_cases) in enumerate(
+            zip(infection_probabilities, expected_new_cases)
+        )
+    ]
+
+
+def scenario_statistics(
+        mc_model: mc.ExposureModel,
+        sample_times: typing.Sequence[float],
+        sample_bank: typing.Optional[SampleBank] = None,
+):
+    return stacked_scenario_statistics([mc_model], sample_times, sample_bank)[0]
 
 
 def comparison_report(
         scenarios: typing.Dict[str, mc.ExposureModel],
-        sample_times: typing.List[float],
+        sample_times: typing.Sequence[float],
         executor_factory: typing.Callable[[], concurrent.futures.Executor],
+        sample_bank: typing.Optional[SampleBank] = None,
+        base: typing.Optional[mc.ExposureModel] = None,
+        progress: ProgressCallback = _no_progress,
 ):
-    statistics = {}
-    with executor_factory() as executor:
-        results = executor.map(
-            scenario_statistics,
-            scenarios.values(),
-            [sample_times] * len(scenarios),
-            timeout=60,
-        )
+    """
+    Compute the statistics of each of the alternative scenarios. If the
+    ``base`` scenario is given, the confidence intervals of the difference
+    between each scenario and the base scenario are included. ``progress``
+    is called with ``'scenario: <name>'`` once each scenario is computed.
+
+    The scenarios which have the same structure (e.g. which differ only in
+    the masks worn or the ventilations) are evaluated together, with the
+    base scenario, in a single stacked build: their differences are then
+    computed from common random numbers. Each such group is a task of the
+    executor, and a :class:`TimeoutError` is raised if they aren't all
+    computed within :data:`_SCENARIOS_TIMEOUT` seconds.
 
-    for (name, model), model_stats in zip(scenarios.items(), results):
-        statistics[name] = model_stats
+    """
+    names = list(scenarios)
+    mc_models = list(scenarios.values())
+    if base is not None:
+        names.insert(0, BASE_SCENARIO)
+        mc_models.insert(0, base)
+    groups = stacking.stackable_groups(mc_models)
+
+    results: typing.List[dict] = [{} for _ in mc_models]
+    executor = executor_factory()
+    try:
+        futures = {
+            executor.submit(
+                stacked_scenario_statistics, [mc_models[index] for index in group], sample_times, sample_bank,
+            ): group
+            for group in groups
+        }
+        for future in concurrent.futures.as_completed(futures, timeout=_SCENARIOS_TIMEOUT):
+            for index, model_stats in zip(futures[future], future.result()):
+                results[index] = model_stats
+                if base is None or index > 0:
+                    progress(f'scenario: {names[index]}')
+    except concurrent.futures.TimeoutError:
+        raise TimeoutError(
+            f"The alternative scenarios weren't computed within {_SCENARIOS_TIMEOUT} s"
+        ) from None
+    finally:
+        # Don't wait for the groups which are still pending if any failed.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if base is not None:
+        base_stats = results.pop(0)
+        names.pop(0)
+        for model_stats in results:
+            for quantity in _COMPARED_QUANTITIES:
+                model_stats[f'{quantity}_difference'] = dataclasses.asdict(mc_statistics.difference_interval(
+                    model_stats[f'{quantity}_batch_means'], base_stats[f'{quantity}_batch_means'],
+                ))
     return {
-        'stats': statistics,
+        'stats': dict(zip(names, results)),
     }
 
 
+class Deferred:
+    """
+    A value of the context of a report which is still being computed:
+    using it (e.g. in the template) waits for it.
+
+    """
+    def __init__(self, future: concurrent.futures.Future):
+        self._future = future
+        #: Called before waiting for the value.
+        self.before_wait: typing.Callable[[], None] = lambda: None
+
+    def result(self):
+        if not self._future.done():
+            self.before_wait()
+        return self._future.result()
+
+    def __getattr__(self, name):
+        return getattr(self.result(), name)
+
+    def __getitem__(self, key):
+        return self.result()[key]
+
+    def __iter__(self):
+        return iter(self.result())
+
+
+def _checked_scenarios(
+        alternatives: typing.Dict[str, mc.ExposureModel],
+        scenarios: typing.Optional[typing.Collection[str]],
+) -> typing.Collection[str]:
+    # The requested alternative scenarios (all of them if None), which must
+    # be those of the form.
+    if scenarios is None:
+        return list(alternatives)
+    for name in scenarios:
+        if name not in alternatives:
+            raise ValueError(
+                f"{name} is not an alternative scenario of this form "
+                f"(which are: {', '.join(alternatives)})"
+            )
+    return scenarios
+
+
+@functools.lru_cache(maxsize=None)
+def _process_build_cache(maxsize: int) -> BuildCache:
+    # The build cache of this process (e.g. of a report worker), shared by
+    # the unpickled copies of a report generator.
+    return BuildCache(maxsize=maxsize)
+
+
+# The context of a report which is specific to a request, and isn't cached.
+_UNCACHED_CONTEXT = {'form', 'permalink', 'calculator_prefix'}
+
+
 @dataclasses.dataclass
 class ReportGenerator:
     jinja_loader: jinja2.BaseLoader
     calculator_prefix: str
+    #: If given, the standard distributions are served from this bank
+    #: rather than being sampled for each report.
+    sample_bank: typing.Optional[SampleBank] = None
+    #: If given, the computed contexts and the rendered reports are cached.
+    report_cache: typing.Optional[ReportCache] = None
+    #: Whether the upper percentiles and exceedance probabilities of the
+    #: probability of infection (the :data:`TAIL_STATISTICS`) are estimated
+    #: from a tail sampled model (see :func:`tail_sampled_model`), which
+    #: costs a second build of the model.
+    tail_sampling: bool = False
+    #: Whether the confidence intervals of the headline figures are
+    #: bootstrapped (which takes a quarter of a second per report) rather
+    #: than computed from the batch means of the samples.
+    bootstrap_intervals: bool = False
+    #: If not zero, the models built without a sample bank reuse the
+    #: unchanged sub-models (and samples) of the previous builds of the
+    #: same process, of which this many are remembered (see
+    #: :class:`cara.monte_carlo.build_cache.BuildCache`): when a form is
+    #: edited and submitted again, only the sub-models which depend on the
+    #: edited fields are rebuilt. Each process then keeps up to this many
+    #: sampled distributions, of 400 kB each (for the default sample size),
+    #: and the sub-models built from them, which mostly share their arrays.
+    build_cache_size: int = 0
+    _templates_key: typing.Optional[str] = dataclasses.field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.report_cache is not None:
+            self._templates_fingerprint()
 
     def build_report(
             self,
             base_url: str,
             form: FormData,
             executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress: ProgressCallback = _no_progress,
     ) -> str:
-        model = form.build_model()
-        context = self.prepare_context(base_url, model, form, executor_factory=executor_factory)
-        return self.render(context)
+        """
+        Build the report of the given form. ``progress`` is called with the
+        name of each stage of the report (see :func:`build_context`) once it
+        is completed, the last one being ``'rendering'``.
+
+        """
+        report = self.cached_report(base_url, form)
+        if report is None:
+            context = self.build_context(base_url, form, executor_factory, progress)
+            report = self.render(context)
+            self.cache_report(base_url, form, report)
+        progress('rendering')
+        return report
+
+    def _html_key(self, base_url: str, form: FormData) -> str:
+        return report_cache.content_key(self.cache_key(form), self._templates_fingerprint(), base_url)
+
+    def cached_report(self, base_url: str, form: FormData) -> typing.Optional[str]:
+        """The rendered report of the given form, if it is in the report cache."""
+        if self.report_cache is None:
+            return None
+        return self.report_cache.get(report_cache.HTML, self._html_key(base_url, form))
+
+    def cache_report(self, base_url: str, form: FormData, report: str) -> None:
+        """Keep the rendered report of the given form in the report cache (if any)."""
+        if self.report_cache is not None:
+            self.report_cache.put(report_cache.HTML, self._html_key(base_url, form), report)
+
+    def build_context(
+            self,
+            base_url: str,
+            form: FormData,
+            executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress: ProgressCallback = _no_progress,
+    ) -> dict:
+        """
+        The context of the report of the given form, from the report cache
+        if possible. The stages reported to ``progress`` are ``'sampling'``,
+        ``'statistics'`` and ``'scenario: <name>'`` for each of the
+        alternative scenarios.
+
+        """
+        context = self.cached_context(base_url, form)
+        if context is not None:
+            return context
+
+        model = self.build_model(form)
+        progress('sampling')
+        context = self.prepare_context(
+            base_url, model, form, executor_factory=executor_factory, progress=progress,
+        )
+        self.cache_context(form, context)
+        return context
+
+    def cached_context(self, base_url: str, form: FormData) -> typing.Optional[dict]:
+        """The context of the report of the given form, if it is in the report cache."""
+        if self.report_cache is None:
+            return None
+        cached_context = self.report_cache.get(report_cache.CONTEXT, self.cache_key(form))
+        if cached_context is None:
+            return None
+        return dict(
+            cached_context,
+            form=form,
+            permalink=generate_permalink(base_url, self.calculator_prefix, form),
+            calculator_prefix=self.calculator_prefix,
+        )
+
+    def cache_context(self, form: FormData, context: dict) -> None:
+        """Keep the (complete) context of the report of the given form in the report cache (if any)."""
+        if self.report_cache is not None:
+            self.report_cache.put(report_cache.CONTEXT, self.cache_key(form), {
+                name: value for name, value in context.items() if name not in _UNCACHED_CONTEXT
+            })
+
+    def build_model(self, form: FormData) -> models.ExposureModel:
+        """The sampled model of the given form."""
+        build_cache = None
+        if self.build_cache_size:
+            build_cache = _process_build_cache(self.build_cache_size)
+        return form.build_model(sample_bank=self.sample_bank, build_cache=build_cache)
+
+    def cache_key(self, form: FormData) -> str:
+        """
+        The key of the computed context of the report of the given form:
+        a hash of the canonical form, of the versions of CARA and of the
+        calculator, and of the sampling policy.
+
+        """
+        from . import __version__ as calculator_version
+
+        sample_policy: typing.Dict[str, typing.Any] = {'size': _DEFAULT_MC_SAMPLE_SIZE}
+        if self.sample_bank is not None:
+            sample_policy.update(bank_size=self.sample_bank.bank_size, seed=self.sample_bank.seed)
+        if self.tail_sampling:
+            sample_policy['tail_sampling'] = True
+        if self.bootstrap_intervals:
+            sample_policy['bootstrap_intervals'] = True
+        return report_cache.content_key(
+            FormData.to_dict(form, strip_defaults=True),
+            cara.__version__, calculator_version, sample_policy,
+        )
+
+    def _templates_fingerprint(self) -> str:
+        # A hash of the sources of all of the templates, computed once.
+        if self._templates_key is None:
+            environment = self._template_environment()
+            loader = environment.loader
+            if loader is None:
+                raise ValueError("The report templates have no loader")
+            self._templates_key = report_cache.content_key([
+                (name, loader.get_source(environment, name)[0])
+                for name in sorted(environment.list_templates())
+            ])
+        return self._templates_key
 
     def prepare_context(
             self,
@@ -335,23 +792,44 @@ class ReportGenerator:
             model: models.ExposureModel,
             form: FormData,
             executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress: ProgressCallback = _no_progress,
     ) -> dict:
+        context = self.main_context(base_url, model, form)
+        progress('statistics')
+        context['alternative_scenarios'] = self.alternative_scenarios(
+            form, interesting_times(model), executor_factory=executor_factory, progress=progress,
+        )
+        return context
+
+    def tail_model(
+            self,
+            form: FormData,
+            statistics: typing.Collection[str] = REPORT_STATISTICS,
+    ) -> typing.Optional[typing.Tuple[models.ExposureModel, np.ndarray]]:
+        """
+        The tail sampled model of the given form (and its weights), if
+        :attr:`tail_sampling` and any of the :data:`TAIL_STATISTICS` are
+        among the ``statistics``.
+
+        """
+        if not self.tail_sampling or not any(name in TAIL_STATISTICS for name in statistics):
+            return None
+        return tail_sampled_model(form.build_mc_model())
+
+    def main_context(self, base_url: str, model: models.ExposureModel, form: FormData) -> dict:
+        """The context of the report, but for its ``alternative_scenarios``."""
         now = datetime.utcnow().astimezone()
         time = now.strftime("%Y-%m-%d %H:%M:%S UTC")
         
-        context = {
-            'model': model,
+        context: typing.Dict[str, typing.Any] = {
             'form': form,
+            'room_volume': model.concentration_model.room.volume,
             'creation_date': time,
         }
 
-        scenario_sample_times = interesting_times(model)
-
-        context.update(calculate_report_data(model))
-        alternative_scenarios = manufacture_alternative_scenarios(form)
-        context['alternative_scenarios'] = comparison_report(
-            alternative_scenarios, scenario_sample_times, executor_factory=executor_factory,
-        )
+        context.update(calculate_report_data(
+            model, tail_model=self.tail_model(form), bootstrap=self.bootstrap_intervals,
+        ))
         context['permalink'] = generate_permalink(base_url, self.calculator_prefix, form)
         context['calculator_prefix'] = self.calculator_prefix
 
@@ -364,6 +842,135 @@ class ReportGenerator:
         }
         return context
 
+    def alternative_scenarios(
+            self,
+            form: FormData,
+            sample_times: typing.Sequence[float],
+            executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            progress: ProgressCallback = _no_progress,
+    ) -> dict:
+        """The ``alternative_scenarios`` of the context of the report."""
+        return comparison_report(
+            manufacture_alternative_scenarios(form), sample_times, executor_factory=executor_factory,
+            sample_bank=self.sample_bank, base=form.build_mc_model(), progress=progress,
+        )
+
+    def report_data(
+            self,
+            form: FormData,
+            executor_factory: typing.Callable[[], concurrent.futures.Executor],
+            statistics: typing.Optional[typing.Collection[str]] = None,
+            scenarios: typing.Optional[typing.Collection[str]] = None,
+    ) -> dict:
+        """
+        The statistics of the report of the given form, without rendering
+        it: the ``statistics`` (of :data:`REPORT_STATISTICS`) of the base
+        scenario and the ``alternative_scenarios`` statistics of the named
+        ``scenarios`` (all of them if None). The scenarios and the time
+        grids which aren't requested aren't computed, unless the whole
+        context of the report is in the report cache.
+
+        """
+        statistics = _checked_statistics(statistics)
+        alternatives = manufacture_alternative_scenarios(form)
+        scenarios = _checked_scenarios(alternatives, scenarios)
+
+        cached_context = None
+        if self.report_cache is not None:
+            cached_context = self.report_cache.get(report_cache.CONTEXT, self.cache_key(form))
+        if cached_context is not None:
+            data = {name: cached_context[name] for name in statistics}
+            scenario_stats = cached_context['alternative_scenarios']['stats']
+        else:
+            model = self.build_model(form)
+            data = calculate_report_data(
+                model, statistics=statistics, tail_model=self.tail_model(form, statistics),
+                bootstrap=self.bootstrap_intervals,
+            )
+            sample_times: typing.List[float] = []
+            if any(name in TIME_SERIES_STATISTICS for name in statistics):
+                sample_times = interesting_times(model)
+            scenario_stats = {}
+            if scenarios:
+                scenario_stats = comparison_report(
+                    {name: alternatives[name] for name in scenarios}, sample_times,
+                    executor_factory=executor_factory, sample_bank=self.sample_bank,
+                    base=form.build_mc_model(),
+                )['stats']
+
+        return {
+            'statistics': data,
+            'alternative_scenarios': {name: scenario_stats[name] for name in scenarios},
+        }
+
+    def sampled_scenarios(
+            self,
+            form: FormData,
+            scenarios: typing.Optional[typing.Collection[str]] = None,
+    ) -> typing.Dict[str, models.ExposureModel]:
+        """
+        The sampled models of the base scenario of the given form and of
+        the named alternative ``scenarios`` (all of them if None), e.g. for
+        the export of their samples (see :mod:`cara.monte_carlo.sample_export`).
+
+        """
+        alternatives = manufacture_alternative_scenarios(form)
+        sampled = {BASE_SCENARIO: self.build_model(form)}
+        for name in _checked_scenarios(alternatives, scenarios):
+            if self.sample_bank is not None:
+                sampled[name] = self.sample_bank.build_model(alternatives[name], _DEFAULT_MC_SAMPLE_SIZE)
+            else:
+                sampled[name] = alternatives[name].build_model(size=_DEFAULT_MC_SAMPLE_SIZE)
+        return sampled
+
+    def streamed_context(self, base_url: str, form: FormData) -> typing.Tuple[dict, dict]:
+        """
+        The :meth:`main_context` of the report of the given form, to be sent
+        (e.g. from a report worker) before the alternative scenarios are
+        computed, and the arguments of :meth:`alternative_scenarios` for
+        them.
+
+        """
+        model = self.build_model(form)
+        context = self.main_context(base_url, model, form)
+        return context, {
+            'sample_times': interesting_times(model),
+        }
+
+    def stream(
+            self,
+            context: dict,
+            write: typing.Callable[[str], None],
+            chunk_size: int = 16 * 1024,
+    ) -> None:
+        """
+        Render the report progressively, passing chunks of (about)
+        ``chunk_size`` characters to ``write``. The values of the context
+        may be :class:`Deferred`: everything rendered before them is
+        written before waiting for them.
+
+        """
+        buffer: typing.List[str] = []
+        buffered = 0
+
+        def flush():
+            nonlocal buffered
+            if buffer:
+                write(''.join(buffer))
+                buffer.clear()
+                buffered = 0
+
+        for value in context.values():
+            if isinstance(value, Deferred):
+                value.before_wait = flush
+        template = self._template_environment().get_template("calculator.report.html.j2")
+        for chunk in template.generate(**context):
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= chunk_size:
+                flush()
+        flush()
+
     def _template_environment(self) -> jinja2.Environment:
         env = jinja2.Environment(
             loader=self.jinja_loader,
@@ -0,0 +1,68 @@
+"""
+The export of a report as an XLSX workbook, for those who work in
+spreadsheets: the inputs of the form, the headline results, the comparison
+of the alternative scenarios and the time series of the report.
+
+"""
+import typing
+
+from ...xlsx import XLSXWriter
+from .model_generator import FormData
+
+
+def _results_rows(context: dict) -> typing.Iterator[typing.List[typing.Any]]:
+    intervals = context['confidence_intervals']
+
+    def with_interval(label, value, name):
+        return [label, value, intervals[name]['lower'], intervals[name]['upper']]
+
+    yield with_interval('Probability of infection (%)', context['prob_inf'], 'prob_inf')
+    for percentile, value in context['prob_inf_percentiles'].items():
+        yield [f'P{percentile} of the probability of infection (%)', value]
+    for threshold, probability in context['prob_inf_distribution']['exceedance'].items():
+        yield [f'Probability that the probability of infection exceeds {threshold:g}%', probability]
+    yield with_interval('Expected new cases', context['expected_new_cases'], 'expected_new_cases')
+    yield with_interval('Emission rate (virions/h)', context['emission_rate'], 'emission_rate')
+    yield ['Exposed occupants', context['exposed_occupants']]
+    yield ['Time by which half of the probability of infection is accumulated (min)', context['prob_inf_half_time']]
+
+
+def write_report(workbook: XLSXWriter, form: FormData, context: dict) -> None:
+    """Write the sheets of the report of the given form, given its context."""
+    with workbook.sheet('Inputs') as sheet:
+        sheet.append(['Field', 'Value'], bold=True)
+        for name, value in FormData.to_dict(form).items():
+            sheet.append([name, value])
+
+    with workbook.sheet('Results') as sheet:
+        sheet.append(['Result', 'Value', '95% CI (lower)', '95% CI (upper)'], bold=True)
+        for row in _results_rows(context):
+            sheet.append(row)
+
+    with workbook.sheet('Scenarios') as sheet:
+        sheet.append([
+            'Scenario', 'Probability of infection (%)', 'Expected new cases',
+            'Difference in the probability of infection (%)', '95% CI (lower)', '95% CI (upper)',
+        ], bold=True)
+        for name, stats in context['alternative_scenarios']['stats'].items():
+            difference = stats.get('probability_of_infection_difference')
+            sheet.append([
+                name, stats['probability_of_infection'], stats['expected_new_cases'],
+                *([difference['estimate'], difference['lower'], difference['upper']] if difference else []),
+            ])
+
+    with workbook.sheet('Time series') as sheet:
+        percentiles = context['prob_inf_curve']['percentiles']
+        sheet.append([
+            'Time (h)', 'Mean concentration (virions/m³)', 'Cumulative dose (virions)',
+            'Probability of infection (%)',
+            *(f'P{percentile} of the probability of infection (%)' for percentile in percentiles),
+        ], bold=True)
+        # The doses are those accumulated by each of the times but the first.
+        doses = [0.] + list(context['cumulative_doses'])
+        for index, time in enumerate(context['times']):
+            sheet.append([
+                time, context['concentrations'][index], doses[index],
+                context['prob_inf_curve']['mean'][index],
+                *(band[index] for band in percentiles.values()),
+            ])
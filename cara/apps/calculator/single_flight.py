@@ -0,0 +1,60 @@
+"""
+Coalescing of concurrent identical computations.
+
+When many people submit the same form at once (e.g. a shared permalink at
+the start of a meeting), only the first request (the leader) starts the
+computation: the concurrent identical requests wait for, and receive, its
+result instead of each occupying a report worker.
+
+"""
+import asyncio
+import typing
+
+
+_T = typing.TypeVar('_T')
+
+
+class SingleFlight:
+    def __init__(self):
+        self._in_flight: typing.Dict[typing.Hashable, asyncio.Future] = {}
+
+        #: The number of computations which were started.
+        self.leaders = 0
+
+        #: The number of requests which waited for a computation in flight.
+        self.coalesced = 0
+
+    async def run(
+            self,
+            key: typing.Hashable,
+            compute: typing.Callable[[], typing.Awaitable[_T]],
+    ) -> _T:
+        """
+        The result of ``compute()``, shared with (or by) the concurrent
+        calls with the same key. The computation isn't cancelled if the
+        caller which started it is.
+
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda task: self._done(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: typing.Hashable, task: asyncio.Future) -> None:
+        del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception (if any) as retrieved, even if all of the
+            # callers have gone.
+            task.exception()
+
+    def metrics(self) -> typing.Dict[str, int]:
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+        }
@@ -0,0 +1,131 @@
+"""
+Parameter sweeps of a calculator form.
+
+The risk of each cell of a grid of form values (for instance room volume
+× air changes, or occupancy × duration) is computed from as few model
+builds as possible: the cells whose models have the same structure, and
+differ only in vectorised parameters, are stacked along the sample axis
+and built at once (see :mod:`cara.monte_carlo.stacking`), and the others
+are built from their compiled build plans (see
+:meth:`cara.monte_carlo.MCModelBase.compile`). The samples of each
+distribution are shared by all of the cells, so that the differences
+between cells aren't blurred by sampling noise.
+
+"""
+import dataclasses
+import itertools
+import typing
+
+import numpy as np
+
+from ...monte_carlo import stacking
+from .model_generator import FormData, _DEFAULT_MC_SAMPLE_SIZE
+
+
+#: The maximum number of samples of a single (stacked) model build.
+_MAX_SAMPLES_PER_BUILD = 2000000
+
+
+@dataclasses.dataclass(frozen=True)
+class SweepResult:
+    #: The names of the swept form fields, one per axis of the statistics.
+    dimensions: typing.Tuple[str, ...]
+
+    #: The values taken by each of the swept fields.
+    coordinates: typing.Dict[str, np.ndarray]
+
+    #: The statistics of each cell, each with one axis per swept field.
+    statistics: typing.Dict[str, np.ndarray]
+
+    #: The number of (stacked) model builds needed by the sweep.
+    n_builds: int
+
+    def to_dict(self) -> dict:
+        """A JSON serialisable description of the sweep."""
+        return {
+            'dimensions': list(self.dimensions),
+            'coordinates': {name: values.tolist() for name, values in self.coordinates.items()},
+            'statistics': {name: values.tolist() for name, values in self.statistics.items()},
+        }
+
+
+def _form_value(form: FormData, name: str, value):
+    # Keep the type of the numerical fields of the form.
+    current = getattr(form, name)
+    if isinstance(current, (int, float)) and not isinstance(current, bool):
+        return type(current)(value)
+    return value
+
+
+def sweep(
+        form: FormData,
+        ranges: typing.Mapping[str, typing.Sequence],
+        sample_size: int = _DEFAULT_MC_SAMPLE_SIZE,
+        percentiles: typing.Sequence[float] = (5, 95),
+) -> SweepResult:
+    """
+    Compute the statistics of the probability of infection (in %) and of
+    the expected number of new cases for each combination of the values of
+    the given form fields.
+
+    The statistics are the mean of each quantity (``probability_of_infection``
+    and ``expected_new_cases``) and the given percentiles of the probability
+    of infection (e.g. ``probability_of_infection_p95``).
+
+    """
+    field_names = {field.name for field in dataclasses.fields(FormData)}
+    for name in ranges:
+        if name not in field_names:
+            raise ValueError(f"{name} is not a field of the form")
+    dimensions = tuple(ranges)
+    coordinates = {
+        name: np.array([_form_value(form, name, value) for value in values])
+        for name, values in ranges.items()
+    }
+    shape = tuple(len(values) for values in coordinates.values())
+
+    cells = [
+        dataclasses.replace(form, **{
+            name: _form_value(form, name, value) for name, value in zip(dimensions, values)
+        })
+        for values in itertools.product(*ranges.values())
+    ]
+    mc_models = [cell.build_mc_model() for cell in cells]
+
+    # The statistics are reduced build by build, so that only the samples
+    # of a single build are ever held.
+    names = ['probability_of_infection', 'expected_new_cases'] + [
+        f'probability_of_infection_p{percentile:g}' for percentile in percentiles
+    ]
+    statistics = {name: np.empty(len(cells)) for name in names}
+    sample = stacking.CommonRandomNumbers()
+    cells_per_build = max(1, _MAX_SAMPLES_PER_BUILD // sample_size)
+    n_builds = 0
+    for group in stacking.stackable_groups(mc_models):
+        for start in range(0, len(group), cells_per_build):
+            indices = group[start:start + cells_per_build]
+            sample.new_build()
+            if len(indices) == 1:
+                # Nothing to stack: run the model's build plan.
+                model = mc_models[indices[0]].compile().build(sample_size, sample)
+            else:
+                model = stacking.build_stacked_model(
+                    [mc_models[index] for index in indices], sample_size, sample,
+                )
+            n_builds += 1
+            probabilities = stacking.unstack(model.infection_probability(), len(indices))
+            statistics['probability_of_infection'][indices] = probabilities.mean(axis=1)
+            statistics['expected_new_cases'][indices] = stacking.unstack(
+                model.expected_new_cases(), len(indices),
+            ).mean(axis=1)
+            for percentile in percentiles:
+                statistics[f'probability_of_infection_p{percentile:g}'][indices] = np.percentile(
+                    probabilities, percentile, axis=1,
+                )
+
+    return SweepResult(
+        dimensions=dimensions,
+        coordinates=coordinates,
+        statistics={name: values.reshape(shape) for name, values in statistics.items()},
+        n_builds=n_builds,
+    )
@@ -0,0 +1,306 @@
+"""
+Offline evaluation of many scenarios, e.g. all of the rooms of a campus::
+
+    python -m cara.batch scenarios.csv results/ --workers 8
+
+The scenarios are the fields of the calculator form, as the columns of a
+CSV file or the objects of a JSONL file (with an optional ``id`` field
+which is carried to the results). They are evaluated in chunks across a
+process pool, and the results of each chunk are written, as soon as it is
+done, as a columnar ``part-NNNNNN.npz`` file of the output directory.
+
+The parts are the checkpoint of a campaign: running the same command again
+(e.g. after an interruption) only evaluates the chunks which have no part
+yet. Once all of the chunks are done, the parts are combined into
+``results.npz`` (see :func:`read_results`) and, with ``--xlsx``, exported
+to a workbook part by part (see :func:`export_xlsx`).
+
+"""
+import argparse
+import concurrent.futures
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import os
+from pathlib import Path
+import sys
+import typing
+
+import loky
+import numpy as np
+
+from .apps.calculator.model_generator import FormData
+from .apps.calculator.report_generator import calculate_report_data, tail_sampled_model
+from .monte_carlo.sample_bank import SampleBank
+from .xlsx import XLSXWriter
+
+
+#: The statistics of each scenario, besides its ``row``, ``id`` and
+#: ``error`` (which is empty unless the scenario couldn't be evaluated).
+STATISTICS = (
+    'prob_inf',
+    'prob_inf_p95',
+    'prob_inf_p99',
+    'emission_rate',
+    'expected_new_cases',
+    'exposed_occupants',
+)
+
+_MANIFEST = 'batch.json'
+_T = typing.TypeVar('_T')
+_RESULTS = 'results.npz'
+
+
+def read_scenarios(path: Path) -> typing.Iterator[typing.Dict[str, str]]:
+    """The scenarios of a CSV or JSONL file, read lazily."""
+    if path.suffix == '.csv':
+        with path.open('rt', newline='') as fh:
+            yield from csv.DictReader(fh)
+    elif path.suffix in ('.jsonl', '.ndjson'):
+        with path.open('rt') as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        raise ValueError(f"Unsupported scenario file {path.name} (expected .csv or .jsonl)")
+
+
+def evaluate(
+        form_data: typing.Dict[str, typing.Any],
+        sample_bank: typing.Optional[SampleBank] = None,
+        tail_sampling: bool = False,
+) -> typing.Dict[str, float]:
+    """
+    The :data:`STATISTICS` of the given scenario. With ``tail_sampling``,
+    the percentiles are estimated from a tail sampled model (see
+    :func:`.tail_sampled_model`).
+
+    """
+    form = FormData.from_dict(form_data)
+    model = form.build_model(sample_bank=sample_bank)
+    data = calculate_report_data(model, statistics=[
+        'prob_inf', 'prob_inf_percentiles', 'emission_rate', 'expected_new_cases', 'exposed_occupants',
+    ], tail_model=tail_sampled_model(form.build_mc_model()) if tail_sampling else None)
+    return {
+        'prob_inf': data['prob_inf'],
+        'prob_inf_p95': data['prob_inf_percentiles'][95],
+        'prob_inf_p99': data['prob_inf_percentiles'][99],
+        'emission_rate': data['emission_rate'],
+        'expected_new_cases': data['expected_new_cases'],
+        'exposed_occupants': data['exposed_occupants'],
+    }
+
+
+def evaluate_chunk(
+        scenarios: typing.List[typing.Dict[str, typing.Any]],
+        first_row: int,
+        part: Path,
+        sample_bank: typing.Optional[SampleBank] = None,
+        tail_sampling: bool = False,
+) -> int:
+    """
+    Evaluate the given scenarios (in a worker), and write their results to
+    the given part, atomically. Return the number of scenarios.
+
+    """
+    ids, errors = [], []
+    statistics: typing.Dict[str, typing.List[float]] = {name: [] for name in STATISTICS}
+    for form_data in scenarios:
+        form_data = dict(form_data)
+        ids.append(str(form_data.pop('id', '')))
+        try:
+            values = evaluate(form_data, sample_bank, tail_sampling)
+        except Exception as err:
+            values = {name: np.nan for name in STATISTICS}
+            errors.append(str(err) or type(err).__name__)
+        else:
+            errors.append('')
+        for name in STATISTICS:
+            statistics[name].append(values[name])
+
+    columns: typing.Dict[str, typing.Any] = {
+        'row': np.arange(first_row, first_row + len(scenarios)),
+        'id': np.array(ids, dtype=str),
+        **{name: np.array(values, dtype=float) for name, values in statistics.items()},
+        'error': np.array(errors, dtype=str),
+    }
+    partial_part = part.with_name(part.name + '.partial')
+    with partial_part.open('wb') as fh:
+        np.savez(fh, **columns)
+    os.replace(partial_part, part)
+    return len(scenarios)
+
+
+def _chunks(items: typing.Iterable[_T], size: int) -> typing.Iterator[typing.List[_T]]:
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def part_path(output_dir: Path, chunk: int) -> Path:
+    return output_dir / f'part-{chunk:06d}.npz'
+
+
+def _check_manifest(output_dir: Path, scenarios_path: Path, chunk_size: int, tail_sampling: bool) -> None:
+    # Make sure that the parts of the output directory (if any) are those
+    # of the same scenarios, chunked and evaluated in the same way.
+    digest = hashlib.sha256()
+    with scenarios_path.open('rb') as fh:
+        for block in iter(functools.partial(fh.read, 1 << 20), b''):
+            digest.update(block)
+    manifest = {
+        'scenarios_sha256': digest.hexdigest(), 'chunk_size': chunk_size, 'tail_sampling': tail_sampling,
+    }
+    manifest_path = output_dir / _MANIFEST
+    if manifest_path.exists():
+        existing = json.loads(manifest_path.read_text())
+        if existing != manifest:
+            raise ValueError(
+                f"{output_dir} holds the results of other scenarios (or settings), "
+                f"please use another output directory"
+            )
+    else:
+        manifest_path.write_text(json.dumps(manifest))
+
+
+def run(
+        scenarios_path: Path,
+        output_dir: Path,
+        chunk_size: int = 100,
+        workers: typing.Optional[int] = None,
+        sample_bank: typing.Optional[SampleBank] = None,
+        tail_sampling: bool = False,
+        executor_factory: typing.Optional[typing.Callable[[], concurrent.futures.Executor]] = None,
+        log: typing.Callable[[str], None] = lambda message: print(message, file=sys.stderr),
+) -> Path:
+    """
+    Evaluate the scenarios of the given file which haven't been evaluated
+    yet, and return the path of the combined results.
+
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _check_manifest(output_dir, scenarios_path, chunk_size, tail_sampling)
+    if executor_factory is None:
+        executor_factory = functools.partial(loky.get_reusable_executor, max_workers=workers)
+    # The chunks which are submitted at once, which bounds the memory used
+    # for the scenarios read in advance.
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+
+    done = skipped = 0
+    pending: typing.Set[concurrent.futures.Future] = set()
+
+    def wait(return_when):
+        nonlocal done, pending
+        finished, pending = concurrent.futures.wait(pending, return_when=return_when)
+        for future in finished:
+            done += future.result()
+        log(f'{done + skipped} scenarios evaluated ({skipped} in a previous run)')
+
+    with executor_factory() as executor:
+        for chunk, scenarios in enumerate(_chunks(read_scenarios(scenarios_path), chunk_size)):
+            part = part_path(output_dir, chunk)
+            if part.exists():
+                skipped += len(scenarios)
+                continue
+            if len(pending) >= max_in_flight:
+                wait(concurrent.futures.FIRST_COMPLETED)
+            pending.add(executor.submit(
+                evaluate_chunk, scenarios, chunk * chunk_size, part, sample_bank, tail_sampling,
+            ))
+        wait(concurrent.futures.ALL_COMPLETED)
+
+    results_path = output_dir / _RESULTS
+    results: typing.Dict[str, typing.Any] = read_results(output_dir)
+    with results_path.open('wb') as fh:
+        np.savez(fh, **results)
+    return results_path
+
+
+def read_results(output_dir: Path) -> typing.Dict[str, np.ndarray]:
+    """The columns of all of the parts of the given output directory, in order."""
+    columns: typing.Dict[str, typing.List[np.ndarray]] = {}
+    for path in sorted(output_dir.glob('part-*.npz')):
+        with np.load(path) as part:
+            for name in part.files:
+                columns.setdefault(name, []).append(part[name])
+    if not columns:
+        raise ValueError(f"{output_dir} has no results")
+    return {name: np.concatenate(arrays) for name, arrays in columns.items()}
+
+
+def export_xlsx(output_dir: Path, path: Path) -> None:
+    """
+    Export the results of the given output directory to an XLSX workbook,
+    one part at a time, so that the memory used doesn't depend on the
+    number of scenarios.
+
+    """
+    with XLSXWriter(path) as workbook, workbook.sheet('Results') as sheet:
+        header_written = False
+        for part_path in sorted(output_dir.glob('part-*.npz')):
+            with np.load(part_path) as part:
+                columns = [part[name] for name in part.files]
+                if not header_written:
+                    sheet.append(part.files, bold=True)
+                    header_written = True
+            for row in zip(*columns):
+                sheet.append(row)
+
+
+def configure_parser(parser) -> argparse.ArgumentParser:
+    parser.add_argument(
+        "scenarios", type=Path,
+        help="A CSV or JSONL file of the fields of the calculator form of each scenario",
+    )
+    parser.add_argument(
+        "output", type=Path,
+        help="The directory of the results, from which an interrupted run is resumed",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="The number of worker processes (by default, the number of CPUs)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=100,
+        help="The number of scenarios of each part of the results",
+    )
+    parser.add_argument(
+        "--sample-bank", type=Path, default=None,
+        help="A directory of sample banks, shared by the workers",
+    )
+    parser.add_argument(
+        "--tail-sampling", action="store_true",
+        help="Estimate the percentiles of the probability of infection by importance sampling its tail",
+    )
+    parser.add_argument(
+        "--xlsx", type=Path, default=None,
+        help="Also export the results to the given XLSX workbook",
+    )
+    return parser
+
+
+def main():
+    parser = configure_parser(argparse.ArgumentParser())
+    args = parser.parse_args()
+    sample_bank = None
+    if args.sample_bank is not None:
+        sample_bank = SampleBank(args.sample_bank)
+        sample_bank.generate_all()
+    results_path = run(
+        args.scenarios, args.output,
+        chunk_size=args.chunk_size, workers=args.workers, sample_bank=sample_bank,
+        tail_sampling=args.tail_sampling,
+    )
+    print(results_path)
+    if args.xlsx is not None:
+        export_xlsx(args.output, args.xlsx)
+        print(args.xlsx)
+
+
+if __name__ == '__main__':
+    main()
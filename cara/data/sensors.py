@@ -0,0 +1,247 @@
+"""
+Ventilation measured by sensors in a room.
+
+Sensor logs are CSV files with a column of times (numbers of hours, times
+of the day such as ``13:45`` or ISO 8601 timestamps) and one column per
+quantity. They are read row by row, so that long logs (e.g. one reading
+every few seconds over weeks) don't need to be held as text in memory.
+
+The air exchange rate is either computed from a measured airflow (divided
+by the volume of the room), or estimated from the decay of the CO2
+concentration once the occupants have left: in the absence of sources the
+excess concentration over outdoors decays as ``exp(-air_exch * t)``, so the
+air exchange rate is the slope of the logarithm of the excess
+concentration. The resulting rates are compressed into a few constant
+segments (within a given tolerance), so that the concentration model only
+has a few state changes to deal with.
+
+"""
+import array
+import csv
+import datetime
+import typing
+
+import numpy as np
+
+from cara import models
+
+
+PathOrFile = typing.Union[str, typing.TextIO]
+
+
+class SensorLog(typing.NamedTuple):
+    #: The times of the readings (in hours, since the midnight of the first
+    #: day for timestamps).
+    times: np.ndarray
+
+    #: The readings of each column.
+    values: typing.Dict[str, np.ndarray]
+
+
+def _parse_time(text: str, origin: typing.Optional[datetime.date]) -> typing.Tuple[float, typing.Optional[datetime.date]]:
+    # The time (in hours) of a cell of the time column, and the date of the
+    # first timestamp.
+    text = text.strip()
+    try:
+        return float(text), origin
+    except ValueError:
+        pass
+    if ':' in text and '-' not in text:
+        parts = [float(part) for part in text.split(':')]
+        return sum(part / 60 ** index for index, part in enumerate(parts)), origin
+    timestamp = datetime.datetime.fromisoformat(text)
+    if origin is None:
+        origin = timestamp.date()
+    delta = timestamp.replace(tzinfo=None) - datetime.datetime.combine(origin, datetime.time())
+    return delta.total_seconds() / 3600, origin
+
+
+def _parse_value(text: str) -> float:
+    text = text.strip()
+    return float(text) if text else np.nan
+
+
+def read_sensor_log(
+        source: PathOrFile,
+        columns: typing.Optional[typing.Sequence[str]] = None,
+        time_column: str = 'time',
+) -> SensorLog:
+    """
+    Read a CSV sensor log, keeping the given columns (all of them by
+    default). Empty readings are read as NaN.
+
+    """
+    if isinstance(source, str):
+        with open(source, newline='') as file:
+            return read_sensor_log(file, columns, time_column)
+
+    reader = csv.reader(source)
+    header = [name.strip() for name in next(reader)]
+    if time_column not in header:
+        raise ValueError(f"The sensor log has no {time_column} column")
+    columns = [name for name in header if name != time_column] if columns is None else list(columns)
+    for name in columns:
+        if name not in header:
+            raise ValueError(f"The sensor log has no {name} column")
+    time_index = header.index(time_column)
+    indices = [header.index(name) for name in columns]
+
+    origin = None
+    times = array.array('d')
+    values = {name: array.array('d') for name in columns}
+    for row in reader:
+        if not row or not row[time_index].strip():
+            continue
+        time, origin = _parse_time(row[time_index], origin)
+        times.append(time)
+        for name, index in zip(columns, indices):
+            values[name].append(_parse_value(row[index]))
+
+    times_array = np.frombuffer(times, dtype=float)
+    if np.any(np.diff(times_array) <= 0):
+        raise ValueError("The times of the sensor log must be increasing")
+    return SensorLog(
+        times=times_array,
+        values={name: np.frombuffer(column, dtype=float) for name, column in values.items()},
+    )
+
+
+def air_exchange_from_airflow(
+        times: np.ndarray,
+        airflow: np.ndarray,
+        volume: float,
+) -> models.PiecewiseConstant:
+    """
+    The air exchange rate (h^-1) given by an airflow (m³/h) measured in a
+    room of the given volume (m³). Each reading holds until the next one.
+
+    """
+    rates = np.asarray(airflow, dtype=float) / volume
+    return _holding(np.asarray(times, dtype=float), rates)
+
+
+def air_exchange_from_co2(
+        times: np.ndarray,
+        co2: np.ndarray,
+        outdoor_co2: float = 420.,
+        min_excess: float = 50.,
+        min_duration: float = 0.25,
+) -> models.PiecewiseConstant:
+    """
+    The air exchange rate (h^-1) estimated from the decays of a measured CO2
+    concentration (ppm).
+
+    A decay is a run of readings, lasting at least ``min_duration`` hours,
+    over which the concentration decreases while staying at least
+    ``min_excess`` ppm above ``outdoor_co2``. Its air exchange rate is the
+    least squares slope of the logarithm of the excess concentration, and it
+    holds from the start of the decay until the start of the next one (the
+    first one also holds before it).
+
+    """
+    times = np.asarray(times, dtype=float)
+    excess = np.asarray(co2, dtype=float) - outdoor_co2
+    valid = np.isfinite(excess) & (excess >= min_excess)
+    log_excess = np.log(np.where(valid, excess, 1.))
+    decreasing = valid[:-1] & valid[1:] & (np.diff(log_excess) < 0)
+
+    starts, rates = [], []
+    step = 0
+    while step < len(decreasing):
+        if not decreasing[step]:
+            step += 1
+            continue
+        end = step
+        while end < len(decreasing) and decreasing[end]:
+            end += 1
+        # The readings step to end (included) decrease.
+        if times[end] - times[step] >= min_duration:
+            slope = np.polyfit(times[step:end + 1], log_excess[step:end + 1], 1)[0]
+            starts.append(times[step])
+            rates.append(-slope)
+        step = end
+
+    if not rates:
+        raise ValueError("The CO2 concentration has no decay to estimate the air exchange rate from")
+    transition_times = np.array([times[0]] + starts[1:] + [times[-1]])
+    return models.PiecewiseConstant(
+        tuple(float(time) for time in transition_times), tuple(float(rate) for rate in rates),
+    )
+
+
+def _holding(times: np.ndarray, values: np.ndarray) -> models.PiecewiseConstant:
+    # The piecewise constant function with each reading holding until the
+    # next one (the last one for as long as the previous reading interval).
+    if len(times) < 2:
+        raise ValueError("At least two readings are needed")
+    end = times[-1] + (times[-1] - times[-2])
+    return models.PiecewiseConstant(
+        tuple(float(time) for time in times) + (float(end),),
+        tuple(float(value) for value in values),
+    )
+
+
+def compress(function: models.PiecewiseConstant, tolerance: float) -> models.PiecewiseConstant:
+    """
+    Approximate a piecewise constant function by one with as few segments
+    as possible (found greedily from the start), none of which differs from
+    the original by more than ``tolerance``. NaN values (missing readings)
+    take the value of the segment they fall in.
+
+    """
+    times = [float(time) for time in function.transition_times]
+    values = [float(value) for value in function.values]
+    new_times, new_values = [times[0]], []
+    low = high = float('nan')
+    previous_time = times[0]
+    for time, value in zip(times[1:], values):
+        if np.isnan(value):
+            pass
+        elif np.isnan(low):
+            low = high = value
+        elif max(high, value) - min(low, value) > 2 * tolerance:
+            new_values.append((low + high) / 2)
+            low = high = value
+            # The segment ends where this reading starts.
+            new_times.append(previous_time)
+        else:
+            low, high = min(low, value), max(high, value)
+        previous_time = time
+    if np.isnan(low):
+        raise ValueError("The function has no values")
+    new_values.append((low + high) / 2)
+    new_times.append(times[-1])
+    return models.PiecewiseConstant(tuple(new_times), tuple(new_values))
+
+
+def ventilation_from_log(
+        source: PathOrFile,
+        active: typing.Optional[models.Interval] = None,
+        volume: typing.Optional[float] = None,
+        airflow_column: typing.Optional[str] = None,
+        co2_column: str = 'co2',
+        time_column: str = 'time',
+        tolerance: float = 0.1,
+        **co2_options,
+) -> models.TimeVaryingAirChange:
+    """
+    The ventilation measured by a sensor log: from the ``airflow_column``
+    (m³/h) and the room ``volume`` if given, or else from the decays of the
+    ``co2_column`` (see :func:`air_exchange_from_co2`). The air exchange rate
+    is compressed to within ``tolerance`` h^-1 (see :func:`compress`), and
+    the ventilation is ``active`` all the time by default.
+
+    """
+    if airflow_column is not None:
+        if volume is None:
+            raise ValueError("The volume of the room is needed to use an airflow")
+        log = read_sensor_log(source, [airflow_column], time_column)
+        air_exch = air_exchange_from_airflow(log.times, log.values[airflow_column], volume)
+    else:
+        log = read_sensor_log(source, [co2_column], time_column)
+        air_exch = air_exchange_from_co2(log.times, log.values[co2_column], **co2_options)
+    if active is None:
+        active = models.SpecificInterval(
+            ((air_exch.transition_times[0], air_exch.transition_times[-1]),),
+        )
+    return models.TimeVaryingAirChange(active=active, air_exch=compress(air_exch, tolerance))
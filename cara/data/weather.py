@@ -88,9 +88,17 @@ def mean_hourly_temperatures(wx_station: str, month: int) -> HourlyTempType:
     return wx_data()[wx_station][str(month)]
 
 
+@functools.lru_cache()
+def _timezone_finder() -> TimezoneFinder:
+    return TimezoneFinder()
+
+
+# The locations are cached, as many forms (e.g. the rooms of a batch) share
+# the same location.
+@functools.lru_cache(maxsize=1024)
 def timezone_at(*, latitude: float, longitude: float) -> datetime.tzinfo:
     """Find a timezone for the given location, or raise."""
-    tf = TimezoneFinder()
+    tf = _timezone_finder()
     tz_name = tf.timezone_at(lat=latitude, lng=longitude)
     tz = dateutil.tz.gettz(tz_name)
     if tz_name is None or tz is None:
@@ -138,6 +146,7 @@ def refine_hourly_data(source_times, hourly_data, npts):
     return target_time_boundaries, data
 
 
+@functools.lru_cache(maxsize=1024)
 def nearest_wx_station(*, longitude: float, latitude: float) -> WxStationRecordType:
     """
     Given a latitude & longitude, return the nearest station with valid weather data.
@@ -32,7 +32,10 @@ or length N arrays, where N is the number of parameterisations to run; N must be
 the same for all parameters of a single model.
 
 """
+import bisect
 from dataclasses import dataclass
+import hashlib
+import math
 import typing
 
 import numpy as np
@@ -164,11 +167,8 @@ class PiecewiseConstant:
         elif time > self.transition_times[-1]:
             return self.values[-1]
 
-        for t1, t2, value in zip(self.transition_times[:-1],
-                                 self.transition_times[1:], self.values):
-            if t1 < time <= t2:
-                break
-        return value
+        # The value of the interval (t1, t2] containing the time.
+        return self.values[bisect.bisect_left(self.transition_times, time) - 1]
 
     def interval(self) -> Interval:
         # build an Interval object
@@ -255,10 +255,12 @@ class MultipleVentilation(_VentilationBase):
         Returns the rate at which air is being exchanged in the given room
         at a given time (in hours).
         """
-        return np.array([
+        # Note: summing (rather than building an array of) the rates allows
+        # vectorised rates to be mixed with scalar ones.
+        return sum(
             ventilation.air_exchange(room, time)
             for ventilation in self.ventilations
-        ]).sum(axis=0)
+        )
 
 
 @dataclass(frozen=True)
@@ -279,7 +281,7 @@ class WindowOpening(Ventilation):
     opening_length: _VectorisedFloat
 
     #: The number of windows of the given dimensions.
-    number_of_windows: int = 1
+    number_of_windows: _VectorisedInt = 1
 
     #: Minimum difference between inside and outside temperature (K).
     min_deltaT: float = 0.1
@@ -462,6 +464,26 @@ class AirChange(Ventilation):
         return self.air_exch
 
 
+@dataclass(frozen=True)
+class TimeVaryingAirChange(Ventilation):
+    """
+    An air exchange rate which varies in time, such as one derived from
+    measurements (see :mod:`cara.data.sensors`).
+
+    """
+    #: The rate (in h^-1) at which the ventilation exchanges all the air
+    #: of the room (when switched on), as a function of time.
+    air_exch: PiecewiseConstant
+
+    def transition_times(self) -> typing.Set[float]:
+        return super().transition_times() | set(self.air_exch.transition_times)
+
+    def air_exchange(self, room: Room, time: float) -> _VectorisedFloat:
+        if not self.active.triggered(time):
+            return 0.
+        return self.air_exch.value(time)
+
+
 @dataclass(frozen=True)
 class Virus:
     #: RNA copies  / mL
@@ -533,7 +555,7 @@ class Mask:
     η_inhale: _VectorisedFloat
 
     #: Global factor applied to filtration efficiency of masks when exhaling.
-    factor_exhale: float = 1.
+    factor_exhale: _VectorisedFloat = 1.
 
     #: Pre-populated examples of Masks.
     types: typing.ClassVar[typing.Dict[str, "Mask"]]
@@ -697,7 +719,7 @@ class Population:
 
     """
     #: How many in the population.
-    number: int
+    number: _VectorisedInt
 
     #: The times in which the people are in the room.
     presence: Interval
@@ -864,13 +886,14 @@ class ConcentrationModel:
         Find the nearest future state change.
 
         """
-        for change_time in self.state_change_times():
-            if change_time >= time:
-                return change_time
-        raise ValueError(
-            f"The requested time ({time}) is greater than last available "
-            f"state change time ({change_time})"
-        )
+        times = self.state_change_times()
+        index = bisect.bisect_left(times, time)
+        if index == len(times):
+            raise ValueError(
+                f"The requested time ({time}) is greater than last available "
+                f"state change time ({times[-1]})"
+            )
+        return times[index]
 
     @method_cache
     def _normed_concentration_cached(self, time: float) -> _VectorisedFloat:
@@ -1008,9 +1031,47 @@ class ExposureModel:
         return (self._normed_exposure() *
                 self.concentration_model.infected.emission_rate_when_present())
 
-    def infection_probability(self) -> _VectorisedFloat:
-        exposure = self.exposure()
+    def cumulative_exposure_curves(self, times: typing.Sequence[float]) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        The exposure (in virions per meter^3) accumulated since the start,
+        and the corresponding probability of infection (in %), at each of
+        the given (increasing) times, as arrays whose first axis is that of
+        the times (and the second that of the samples, if vectorised).
+
+        The curves are computed in a single pass over the presence
+        intervals, and end with the values of :meth:`exposure` and
+        :meth:`infection_probability` (the exposure of repeated events
+        accumulating in step).
+
+        """
+        times = [float(time) for time in times]
+        if any(time2 < time1 for time1, time2 in zip(times[:-1], times[1:])):
+            raise ValueError("The times must be increasing")
+        boundaries = self.exposed.presence.boundaries()
+        # Between two consecutive points the exposed population is either
+        # present or absent throughout.
+        points = sorted(set(times).union(*[set(boundary) for boundary in boundaries]))
+
+        normed_exposures: typing.Dict[float, _VectorisedFloat] = {points[0]: 0.}
+        normed_exposure: _VectorisedFloat = 0.
+        for start, stop in zip(points[:-1], points[1:]):
+            if self.exposed.person_present(stop):
+                normed_exposure = normed_exposure + (
+                    self.concentration_model.normed_integrated_concentration(start, stop)
+                )
+            normed_exposures[stop] = normed_exposure
+
+        emission_rate = self.concentration_model.infected.emission_rate_when_present()
+        exposures = [normed_exposures[time] * emission_rate * self.repeats for time in times]
+        probabilities = [self._infection_probability(exposure) for exposure in exposures]
+        curves = np.broadcast_arrays(*exposures, *probabilities)
+        return (
+            np.array(curves[:len(times)], dtype=float),
+            np.array(curves[len(times):], dtype=float),
+        )
 
+    def _infection_probability(self, exposure: _VectorisedFloat) -> _VectorisedFloat:
+        """The infection probability for the given exposure (in virions per meter^3)."""
         inf_aero = (
             self.exposed.activity.inhalation_rate *
             (1 - self.exposed.mask.inhale_efficiency()) *
@@ -1020,6 +1081,9 @@ class ExposureModel:
         # Probability of infection.
         return (1 - np.exp(-(inf_aero/self.concentration_model.virus.infectious_dose))) * 100
 
+    def infection_probability(self) -> _VectorisedFloat:
+        return self._infection_probability(self.exposure())
+
     def expected_new_cases(self) -> _VectorisedFloat:
         prob = self.infection_probability()
         exposed_occupants = self.exposed.number
@@ -1031,7 +1095,7 @@ class ExposureModel:
         cases directly generated by one infected case in a population.
 
         """
-        if self.concentration_model.infected.number == 1:
+        if np.all(self.concentration_model.infected.number == 1):
             return self.expected_new_cases()
 
         # Create an equivalent exposure model but with precisely
@@ -1041,3 +1105,295 @@ class ExposureModel:
         )
 
         return single_exposure_model.expected_new_cases()
+
+
+# The coefficients of the Taylor series of the exponential, in blocks of four
+# terms for the Paterson-Stockmeyer evaluation of _batched_expm.
+_EXPM_COEFFICIENTS = np.array([[1 / math.factorial(4 * j + i) for i in range(1, 4)] for j in range(4)])
+_EXPM_DIAGONAL_COEFFICIENTS = np.array([1 / math.factorial(4 * j) for j in range(4)])
+
+
+def _batched_expm(matrices: np.ndarray) -> np.ndarray:
+    """
+    The exponential of each of the matrices of a ``(..., n, n)`` array, by
+    scaling and squaring of its Taylor series. Unlike
+    :func:`scipy.linalg.expm`, which handles each matrix separately, this
+    computes the exponentials of all the matrices at once.
+
+    """
+    n = matrices.shape[-1]
+    norm = float(np.max(np.sum(np.abs(matrices), axis=-2), initial=0.))
+    # Scale the matrices so that the truncation error of the series (of
+    # degree 15) is below the floating point precision.
+    squarings = max(0, int(np.ceil(np.log2(norm / 0.5)))) if norm > 0 else 0
+    a = matrices / 2. ** squarings
+    a2 = a @ a
+    a3 = a2 @ a
+    a4 = a2 @ a2
+    blocks = np.tensordot(_EXPM_COEFFICIENTS, np.stack([a, a2, a3]), axes=1)
+    diagonal = np.arange(n)
+    blocks[..., diagonal, diagonal] += _EXPM_DIAGONAL_COEFFICIENTS.reshape((4,) + (1,) * (a.ndim - 1))
+    result = blocks[3]
+    for block in blocks[2::-1]:
+        result = block + a4 @ result
+    for _ in range(squarings):
+        result = result @ result
+    return result
+
+
+@dataclass(frozen=True)
+class InterZoneFlow:
+    """
+    A flow of air from one zone of a :class:`MultiZoneConcentrationModel`
+    to another.
+
+    """
+    #: The times at which the air flows.
+    active: Interval
+
+    #: The indices of the zones from which, and to which, the air flows.
+    from_zone: int
+    to_zone: int
+
+    #: The flow of air (m^3 / h).
+    flow: _VectorisedFloat
+
+    def transition_times(self) -> typing.Set[float]:
+        return self.active.transition_times()
+
+    def flow_rate(self, time: float) -> _VectorisedFloat:
+        """The flow of air (m^3 / h) at the given time."""
+        if not self.active.triggered(time):
+            return 0.
+        return self.flow
+
+
+@dataclass(frozen=True)
+class MultiZoneConcentrationModel:
+    """
+    The concentration of viruses in several well-mixed zones (the rooms of
+    a floor, or the parts of an open space), which are each ventilated and
+    which exchange air with each other.
+
+    Between two state changes the concentrations follow a linear system,
+    ``dc/dt = A c + s``, with a constant transfer matrix ``A``. The
+    concentrations, and their integrals, at the end of each such segment
+    are computed with the exponential of an augmented matrix, for all of
+    the samples of the model at once, and once for all the queries.
+
+    Note that these (batched) matrix exponentials make the model slower
+    than as many independent single zone models (e.g. than ten independent
+    rooms): it is only worth using when the flows between the zones matter.
+
+    """
+    #: The zones, each with its own volume and humidity.
+    zones: typing.Tuple[Room, ...]
+
+    #: The ventilation of each of the zones (i.e. from and to the outside).
+    ventilations: typing.Tuple[_VentilationBase, ...]
+
+    #: The infected population, and the index of the zone in which it is.
+    infected: _PopulationWithVirus
+    infected_zone: int = 0
+
+    #: The flows of air between the zones.
+    flows: typing.Tuple[InterZoneFlow, ...] = ()
+
+    def __post_init__(self):
+        if len(self.zones) != len(self.ventilations):
+            raise ValueError("zones and ventilations should contain the "
+                             "same number of elements")
+        for flow in self.flows:
+            for zone in (flow.from_zone, flow.to_zone):
+                if not 0 <= zone < len(self.zones):
+                    raise ValueError(f"There is no zone {zone}")
+
+    @property
+    def virus(self):
+        return self.infected.virus
+
+    @method_cache
+    def _zone_models(self) -> typing.Tuple[ConcentrationModel, ...]:
+        # The single zone models, used for the removal rate of each zone.
+        return tuple(
+            ConcentrationModel(room=zone, ventilation=ventilation, infected=self.infected)
+            for zone, ventilation in zip(self.zones, self.ventilations)
+        )
+
+    @method_cache
+    def state_change_times(self) -> typing.List[float]:
+        """
+        All time dependent entities on this model must provide information about
+        the times at which their state changes.
+
+        """
+        state_change_times = {0.}
+        state_change_times.update(self.infected.presence.transition_times())
+        for ventilation in self.ventilations:
+            state_change_times.update(ventilation.transition_times())
+        for flow in self.flows:
+            state_change_times.update(flow.transition_times())
+        return sorted(state_change_times)
+
+    @method_cache
+    def _first_presence_time(self) -> float:
+        return self.infected.presence.boundaries()[0][0]
+
+    def _augmented_matrix(self, time: float) -> np.ndarray:
+        """
+        The matrix ``[[A, s], [0, 0]]`` of the segment ending at ``time``,
+        with ``A`` the transfer matrix and ``s`` the source (normalized by
+        the emission rate), whose exponential propagates the
+        concentrations. Its shape is ``(..., n_zones + 1, n_zones + 1)``,
+        the first axis being the sample axis of vectorised models.
+
+        """
+        n_zones = len(self.zones)
+        volumes = [zone.volume for zone in self.zones]
+        removal_rates = [model.infectious_virus_removal_rate(time) for model in self._zone_models()]
+        flow_rates = [flow.flow_rate(time) for flow in self.flows]
+        shape = np.broadcast_shapes(*(np.shape(value) for value in volumes + removal_rates + flow_rates))
+
+        matrix = np.zeros(shape + (n_zones + 1, n_zones + 1))
+        for zone, removal_rate in enumerate(removal_rates):
+            matrix[..., zone, zone] -= removal_rate
+        for flow, flow_rate in zip(self.flows, flow_rates):
+            matrix[..., flow.from_zone, flow.from_zone] -= flow_rate / volumes[flow.from_zone]
+            matrix[..., flow.to_zone, flow.from_zone] += flow_rate / volumes[flow.to_zone]
+        if self.infected.person_present(time):
+            matrix[..., self.infected_zone, n_zones] = 1. / volumes[self.infected_zone]
+        return matrix
+
+    def _propagate(
+            self,
+            state: typing.Tuple[np.ndarray, np.ndarray],
+            matrix: np.ndarray,
+            exponential: np.ndarray,
+            delta_time: float,
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        # Propagate the (concentrations, integrated concentrations) by
+        # ``delta_time``, given the augmented matrix of the segment and its
+        # exponential (times ``delta_time``).
+        n_zones = len(self.zones)
+        concentrations, integrals = state
+        transfer, source = matrix[..., :n_zones, :n_zones], matrix[..., :n_zones, n_zones]
+        new_concentrations = np.einsum(
+            '...ij,...j->...i', exponential[..., :n_zones, :n_zones], concentrations,
+        ) + exponential[..., :n_zones, n_zones]
+        # Integrating dc/dt = A c + s over the segment gives its integral.
+        # Note that A can always be inverted, as the deposition removes
+        # viruses from all of the zones.
+        integral = np.linalg.solve(
+            transfer, (new_concentrations - concentrations - source * delta_time)[..., np.newaxis],
+        )[..., 0]
+        return new_concentrations, integrals + integral
+
+    @method_cache
+    def _segment_table(self) -> typing.List[typing.Tuple[np.ndarray, np.ndarray]]:
+        """
+        The concentrations in each zone, and their integrals since the
+        start, at each of the state change times (normalized by the
+        emission rate).
+
+        """
+        n_zones = len(self.zones)
+        times = self.state_change_times()
+        state = (np.zeros(n_zones), np.zeros(n_zones))
+        table = [state]
+        # Segments with the same matrix and duration (typically, between
+        # the transitions of periodic intervals) share their exponential.
+        exponentials: typing.Dict[typing.Tuple[float, typing.Tuple[int, ...], str], np.ndarray] = {}
+        for start, stop in zip(times[:-1], times[1:]):
+            if stop > self._first_presence_time():
+                matrix = self._augmented_matrix(stop)
+                key = (stop - start, matrix.shape, hashlib.sha1(matrix.tobytes()).hexdigest())
+                if key not in exponentials:
+                    exponentials[key] = _batched_expm(matrix * (stop - start))
+                state = self._propagate(state, matrix, exponentials[key], stop - start)
+            table.append(state)
+        return table
+
+    @method_cache
+    def _state(self, time: float) -> typing.Tuple[np.ndarray, np.ndarray]:
+        times = self.state_change_times()
+        if time > times[-1]:
+            raise ValueError(
+                f"The requested time ({time}) is greater than last available "
+                f"state change time ({times[-1]})"
+            )
+        index = max(int(np.searchsorted(times, time, side='right')) - 1, 0)
+        if times[index] == time or time <= self._first_presence_time():
+            return self._segment_table()[index]
+        matrix = self._augmented_matrix(times[index + 1])
+        delta_time = time - times[index]
+        return self._propagate(
+            self._segment_table()[index], matrix, _batched_expm(matrix * delta_time), delta_time,
+        )
+
+    def _normed_concentration(self, time: float, zone: int) -> _VectorisedFloat:
+        """
+        Virus exposure concentration in the given zone, as a function of
+        time, and normalized by the emission rate.
+
+        """
+        concentrations, _ = self._state(time)
+        return concentrations[..., zone]
+
+    def concentration(self, time: float, zone: int) -> _VectorisedFloat:
+        """
+        Virus exposure concentration in the given zone, as a function of time.
+
+        Note that time is not vectorised. You can only pass a single float
+        to this method.
+        """
+        return (self._normed_concentration(time, zone) *
+                self.infected.emission_rate_when_present())
+
+    def normed_integrated_concentration(self, start: float, stop: float, zone: int) -> _VectorisedFloat:
+        """
+        Get the integrated concentration of viruses in the air of the given
+        zone between the times start and stop, normalized by the emission
+        rate.
+        """
+        if stop <= self._first_presence_time():
+            return 0.0
+        return self._state(stop)[1][..., zone] - self._state(start)[1][..., zone]
+
+    def integrated_concentration(self, start: float, stop: float, zone: int) -> _VectorisedFloat:
+        """
+        Get the integrated concentration of viruses in the air of the given
+        zone between the times start and stop.
+        """
+        return (self.normed_integrated_concentration(start, stop, zone) *
+                self.infected.emission_rate_when_present())
+
+
+@dataclass(frozen=True)
+class ZoneConcentrationModel:
+    """
+    The concentration in one of the zones of a multi-zone model, which can
+    be used as the concentration model of an :class:`ExposureModel` to get
+    the exposure of the people in that zone.
+
+    """
+    multizone_model: MultiZoneConcentrationModel
+
+    #: The index of the zone.
+    zone: int
+
+    @property
+    def virus(self):
+        return self.multizone_model.virus
+
+    @property
+    def infected(self):
+        return self.multizone_model.infected
+
+    def concentration(self, time: float) -> _VectorisedFloat:
+        return self.multizone_model.concentration(time, self.zone)
+
+    def normed_integrated_concentration(self, start: float, stop: float) -> _VectorisedFloat:
+        return self.multizone_model.normed_integrated_concentration(start, stop, self.zone)
+
+    def integrated_concentration(self, start: float, stop: float) -> _VectorisedFloat:
+        return self.multizone_model.integrated_concentration(start, stop, self.zone)
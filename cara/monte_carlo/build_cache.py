@@ -0,0 +1,134 @@
+"""
+Incremental building of Monte Carlo models.
+
+A :class:`BuildCache` remembers the models which it has built, so that
+when a Monte Carlo model is rebuilt after some of its parameters have
+changed (typically when a single form field has been edited) only the
+sub-models whose inputs changed are rebuilt. Unchanged sub-models are
+reused as-is, along with any results which they have already cached (such
+as the concentrations of an unchanged concentration model), and the
+distributions of rebuilt sub-models reuse their previous samples.
+
+Sub-models and samples are remembered by their position in the model, so
+that two occurrences of the same distribution (or of the same sub-model)
+are still sampled independently, exactly as with
+:meth:`cara.monte_carlo.MCModelBase.build_model`.
+
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+import typing
+
+import numpy as np
+
+from .models import MCModelBase, _ModelType
+from .sampleable import SampleableDistribution
+
+
+class _Identity:
+    # A hashable reference to an unhashable object, compared by identity.
+    def __init__(self, item):
+        self.item = item
+
+    def __hash__(self):
+        return id(self.item)
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and other.item is self.item
+
+
+def fingerprint(item) -> typing.Hashable:
+    """
+    A hashable description of the declarative inputs of a (Monte Carlo)
+    model. Distributions are identified by identity, all other values by
+    value.
+
+    """
+    if isinstance(item, MCModelBase):
+        return (type(item),) + tuple(
+            fingerprint(getattr(item, name)) for name in item._base_field_names
+        )
+    elif isinstance(item, tuple):
+        return (tuple,) + tuple(fingerprint(sub) for sub in item)
+    elif isinstance(item, np.ndarray):
+        return (np.ndarray, item.dtype.str, item.shape, hashlib.sha1(item.tobytes()).hexdigest())
+    try:
+        hash(item)
+    except TypeError:
+        return _Identity(item)
+    return (type(item), item)
+
+
+class BuildCache:
+    def __init__(self, maxsize: int = 128):
+        #: The maximum number of built sub-models, and of sampled
+        #: distributions, which are remembered.
+        self.maxsize = maxsize
+
+        #: The number of sub-models which were reused or (re)built.
+        self.hits = 0
+        self.misses = 0
+
+        self._models: typing.MutableMapping[typing.Hashable, typing.Any] = OrderedDict()
+        self._samples: typing.MutableMapping[typing.Hashable, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        self._models.clear()
+        self._samples.clear()
+
+    def _lookup(self, store, key):
+        value = store.get(key)
+        if value is not None:
+            store.move_to_end(key)
+        return value
+
+    def _store(self, store, key, value):
+        store[key] = value
+        while len(store) > self.maxsize:
+            store.popitem(last=False)
+
+    def build_model(self, mc_model: MCModelBase[_ModelType], size: int) -> _ModelType:
+        """
+        Build the given Monte Carlo model, reusing the previously built
+        sub-models whose inputs haven't changed.
+
+        """
+        with self._lock:
+            return self._build(mc_model, size, ())
+
+    def _build(self, mc_model: MCModelBase, size: int, path: tuple):
+        key = (path, size, fingerprint(mc_model))
+        model = self._lookup(self._models, key)
+        if model is not None:
+            self.hits += 1
+            return model
+
+        self.misses += 1
+        kwargs = {}
+        for name in mc_model._base_field_names:
+            kwargs[name] = self._to_vectorized_form(
+                getattr(mc_model, name), size, path + (name,),
+            )
+        model = mc_model._base_cls(**kwargs)  # type: ignore
+        self._store(self._models, key, model)
+        return model
+
+    def _to_vectorized_form(self, item, size: int, path: tuple):
+        if isinstance(item, SampleableDistribution):
+            key = (path, size, item)
+            samples = self._lookup(self._samples, key)
+            if samples is None:
+                samples = item.generate_samples(size)
+                self._store(self._samples, key, samples)
+            return samples
+        elif isinstance(item, MCModelBase):
+            return self._build(item, size, path)
+        elif isinstance(item, tuple):
+            return tuple(
+                self._to_vectorized_form(sub, size, path + (index,))
+                for index, sub in enumerate(item)
+            )
+        else:
+            return item
@@ -3,13 +3,25 @@ import dataclasses
 import sys
 import typing
 
+import numpy as np
+
 import cara.models
 
-from .sampleable import SampleableDistribution, _VectorisedFloatOrSampleable
+from .sampleable import SampleableDistribution, _VectorisedFloatOrSampleable, _VectorisedIntOrSampleable
+
+if typing.TYPE_CHECKING:
+    from .build_cache import BuildCache
 
 
 _ModelType = typing.TypeVar('_ModelType')
 
+#: A callable which generates ``size`` samples of the given distribution.
+_SampleFunction = typing.Callable[[SampleableDistribution, int], np.ndarray]
+
+
+def _generate_samples(distribution: SampleableDistribution, size: int) -> np.ndarray:
+    return distribution.generate_samples(size)
+
 
 class MCModelBase(typing.Generic[_ModelType]):
     """
@@ -22,30 +34,170 @@ class MCModelBase(typing.Generic[_ModelType]):
     """
     _base_cls: typing.Type[_ModelType]
 
+    #: The names of the fields of ``_base_cls``, in constructor order.
+    _base_field_names: typing.Tuple[str, ...]
+
     @classmethod
-    def _to_vectorized_form(cls, item, size):
+    def _to_vectorized_form(cls, item, size, sample: _SampleFunction):
         if isinstance(item, SampleableDistribution):
-            return item.generate_samples(size)
+            return sample(item, size)
         elif isinstance(item, MCModelBase):
-            # Recurse into other MCModelBase instances by calling their
-            # build_model method.
-            return item.build_model(size)
+            # Recurse into other MCModelBase instances.
+            kwargs = {}
+            for name in item._base_field_names:
+                kwargs[name] = cls._to_vectorized_form(getattr(item, name), size, sample)
+            return item._base_cls(**kwargs)
         elif isinstance(item, tuple):
-            return tuple(cls._to_vectorized_form(sub, size) for sub in item)
+            return tuple(cls._to_vectorized_form(sub, size, sample) for sub in item)
         else:
             return item
 
-    def build_model(self, size: int) -> _ModelType:
+    def _build_model(self, size: int, sample: _SampleFunction) -> _ModelType:
+        # Compiling is cheap compared to a build (which is dominated by the
+        # sampling), and is done for each build so that changes made to this
+        # (mutable) model are always taken into account. Repeated builds of
+        # an unchanged model can keep the plan instead (see compile).
+        return self.compile().build(size, sample)
+
+    def build_model(self, size: int, cache: typing.Optional["BuildCache"] = None) -> _ModelType:
         """
         Turn this MCModelBase subclass into a cara.models Model instance
         from which you can then run the model.
 
+        If a :class:`cara.monte_carlo.build_cache.BuildCache` is given, the
+        sub-models which are unchanged since a previous build through the
+        same cache are reused rather than being rebuilt.
+
+        """
+        if cache is not None:
+            return cache.build_model(self, size)
+        return self._build_model(size, _generate_samples)
+
+    def build_weighted_model(self, size: int) -> typing.Tuple[_ModelType, np.ndarray]:
+        """
+        Like :meth:`build_model`, but importance sampled distributions (such
+        as :class:`cara.monte_carlo.sampleable.TailBiased`) draw biased
+        samples. The per-sample likelihood weights are returned alongside the
+        model, and should be used for any statistic computed from it (see
+        :mod:`cara.monte_carlo.statistics`).
+
+        """
+        weights = np.ones(size)
+
+        def sample(distribution: SampleableDistribution, size: int) -> np.ndarray:
+            nonlocal weights
+            samples, sample_weights = distribution.generate_weighted_samples(size)
+            weights = weights * sample_weights
+            return samples
+
+        model = self._build_model(size, sample)
+        return model, weights
+
+    def build_antithetic_model(self, size: int) -> _ModelType:
+        """
+        Like :meth:`build_model`, but symmetric distributions are sampled in
+        antithetic pairs: sample ``i`` of the second half of the model mirrors
+        sample ``i`` of the first half. Statistics should then be computed on
+        the pair averages (see :func:`cara.monte_carlo.statistics.antithetic_mean`).
+
+        """
+        if size % 2:
+            raise ValueError("An antithetic model must have an even sample size")
+        return self._build_model(
+            size, lambda distribution, size: distribution.generate_antithetic_samples(size),
+        )
+
+    def compile(self) -> "BuildPlan[_ModelType]":
         """
-        kwargs = {}
-        for field in dataclasses.fields(self._base_cls):
-            attr = getattr(self, field.name)
-            kwargs[field.name] = self._to_vectorized_form(attr, size)
-        return self._base_cls(**kwargs)  # type: ignore
+        Compile this model into a :class:`BuildPlan`, which builds the same
+        models as :meth:`build_model`. The builds of this model go through
+        such a plan; keep it to build the same model repeatedly (e.g. in a
+        sweep) without compiling it each time.
+
+        Note that the plan is a snapshot: changes made to this model after
+        compilation are not reflected in the plan.
+
+        """
+        operations: typing.List[tuple] = []
+        _compile_item(self, operations)
+        return BuildPlan(operations)
+
+
+# The operations of a BuildPlan, which are run against a stack of values.
+#: Push the argument.
+_PUSH = 0
+#: Push samples of the argument (a distribution).
+_SAMPLE = 1
+#: Replace the top ``argument`` values with a tuple of them.
+_TUPLE = 2
+#: Replace the top ``len(fields)`` values with a model constructed from them.
+_CONSTRUCT = 3
+
+
+def _compile_item(item, operations: typing.List[tuple]) -> None:
+    start = len(operations)
+    if isinstance(item, SampleableDistribution):
+        operations.append((_SAMPLE, item))
+        return
+    elif isinstance(item, MCModelBase):
+        for name in item._base_field_names:
+            _compile_item(getattr(item, name), operations)
+        operations.append((_CONSTRUCT, item._base_cls))
+    elif isinstance(item, tuple):
+        for sub in item:
+            _compile_item(sub, operations)
+        operations.append((_TUPLE, len(item)))
+    else:
+        operations.append((_PUSH, item))
+        return
+
+    if all(operation[0] != _SAMPLE for operation in operations[start:]):
+        # Nothing is sampled in this sub-tree, so it always builds the same
+        # value: build it once, now.
+        value: typing.Any = BuildPlan(operations[start:]).build(0)
+        del operations[start:]
+        operations.append((_PUSH, value))
+
+
+class BuildPlan(typing.Generic[_ModelType]):
+    """
+    A flat list of the operations needed to build a model from a
+    :class:`MCModelBase` (see :meth:`MCModelBase.compile`).
+
+    """
+    def __init__(self, operations: typing.Sequence[tuple]):
+        operations = list(operations)
+        for index, (opcode, argument) in enumerate(operations):
+            if opcode == _CONSTRUCT:
+                # Store the number of constructor arguments with the class.
+                operations[index] = (opcode, (argument, len(dataclasses.fields(argument))))
+        self._operations = tuple(operations)
+
+    def build(self, size: int, sample: _SampleFunction = _generate_samples) -> _ModelType:
+        """
+        Build the model with ``size`` samples, drawn with ``sample``.
+
+        Sub-models which don't contain any distribution are shared between
+        all of the models built by the plan.
+
+        """
+        stack: typing.List[typing.Any] = []
+        push = stack.append
+        for opcode, argument in self._operations:
+            if opcode == _PUSH:
+                push(argument)
+            elif opcode == _SAMPLE:
+                push(sample(argument, size))
+            elif opcode == _CONSTRUCT:
+                cls, n_args = argument
+                args = stack[-n_args:] if n_args else []
+                del stack[len(stack) - n_args:]
+                push(cls(*args))
+            else:
+                value = tuple(stack[-argument:]) if argument else ()
+                del stack[len(stack) - argument:]
+                push(value)
+        return stack.pop()
 
 
 def _build_mc_model(model: _ModelType) -> typing.Type[MCModelBase[_ModelType]]:
@@ -60,6 +212,8 @@ def _build_mc_model(model: _ModelType) -> typing.Type[MCModelBase[_ModelType]]:
         new_field = copy.copy(field)
         if field.type is cara.models._VectorisedFloat:  # noqa
             new_field.type = _VectorisedFloatOrSampleable   # type: ignore
+        elif field.type is cara.models._VectorisedInt:  # noqa
+            new_field.type = _VectorisedIntOrSampleable   # type: ignore
 
         field_type: typing.Any = new_field.type
 
@@ -97,7 +251,10 @@ def _build_mc_model(model: _ModelType) -> typing.Type[MCModelBase[_ModelType]]:
         model.__name__,  # type: ignore
         fields,  # type: ignore
         bases=tuple(bases),  # type: ignore
-        namespace={'_base_cls': model},
+        namespace={
+            '_base_cls': model,
+            '_base_field_names': tuple(field.name for field in dataclasses.fields(model)),
+        },
         # This thing can be mutable - the calculations live on
         # the wrapped class, not on the MCModelBase.
         frozen=False,
@@ -120,4 +277,4 @@ for _model in _MODEL_CLASSES:
 
 
 # Make sure that each of the models is imported if you do a ``import *``.
-__all__ = [_model.__name__ for _model in _MODEL_CLASSES] + ["MCModelBase"]
+__all__ = [_model.__name__ for _model in _MODEL_CLASSES] + ["MCModelBase", "BuildPlan"]
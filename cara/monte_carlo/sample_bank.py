@@ -0,0 +1,206 @@
+"""
+Persistent banks of pre-generated samples for the standard distributions.
+
+A :class:`SampleBank` generates a large, seeded, sample of each registered
+distribution once, stores it in a ``.npy`` file, and then serves slices of
+it through :func:`numpy.memmap`. Models built through the bank therefore
+cost almost nothing to sample, are deterministic, and share the sample
+pages (through the OS page cache) between all of the processes which use
+the same bank directory.
+
+Note that, being deterministic, two models built through the same bank use
+the same samples for the same distributions (common random numbers), which
+is desirable when comparing scenarios.
+
+"""
+import dataclasses
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import re
+import threading
+import typing
+import zlib
+
+import numpy as np
+
+from .models import MCModelBase, _ModelType, _SampleFunction
+from .sampleable import SampleableDistribution
+
+
+class SampleBank:
+    def __init__(
+            self,
+            directory: typing.Union[str, Path],
+            bank_size: int = 1000000,
+            seed: int = 0,
+            include_standard_distributions: bool = True,
+    ):
+        #: The directory in which the ``.npy`` banks are stored.
+        self.directory = Path(directory)
+
+        #: The number of samples in each bank.
+        self.bank_size = bank_size
+
+        #: The seed, from which the seed of each bank is derived.
+        self.seed = seed
+
+        #: Whether the distributions of :mod:`cara.monte_carlo.data` are
+        #: served by this bank.
+        self.include_standard_distributions = include_standard_distributions
+
+        self._registered: typing.Dict[str, SampleableDistribution] = {}
+        self._reset()
+
+    def _reset(self):
+        # Per-process state, which is re-built lazily.
+        self._names: typing.Optional[typing.Dict[int, str]] = None
+        self._banks: typing.Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state.update(_names=None, _banks={})
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def register(self, name: str, distribution: SampleableDistribution) -> None:
+        """
+        Serve the given distribution from this bank. Distributions are
+        recognised by identity, so the same instance must be used in the
+        models built through the bank.
+
+        """
+        self._registered[name] = distribution
+        self._names = None
+
+    def _standard_distributions(self) -> typing.Iterator[typing.Tuple[str, SampleableDistribution]]:
+        from . import data
+
+        for dict_name in ['activity_distributions', 'activity_distributions2',
+                          'mask_distributions', 'mask_distributions2',
+                          'virus_distributions']:
+            for key, mc_model in getattr(data, dict_name).items():
+                for field in dataclasses.fields(mc_model):
+                    value = getattr(mc_model, field.name)
+                    if isinstance(value, SampleableDistribution):
+                        yield f'{dict_name}.{key}.{field.name}', value
+
+    def distributions(self) -> typing.Dict[str, SampleableDistribution]:
+        """The distributions served by this bank, by name."""
+        distributions: typing.Dict[str, SampleableDistribution] = {}
+        seen = set()
+        if self.include_standard_distributions:
+            for name, distribution in self._standard_distributions():
+                # Distributions shared between several definitions
+                # (e.g. the viral load) have a single bank.
+                if id(distribution) not in seen:
+                    distributions[name] = distribution
+                    seen.add(id(distribution))
+        distributions.update(self._registered)
+        return distributions
+
+    def _name_of(self, distribution: SampleableDistribution) -> typing.Optional[str]:
+        if self._names is None:
+            self._names = {
+                id(dist): name for name, dist in self.distributions().items()
+            }
+        return self._names.get(id(distribution))
+
+    def _bank_path(self, name: str, distribution: SampleableDistribution) -> Path:
+        try:
+            parameters = pickle.dumps(vars(distribution))
+        except Exception:  # noqa
+            # For example, custom distributions defined by lambdas.
+            parameters = b''
+        fingerprint = hashlib.sha1(
+            type(distribution).__name__.encode() + parameters
+        ).hexdigest()[:12]
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        return self.directory / f'{safe_name}-{fingerprint}-{self.seed}-{self.bank_size}.npy'
+
+    def _generate(self, name: str, distribution: SampleableDistribution, path: Path):
+        # Seed the global random state (used by the distributions) for the
+        # generation, without disturbing it for anybody else.
+        random_state = np.random.get_state()
+        try:
+            np.random.seed(zlib.crc32(name.encode()) ^ self.seed)
+            samples = np.asarray(distribution.generate_samples(self.bank_size), dtype=float)
+        finally:
+            np.random.set_state(random_state)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename, so that concurrent processes
+        # never see a partially written bank.
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        with tmp_path.open('wb') as fh:
+            np.save(fh, samples)
+        os.replace(tmp_path, path)
+
+    def bank(self, name: str) -> np.ndarray:
+        """The (read-only, memory-mapped) bank of the given distribution."""
+        if name not in self._banks:
+            # Banks are generated on first use: make sure that the threads
+            # of a process (e.g. a background generation, see
+            # :meth:`generate_in_background`) don't generate the same one.
+            with self._lock:
+                if name not in self._banks:
+                    distribution = self.distributions()[name]
+                    path = self._bank_path(name, distribution)
+                    if not path.exists():
+                        self._generate(name, distribution, path)
+                    self._banks[name] = np.load(path, mmap_mode='r')
+        return self._banks[name]
+
+    def generate_all(self) -> None:
+        """Make sure that the bank of each distribution exists."""
+        for name in self.distributions():
+            self.bank(name)
+
+    def generate_in_background(self) -> threading.Thread:
+        """
+        Generate the banks (see :meth:`generate_all`) in a daemon thread,
+        and return it. The banks which are needed before it is done are
+        generated by whoever needs them.
+
+        """
+        thread = threading.Thread(target=self.generate_all, name='sample-bank', daemon=True)
+        thread.start()
+        return thread
+
+    def sampler(self) -> _SampleFunction:
+        """
+        A sample function (for a single build) which serves the registered
+        distributions from their banks as zero-copy views.
+
+        If a distribution appears several times in the build each occurrence
+        gets a different slice of the bank. Distributions which aren't
+        registered, or which need more samples than the bank holds, are
+        sampled as usual.
+
+        """
+        occurrences: typing.Dict[str, int] = {}
+
+        def sample(distribution: SampleableDistribution, size: int) -> np.ndarray:
+            name = self._name_of(distribution)
+            if name is not None:
+                start = occurrences.get(name, 0) * size
+                if start + size <= self.bank_size:
+                    occurrences[name] = occurrences.get(name, 0) + 1
+                    return self.bank(name)[start:start + size]
+            return distribution.generate_samples(size)
+
+        return sample
+
+    def build_model(self, mc_model: MCModelBase[_ModelType], size: int) -> _ModelType:
+        """
+        Build the given Monte Carlo model, serving the registered
+        distributions from their banks (see :meth:`sampler`).
+
+        """
+        return mc_model._build_model(size, self.sampler())
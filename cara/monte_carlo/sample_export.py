@@ -0,0 +1,134 @@
+"""
+Export of the per-sample values of sampled models, for analyses (e.g. of
+the tails of the distributions) outside of the calculator.
+
+The :data:`SAMPLE_COLUMNS` of each model are written as the columns of an
+Arrow table, together with a (dictionary encoded) ``scenario`` column
+naming the model of each row. The columns reference the buffers of the
+NumPy arrays of the models without copying them, and the tables are
+written as Arrow IPC files (which can be memory-mapped when they are read
+back) or as Parquet files.
+
+The export requires the optional ``pyarrow`` dependency (the ``samples``
+extra), which is only imported once samples are exported.
+
+"""
+import importlib.util
+from pathlib import Path
+import typing
+
+import numpy as np
+
+from .. import models
+
+if typing.TYPE_CHECKING:
+    import pyarrow
+
+
+#: The per-sample quantities of an exposure model which are exported.
+SAMPLE_COLUMNS: typing.Dict[str, typing.Callable[[models.ExposureModel], typing.Any]] = {
+    'emission_rate': lambda model: model.concentration_model.infected.emission_rate_when_present(),
+    'exposure': lambda model: model.exposure(),
+    'infection_probability': lambda model: model.infection_probability(),
+    'viral_load': lambda model: model.concentration_model.infected.virus.viral_load_in_sputum,
+    'inhalation_rate': lambda model: model.exposed.activity.inhalation_rate,
+    'mask_efficiency': lambda model: model.exposed.mask.inhale_efficiency(),
+}
+
+#: The formats of the exported files, by file extension.
+FORMATS = {
+    '.arrow': 'arrow',
+    '.parquet': 'parquet',
+}
+
+
+def available() -> bool:
+    """Whether the samples can be exported, i.e. whether pyarrow is installed."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _pyarrow():
+    # The pyarrow module, with its IPC and Parquet modules.
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("The export of the samples requires pyarrow (the 'samples' extra of CARA)") from None
+    return pyarrow
+
+
+def _float_column(values: typing.Any, size: int) -> "pyarrow.Array":
+    # A float64 column referencing the buffer of the given samples (or of
+    # the repeated value of a quantity which isn't sampled).
+    pyarrow = _pyarrow()
+    array = np.asarray(values, dtype=np.float64)
+    if array.shape != (size,):
+        array = np.full(size, array)
+    array = np.ascontiguousarray(array)
+    return pyarrow.Array.from_buffers(pyarrow.float64(), size, [None, pyarrow.py_buffer(array)])
+
+
+def sample_table(scenarios: typing.Dict[str, models.ExposureModel]) -> "pyarrow.Table":
+    """
+    A table of the :data:`SAMPLE_COLUMNS` of each of the given (sampled)
+    models, labelled by the names of the scenarios.
+
+    """
+    pyarrow = _pyarrow()
+    labels = pyarrow.array(list(scenarios), type=pyarrow.string())
+    tables = []
+    for index, model in enumerate(scenarios.values()):
+        size = np.size(model.infection_probability())
+        columns = {
+            'scenario': pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(np.full(size, index, dtype=np.int32)), labels,
+            ),
+        }
+        for name, quantity in SAMPLE_COLUMNS.items():
+            columns[name] = _float_column(quantity(model), size)
+        tables.append(pyarrow.table(columns))
+    return pyarrow.concat_tables(tables)
+
+
+def write_samples(path: typing.Union[str, Path], scenarios: typing.Dict[str, models.ExposureModel]) -> None:
+    """
+    Write the :func:`sample_table` of the given models to an Arrow IPC
+    (``.arrow``) or Parquet (``.parquet``) file.
+
+    """
+    path = Path(path)
+    if path.suffix not in FORMATS:
+        raise ValueError(f"Unsupported sample file {path.name} (expected {' or '.join(FORMATS)})")
+    pyarrow = _pyarrow()
+    table = sample_table(scenarios)
+    if FORMATS[path.suffix] == 'parquet':
+        pyarrow.parquet.write_table(table, str(path))
+    else:
+        with pyarrow.ipc.new_file(str(path), table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_samples(path: typing.Union[str, Path], memory_map: bool = True) -> "pyarrow.Table":
+    """
+    Read the samples written by :func:`write_samples`. The columns of an
+    Arrow IPC file are memory-mapped (unless ``memory_map`` is false)
+    rather than read.
+
+    """
+    pyarrow = _pyarrow()
+    path = Path(path)
+    if FORMATS.get(path.suffix) == 'parquet':
+        return pyarrow.parquet.read_table(str(path), memory_map=memory_map)
+    source = pyarrow.memory_map(str(path)) if memory_map else pyarrow.OSFile(str(path))
+    return pyarrow.ipc.open_file(source).read_all()
+
+
+def ipc_stream(scenarios: typing.Dict[str, models.ExposureModel]) -> bytes:
+    """The :func:`sample_table` of the given models, as an Arrow IPC stream."""
+    pyarrow = _pyarrow()
+    table = sample_table(scenarios)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
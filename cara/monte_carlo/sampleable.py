@@ -9,12 +9,35 @@ import cara.models
 # Declare a float array type of a given size.
 # There is no better way to declare this currently, unfortunately.
 float_array_size_n = np.ndarray
+int_array_size_n = np.ndarray
 
 
 class SampleableDistribution:
     def generate_samples(self, size: int) -> float_array_size_n:
         raise NotImplementedError()
 
+    def generate_weighted_samples(
+            self, size: int,
+    ) -> typing.Tuple[float_array_size_n, float_array_size_n]:
+        """
+        Generate samples together with their likelihood weights, i.e. the
+        ratio of the target density to the density actually sampled from.
+        Distributions which are not biased have unit weights.
+        """
+        return self.generate_samples(size), np.ones(size)
+
+    def generate_antithetic_samples(self, size: int) -> float_array_size_n:
+        """
+        Generate samples in antithetic pairs: sample ``i`` of the second half
+        mirrors sample ``i`` of the first half. Distributions without a
+        symmetry to exploit return independent samples.
+        """
+        return self.generate_samples(size)
+
+    def _antithetic_pairs(self, size: int, mirror: typing.Callable) -> float_array_size_n:
+        first_half = self.generate_samples(size - size // 2)
+        return np.concatenate([first_half, mirror(first_half[:size // 2])])
+
 
 class Normal(SampleableDistribution):
     """
@@ -27,6 +50,9 @@ class Normal(SampleableDistribution):
     def generate_samples(self, size: int) -> float_array_size_n:
         return np.random.normal(self.mean, self.standard_deviation, size=size)
 
+    def generate_antithetic_samples(self, size: int) -> float_array_size_n:
+        return self._antithetic_pairs(size, lambda x: 2 * self.mean - x)
+
 
 class Uniform(SampleableDistribution):
     """
@@ -39,6 +65,9 @@ class Uniform(SampleableDistribution):
     def generate_samples(self, size: int) -> float_array_size_n:
         return np.random.uniform(self.low, self.high, size=size)
 
+    def generate_antithetic_samples(self, size: int) -> float_array_size_n:
+        return self._antithetic_pairs(size, lambda x: self.low + self.high - x)
+
 
 class LogNormal(SampleableDistribution):
     """
@@ -57,6 +86,12 @@ class LogNormal(SampleableDistribution):
                                    self.standard_deviation_gaussian,
                                    size=size)
 
+    def generate_antithetic_samples(self, size: int) -> float_array_size_n:
+        # Mirror the samples of the underlying Gaussian (i.e. in log-space).
+        return self._antithetic_pairs(
+            size, lambda x: np.exp(2 * self.mean_gaussian - np.log(x)),
+        )
+
 
 class Custom(SampleableDistribution):
     """
@@ -130,6 +165,142 @@ class LogCustomKernel(SampleableDistribution):
         return 10 ** kde_model.sample(n_samples=size)[:, 0]
 
 
+class Poisson(SampleableDistribution):
+    """
+    Defines a Poisson distribution of counts, e.g. of the number of people
+    present given the expected number.
+    """
+    def __init__(self, mean: float):
+        self.mean = mean
+
+    def generate_samples(self, size: int) -> int_array_size_n:
+        return np.random.poisson(self.mean, size=size)
+
+
+class Binomial(SampleableDistribution):
+    """
+    Defines a binomial distribution of counts: the number of successes in
+    ``number`` independent trials, each with the given probability. For
+    example, the number of infected people amongst the occupants of a room,
+    given the local incidence rate (as a fraction of the population).
+    """
+    def __init__(self, number: int, probability: float):
+        if not 0 <= probability <= 1:
+            raise ValueError("probability must be in the range [0, 1]")
+        self.number = number
+        self.probability = probability
+
+    def generate_samples(self, size: int) -> int_array_size_n:
+        return np.random.binomial(self.number, self.probability, size=size)
+
+
+class EmpiricalCounts(SampleableDistribution):
+    """
+    Defines a distribution of counts from their observed frequencies.
+    """
+    def __init__(self, counts: typing.Sequence[int],
+                 frequencies: typing.Sequence[float]):
+        if len(counts) != len(frequencies):
+            raise ValueError("counts and frequencies must have the same length")
+        self.counts = np.asarray(counts, dtype=int)
+        self.frequencies = np.asarray(frequencies, dtype=float)
+
+    def generate_samples(self, size: int) -> int_array_size_n:
+        return np.random.choice(
+            self.counts, size=size, p=self.frequencies / self.frequencies.sum(),
+        )
+
+
+class TailBiased(SampleableDistribution):
+    """
+    Importance sampling of the upper tail of a distribution.
+
+    Weighted samples are drawn from a defensive mixture: with probability
+    ``tail_fraction`` from the part of ``distribution`` above its
+    ``quantile``, and otherwise from ``distribution`` itself. The
+    likelihood weights returned by :meth:`generate_weighted_samples` undo
+    the bias, so that weighted statistics are unbiased estimates of the
+    original distribution, with many more samples in the tail.
+
+    The tail (its threshold, and the probability mass above it) is located
+    from a pilot sample of ``pilot_size`` samples. The weights of the tail
+    samples are proportional to the estimated :meth:`tail_mass`, so that
+    the weighted estimates of the tail carry its relative error, which
+    :meth:`tail_mass_standard_error` bounds.
+
+    Plain (unweighted) sampling is not biased.
+    """
+    def __init__(self, distribution: SampleableDistribution,
+                 quantile: float = 0.95, tail_fraction: float = 0.5,
+                 pilot_size: int = 1000000):
+        if not 0 < quantile < 1:
+            raise ValueError("quantile must be between 0 and 1 (exclusive)")
+        if not 0 <= tail_fraction < 1:
+            raise ValueError("tail_fraction must be in the range [0, 1)")
+        self.distribution = distribution
+        self.quantile = quantile
+        self.tail_fraction = tail_fraction
+        # The size of the sample used to locate the tail of the distribution.
+        self.pilot_size = pilot_size
+        self._threshold: typing.Optional[float] = None
+        self._tail_mass = 1 - quantile
+
+    def generate_samples(self, size: int) -> float_array_size_n:
+        return self.distribution.generate_samples(size)
+
+    def tail_threshold(self) -> float:
+        """The value above which a sample is considered to be in the tail."""
+        if self._threshold is None:
+            pilot = self.distribution.generate_samples(self.pilot_size)
+            self._threshold = float(np.quantile(pilot, self.quantile))
+            # The fraction of the pilot above the threshold, rather than
+            # 1 - quantile, which differ if the distribution has atoms.
+            self._tail_mass = float(np.mean(pilot > self._threshold))
+        return self._threshold
+
+    def tail_mass(self) -> float:
+        """The (estimated) probability that a sample is in the tail."""
+        self.tail_threshold()
+        return self._tail_mass
+
+    def tail_mass_standard_error(self) -> float:
+        """The (binomial) standard error of the estimated :meth:`tail_mass`."""
+        tail_mass = self.tail_mass()
+        return float(np.sqrt(tail_mass * (1 - tail_mass) / self.pilot_size))
+
+    def _generate_tail_samples(self, size: int) -> float_array_size_n:
+        threshold = self.tail_threshold()
+        tail = np.empty(0)
+        while tail.size < size:
+            # Over-sample slightly so that a single pass is usually enough.
+            n_draws = int((size - tail.size) / self.tail_mass() * 1.2) + 1
+            draws = self.distribution.generate_samples(n_draws)
+            tail = np.concatenate([tail, draws[draws > threshold]])
+        return tail[:size]
+
+    def generate_weighted_samples(
+            self, size: int,
+    ) -> typing.Tuple[float_array_size_n, float_array_size_n]:
+        threshold = self.tail_threshold()
+        if self.tail_mass() == 0:
+            # There is no tail to bias the samples towards.
+            return self.generate_samples(size), np.ones(size)
+        n_tail = np.random.binomial(size, self.tail_fraction)
+        samples = np.concatenate([
+            self.distribution.generate_samples(size - n_tail),
+            self._generate_tail_samples(n_tail),
+        ])
+        samples = samples[np.random.permutation(size)]
+
+        in_tail = samples > threshold
+        density_ratio = (1 - self.tail_fraction) + self.tail_fraction * in_tail / self.tail_mass()
+        return samples, 1. / density_ratio
+
+
 _VectorisedFloatOrSampleable = typing.Union[
     SampleableDistribution, cara.models._VectorisedFloat,
 ]
+
+_VectorisedIntOrSampleable = typing.Union[
+    SampleableDistribution, cara.models._VectorisedInt,
+]
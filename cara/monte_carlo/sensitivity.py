@@ -0,0 +1,141 @@
+"""
+Variance-based global sensitivity analysis of Monte Carlo models.
+
+The first-order and total Sobol indices of each of the distributions of a
+model are estimated with Saltelli's scheme: two independent sample
+matrices, A and B, and the matrices AB_i (A with the samples of input ``i``
+taken from B). All of the matrices are stacked along the sample axis so
+that the model is built, and evaluated, only once.
+
+"""
+import dataclasses
+import typing
+
+import numpy as np
+
+from .models import MCModelBase
+from .sampleable import SampleableDistribution
+
+
+@dataclasses.dataclass(frozen=True)
+class SobolIndices:
+    #: The names of the inputs (the path of each distribution in the model).
+    names: typing.Tuple[str, ...]
+
+    #: The first-order and total indices of each input.
+    first_order: np.ndarray
+    total: np.ndarray
+
+    #: The (lower, upper) bounds of the bootstrap confidence interval of
+    #: each index, with shape ``(n_inputs, 2)``.
+    first_order_interval: np.ndarray
+    total_interval: np.ndarray
+
+    def to_dict(self) -> dict:
+        """A JSON serialisable description of the indices, by input."""
+        return {
+            name: {
+                'first_order': float(self.first_order[i]),
+                'first_order_interval': self.first_order_interval[i].tolist(),
+                'total': float(self.total[i]),
+                'total_interval': self.total_interval[i].tolist(),
+            }
+            for i, name in enumerate(self.names)
+        }
+
+
+def model_inputs(mc_model: MCModelBase) -> typing.List[typing.Tuple[str, SampleableDistribution]]:
+    """
+    The distributions of the given model, with their path in the model, in
+    the order in which they are sampled when the model is built.
+
+    """
+    inputs: typing.List[typing.Tuple[str, SampleableDistribution]] = []
+
+    def visit(item, path: typing.Tuple[str, ...]):
+        if isinstance(item, SampleableDistribution):
+            inputs.append(('.'.join(path), item))
+        elif isinstance(item, MCModelBase):
+            for name in item._base_field_names:
+                visit(getattr(item, name), path + (name,))
+        elif isinstance(item, tuple):
+            for index, sub in enumerate(item):
+                visit(sub, path + (str(index),))
+
+    visit(mc_model, ())
+    return inputs
+
+
+def _jansen_indices(y_a: np.ndarray, y_b: np.ndarray, y_ab: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    # The first-order (Saltelli 2010) and total (Jansen) estimators. The
+    # sample axis is the last one, ``y_ab`` has the inputs on the one before.
+    variance = np.var(np.concatenate([y_a, y_b], axis=-1), axis=-1)[..., np.newaxis]
+    first_order = np.mean(y_b[..., np.newaxis, :] * (y_ab - y_a[..., np.newaxis, :]), axis=-1) / variance
+    total = 0.5 * np.mean((y_a[..., np.newaxis, :] - y_ab) ** 2, axis=-1) / variance
+    return first_order, total
+
+
+def sobol_indices(
+        mc_model: MCModelBase,
+        size: int,
+        output: typing.Callable[[typing.Any], typing.Any] = lambda model: model.infection_probability(),
+        level: float = 0.95,
+        n_bootstrap: int = 200,
+        rng: typing.Optional[np.random.Generator] = None,
+) -> SobolIndices:
+    """
+    Estimate the Sobol indices of each distribution of the given model, for
+    the quantity computed by ``output`` from the built model (by default the
+    probability of infection). ``size`` is the number of rows of each of
+    the sample matrices, so the model is built with
+    ``size * (n_inputs + 2)`` samples.
+
+    """
+    inputs = model_inputs(mc_model)
+    if not inputs:
+        raise ValueError("The model doesn't contain any distribution")
+    n_inputs = len(inputs)
+
+    # Stack the A, B and AB_i matrices, column by column.
+    columns = []
+    for i, (_, distribution) in enumerate(inputs):
+        a = distribution.generate_samples(size)
+        b = distribution.generate_samples(size)
+        blocks = [a, b] + [b if j == i else a for j in range(n_inputs)]
+        columns.append(np.concatenate(blocks))
+
+    remaining = iter(zip(inputs, columns))
+
+    def sample(distribution: SampleableDistribution, n_samples: int) -> np.ndarray:
+        (name, expected), column = next(remaining)
+        # The model is sampled in the same order as the inputs were found.
+        assert distribution is expected, f'Unexpected distribution for {name}'
+        return column
+
+    model = mc_model._build_model(size * (n_inputs + 2), sample)
+    y = np.broadcast_to(np.asarray(output(model), dtype=float), (size * (n_inputs + 2),))
+    y = y.reshape(n_inputs + 2, size)
+    y_a, y_b, y_ab = y[0], y[1], y[2:]
+
+    first_order, total = _jansen_indices(y_a, y_b, y_ab)
+
+    # Bootstrap the rows of the sample matrices, a batch of replicates at a time.
+    rng = rng or np.random.default_rng()
+    first_replicates, total_replicates = [], []
+    batch_size = max(1, 2 ** 22 // (size * (n_inputs + 2)))
+    for start in range(0, n_bootstrap, batch_size):
+        rows = rng.integers(0, size, (min(batch_size, n_bootstrap - start), size))
+        first, tot = _jansen_indices(y_a[rows], y_b[rows], y_ab[:, rows].transpose(1, 0, 2))
+        first_replicates.append(first)
+        total_replicates.append(tot)
+    tail = (1 - level) / 2 * 100
+    first_order_interval = np.percentile(np.concatenate(first_replicates), [tail, 100 - tail], axis=0).T
+    total_interval = np.percentile(np.concatenate(total_replicates), [tail, 100 - tail], axis=0).T
+
+    return SobolIndices(
+        names=tuple(name for name, _ in inputs),
+        first_order=first_order,
+        total=total,
+        first_order_interval=first_order_interval,
+        total_interval=total_interval,
+    )
@@ -0,0 +1,265 @@
+"""
+Evaluation of several variants of a model in a single vectorised build.
+
+Models which have the same structure, and differ only in the value (or
+distribution) of some of their vectorised (``_VectorisedFloat`` or
+``_VectorisedInt``) parameters, can be stacked along the sample axis: the
+built model has ``size`` samples for each of the variants, one variant
+after the other. A model and its Monte Carlo counterpart (e.g. a
+``cara.models.Mask`` and a ``cara.monte_carlo.Mask``) have the same
+structure. Each distribution is sampled only once and its samples are
+shared by all of the variants which use it (common random numbers), so
+that differences between the variants aren't blurred by sampling noise.
+
+As the air exchanges of the ventilations of a
+``cara.models.MultipleVentilation`` add up, multiple ventilations can be
+stacked even if they don't have the same ventilations: a ventilation which
+some of the variants don't have is stacked with an air exchange weighted
+by 0 for those variants.
+
+"""
+import collections
+import dataclasses
+import typing
+
+import numpy as np
+
+import cara.models
+from .build_cache import _Identity, fingerprint
+from .models import MCModelBase, _SampleFunction, _generate_samples
+from .sampleable import (
+    SampleableDistribution, _VectorisedFloatOrSampleable, _VectorisedIntOrSampleable,
+)
+
+
+#: The types of the fields which may differ between the stacked models.
+_STACKABLE_TYPES = [
+    cara.models._VectorisedFloat,
+    cara.models._VectorisedInt,
+    _VectorisedFloatOrSampleable,
+    _VectorisedIntOrSampleable,
+]
+
+
+class CommonRandomNumbers:
+    """
+    A sample function which returns the same samples for the same
+    distribution in each build, so that models built one after the other
+    can be compared without sampling noise. Call :meth:`new_build` before
+    each build: within a build, repeated uses of a distribution are still
+    sampled independently.
+
+    """
+    def __init__(self, sample: _SampleFunction = _generate_samples):
+        self._sample = sample
+        self._samples: typing.Dict[tuple, np.ndarray] = {}
+        self._occurrences: typing.Counter[int] = collections.Counter()
+        # Keep the distributions alive, so that their id isn't reused.
+        self._distributions: typing.Dict[int, SampleableDistribution] = {}
+
+    def new_build(self) -> None:
+        self._occurrences.clear()
+
+    def __call__(self, distribution: SampleableDistribution, size: int) -> np.ndarray:
+        occurrence = self._occurrences[id(distribution)]
+        self._occurrences[id(distribution)] += 1
+        key = (id(distribution), size, occurrence)
+        if key not in self._samples:
+            self._distributions[id(distribution)] = distribution
+            self._samples[key] = self._sample(distribution, size)
+        return self._samples[key]
+
+
+@dataclasses.dataclass(frozen=True)
+class _WeightedVentilation(cara.models._VentilationBase):
+    """A ventilation whose air exchange is weighted, sample by sample."""
+    ventilation: cara.models._VentilationBase
+
+    weight: cara.models._VectorisedFloat
+
+    def transition_times(self) -> typing.Set[float]:
+        return self.ventilation.transition_times()
+
+    def air_exchange(self, room: cara.models.Room, time: float) -> cara.models._VectorisedFloat:
+        return self.weight * self.ventilation.air_exchange(room, time)
+
+
+def _fields(item) -> typing.Tuple[typing.Tuple[str, typing.Any], ...]:
+    # The (name, type) of the constructor arguments of a (Monte Carlo) model.
+    return tuple((field.name, field.type) for field in dataclasses.fields(item) if field.init)
+
+
+def _equal(items: typing.Sequence) -> bool:
+    first = items[0]
+    for item in items[1:]:
+        if item is first:
+            continue
+        if isinstance(item, np.ndarray) or isinstance(first, np.ndarray):
+            if not np.array_equal(item, first):
+                return False
+        elif type(item) is not type(first) or item != first:
+            return False
+    return True
+
+
+def _base_type(item) -> type:
+    # The type of the model built from a (Monte Carlo) model.
+    return item._base_cls if isinstance(item, MCModelBase) else type(item)
+
+
+def _is_model(item) -> bool:
+    return isinstance(item, MCModelBase) or (
+        dataclasses.is_dataclass(item) and type(item).__module__ == 'cara.models')
+
+
+def _stack(items: typing.Sequence, size: int, sample: _SampleFunction, path: str, field_type=None):
+    first = items[0]
+    if any(isinstance(item, SampleableDistribution) for item in items):
+        if field_type is not None and field_type not in _STACKABLE_TYPES:
+            raise ValueError(f"The models differ in the non-vectorised parameter {path}")
+        # Each distribution is sampled once, and its samples are shared by
+        # all of the models which use it.
+        samples: typing.Dict[int, np.ndarray] = {}
+        for item in items:
+            if isinstance(item, SampleableDistribution) and id(item) not in samples:
+                samples[id(item)] = sample(item, size)
+        return np.concatenate([
+            samples[id(item)] if isinstance(item, SampleableDistribution)
+            else np.broadcast_to(item, (size,))
+            for item in items
+        ])
+
+    elif _is_model(first):
+        if any(not _is_model(item) or _base_type(item) is not _base_type(first) for item in items):
+            raise ValueError(f"The models have different types for {path}")
+        if not isinstance(first, MCModelBase) and all(item is first for item in items):
+            # The same (non Monte Carlo) model everywhere: nothing to stack.
+            return first
+        if _base_type(first) is cara.models.MultipleVentilation:
+            return _stack_ventilations(items, size, sample, path)
+        kwargs = {
+            name: _stack(
+                [getattr(item, name) for item in items], size, sample,
+                f'{path}.{name}' if path else name, sub_type,
+            )
+            for name, sub_type in _fields(first)
+        }
+        return _base_type(first)(**kwargs)
+
+    elif isinstance(first, tuple):
+        if any(not isinstance(item, tuple) or len(item) != len(first) for item in items):
+            raise ValueError(f"The models have different structures for {path}")
+        return tuple(
+            _stack([item[index] for item in items], size, sample, f'{path}.{index}')
+            for index in range(len(first))
+        )
+
+    stackable = field_type in _STACKABLE_TYPES
+    if stackable and any(np.ndim(item) > 0 for item in items):
+        # Each of the values is repeated for all of the samples of its model.
+        return np.concatenate([np.broadcast_to(item, (size,)) for item in items])
+    elif _equal(items):
+        return first
+    elif stackable:
+        return np.repeat(np.asarray(items), size)
+
+    raise ValueError(f"The models differ in the non-vectorised parameter {path}")
+
+
+def _stack_ventilations(items: typing.Sequence, size: int, sample: _SampleFunction, path: str):
+    # The ventilations of the multiple ventilations are matched by structure
+    # (the first ventilation of a given structure of each of the models, the
+    # second one, etc.), and those missing from some of the models are
+    # weighted by 0 for them.
+    slots: typing.Dict[typing.Hashable, typing.List[typing.Any]] = {}
+    for index, item in enumerate(items):
+        occurrences: typing.Counter[typing.Hashable] = collections.Counter()
+        for ventilation in item.ventilations:
+            key = structure(ventilation)
+            slot = slots.setdefault((key, occurrences[key]), [None] * len(items))
+            occurrences[key] += 1
+            slot[index] = ventilation
+
+    prefix = f'{path}.ventilations' if path else 'ventilations'
+    ventilations = []
+    for slot_index, slot in enumerate(slots.values()):
+        present = next(ventilation for ventilation in slot if ventilation is not None)
+        stacked = _stack(
+            [present if ventilation is None else ventilation for ventilation in slot],
+            size, sample, f'{prefix}.{slot_index}',
+        )
+        if any(ventilation is None for ventilation in slot):
+            weights = [0. if ventilation is None else 1. for ventilation in slot]
+            stacked = _WeightedVentilation(stacked, np.repeat(weights, size))
+        ventilations.append(stacked)
+    return cara.models.MultipleVentilation(tuple(ventilations))
+
+
+#: Stands for the value of a field which may differ between stacked models.
+_STACKABLE = object()
+
+
+def structure(item, field_type=None) -> typing.Hashable:
+    """
+    A hashable description of the structure of a (Monte Carlo) model: two
+    models can be stacked by :func:`build_stacked_model` if, and only if,
+    they have the same structure.
+
+    """
+    if isinstance(item, SampleableDistribution):
+        return _STACKABLE if field_type in _STACKABLE_TYPES else _Identity(item)
+    elif _is_model(item):
+        if _base_type(item) is cara.models.MultipleVentilation:
+            # Any multiple ventilations can be stacked (see _stack_ventilations).
+            return (cara.models.MultipleVentilation,)
+        # A model and its Monte Carlo counterpart have the same structure.
+        return (_base_type(item),) + tuple(
+            structure(getattr(item, name), sub_type)
+            for name, sub_type in _fields(item)
+        )
+    elif isinstance(item, tuple):
+        return (tuple,) + tuple(structure(sub) for sub in item)
+    elif field_type in _STACKABLE_TYPES:
+        return _STACKABLE
+    return fingerprint(item)
+
+
+def stackable_groups(models: typing.Sequence[typing.Any]) -> typing.List[typing.List[int]]:
+    """
+    Split the given models into groups of models which can be stacked
+    together, returning the indices of the models of each group.
+
+    """
+    groups: typing.Dict[typing.Hashable, typing.List[int]] = {}
+    for index, model in enumerate(models):
+        groups.setdefault(structure(model), []).append(index)
+    return list(groups.values())
+
+
+def build_stacked_model(
+        models: typing.Sequence[typing.Any],
+        size: int,
+        sample: _SampleFunction = _generate_samples,
+):
+    """
+    Build a single model from the given (Monte Carlo) models, which must
+    have the same structure, with ``size`` samples for each of them: the
+    samples ``i * size`` to ``(i + 1) * size`` of the built model are those
+    of ``models[i]``.
+
+    """
+    if not models:
+        raise ValueError("At least one model is needed")
+    return _stack(list(models), size, sample, '')
+
+
+def unstack(values, n_models: int) -> np.ndarray:
+    """
+    Split a quantity computed from a stacked model into an
+    ``(n_models, size)`` array, with one row per model.
+
+    """
+    values = np.asarray(values)
+    if values.ndim == 0:
+        return np.full((n_models, 1), values)
+    return values.reshape(n_models, -1)
@@ -0,0 +1,640 @@
+"""
+Statistics of Monte Carlo model outputs.
+
+Where a function takes ``weights``, these are the per-sample likelihood
+weights of an importance sampled model, as returned by
+:meth:`cara.monte_carlo.MCModelBase.build_weighted_model`. Without weights
+each sample counts equally.
+
+"""
+import dataclasses
+import time
+import typing
+
+import numpy as np
+import scipy.stats
+
+
+_Weights = typing.Optional[np.ndarray]
+
+
+@dataclasses.dataclass(frozen=True)
+class Estimate:
+    #: The estimated mean.
+    mean: float
+
+    #: The standard error of the estimated mean.
+    standard_error: float
+
+    #: The number of independent, unweighted, samples which would give the
+    #: same standard error with plain Monte Carlo sampling.
+    effective_sample_size: float
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfidenceInterval:
+    #: The estimated mean.
+    estimate: float
+
+    #: The bounds of the interval.
+    lower: float
+    upper: float
+
+    #: The confidence level of the interval (e.g. 0.95).
+    level: float
+
+    #: The method by which the interval was computed.
+    method: str
+
+
+def weighted_mean(values, weights: _Weights = None) -> float:
+    """The (weighted) mean of the given samples."""
+    if weights is None:
+        return float(np.mean(values))
+    return float(np.average(np.broadcast_to(values, np.shape(weights)), weights=weights))
+
+
+def weighted_quantile(values, quantiles, weights: _Weights = None):
+    """
+    The (weighted) quantiles of the given samples. ``quantiles`` is a float
+    or a sequence of floats in the range [0, 1].
+
+    With weights, the empirical distribution function is evaluated at the
+    midpoint of the weight of each sorted sample, and then linearly
+    interpolated.
+
+    """
+    if weights is None:
+        return np.quantile(values, quantiles)
+    values = np.broadcast_to(values, np.shape(weights))
+    order = np.argsort(values)
+    sorted_values = values[order]
+    sorted_weights = weights[order]
+    cumulative_weights = np.cumsum(sorted_weights) - 0.5 * sorted_weights
+    cumulative_weights /= np.sum(sorted_weights)
+    return np.interp(quantiles, cumulative_weights, sorted_values)
+
+
+def exceedance_probability(values, threshold: float, weights: _Weights = None) -> float:
+    """The (weighted) probability that a sample is greater than ``threshold``."""
+    return weighted_mean(np.asarray(values) > threshold, weights)
+
+
+def effective_sample_size(weights: np.ndarray) -> float:
+    """The (Kish) effective sample size of importance sampled samples."""
+    return float(np.sum(weights) ** 2 / np.sum(weights ** 2))
+
+
+def _estimate(values: np.ndarray, adjusted: np.ndarray, extra_variance: float = 0.) -> Estimate:
+    # ``adjusted`` are independent samples with the same mean as ``values``,
+    # but (hopefully) a smaller variance. ``extra_variance`` is that of any
+    # (independent) estimate the adjusted samples depend upon.
+    standard_error = float(np.sqrt(np.var(adjusted, ddof=1) / adjusted.size + extra_variance))
+    unit_variance = float(np.var(values, ddof=1))
+    if standard_error > 0:
+        ess = unit_variance / standard_error ** 2
+    else:
+        ess = float(values.size)
+    return Estimate(float(np.mean(adjusted)), standard_error, ess)
+
+
+def mean_estimate(values, weights: _Weights = None) -> Estimate:
+    """The (weighted) mean of the samples, and its precision."""
+    values = np.asarray(values, dtype=float)
+    if weights is None:
+        standard_error = float(np.std(values, ddof=1) / np.sqrt(values.size))
+        return Estimate(float(np.mean(values)), standard_error, float(values.size))
+    values = np.broadcast_to(values, np.shape(weights))
+    normed_weights = weights / np.sum(weights)
+    mean = float(np.sum(normed_weights * values))
+    standard_error = float(np.sqrt(np.sum(normed_weights ** 2 * (values - mean) ** 2)))
+    return Estimate(mean, standard_error, effective_sample_size(weights))
+
+
+def _pair_averages(values: np.ndarray) -> np.ndarray:
+    # The samples of an antithetic model are paired between the first and
+    # second half of the samples.
+    half = values.size // 2
+    return (values[:half] + values[half:2 * half]) / 2
+
+
+def antithetic_mean(values) -> Estimate:
+    """
+    The mean of the samples of a model built with
+    :meth:`cara.monte_carlo.MCModelBase.build_antithetic_model`, and its
+    precision.
+
+    """
+    values = np.asarray(values, dtype=float)
+    return _estimate(values, _pair_averages(values))
+
+
+def control_variate_mean(
+        values,
+        control,
+        control_mean: float,
+        antithetic: bool = False,
+        control_mean_standard_error: float = 0.,
+) -> Estimate:
+    """
+    The control variate estimate of the mean of the samples, and its
+    precision.
+
+    ``control`` are samples of a quantity which is correlated with
+    ``values``, and whose expectation, ``control_mean``, is known (or is
+    cheap to estimate precisely). If ``control_mean`` is itself estimated
+    (independently of the samples), its ``control_mean_standard_error`` is
+    propagated to the precision of the estimate. If ``antithetic`` is true,
+    the samples come from an antithetic model and are averaged in pairs
+    first.
+
+    """
+    values = np.asarray(values, dtype=float)
+    samples = values
+    control = np.broadcast_to(np.asarray(control, dtype=float), values.shape)
+    if antithetic:
+        samples, control = _pair_averages(samples), _pair_averages(control)
+    control_variance = np.var(control, ddof=1)
+    if control_variance > 0:
+        beta = np.cov(samples, control)[0, 1] / control_variance
+    else:
+        beta = 0.
+    return _estimate(
+        values, samples - beta * (control - control_mean),
+        extra_variance=float((beta * control_mean_standard_error) ** 2),
+    )
+
+
+#: The number of samples added to a sketch at a time by ``from_values``.
+_CHUNK_SIZE = 8192
+
+
+def _chunks(values: np.ndarray, weights: np.ndarray, chunk_size: int):
+    for start in range(0, values.size, chunk_size):
+        yield values[start:start + chunk_size], weights[start:start + chunk_size]
+
+
+def _as_weighted(values, weights: _Weights) -> typing.Tuple[np.ndarray, np.ndarray]:
+    values = np.ravel(np.asarray(values, dtype=float))
+    if weights is None:
+        return values, np.ones(values.size)
+    return np.ravel(np.broadcast_to(values, np.shape(weights))), np.asarray(weights, dtype=float)
+
+
+class LogHistogram:
+    """
+    A (weighted) histogram with a fixed set of logarithmically spaced bins
+    between ``low`` and ``high``, and an underflow and overflow bin.
+
+    Samples can be added chunk by chunk, and histograms with the same bins
+    (for example computed by parallel workers) can be merged.
+
+    """
+    def __init__(self, low: float = 1e-4, high: float = 100., n_bins: int = 60):
+        if not 0 < low < high:
+            raise ValueError("The histogram bounds must satisfy 0 < low < high")
+        #: The edges of the (non-overflow) bins.
+        self.edges = np.logspace(np.log10(low), np.log10(high), n_bins + 1)
+        #: The total weight in each bin, the first and last being the
+        #: underflow and overflow bins.
+        self.counts = np.zeros(n_bins + 2)
+        #: The smallest and largest samples, the extent of the underflow
+        #: and overflow bins.
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def _bins(self, values: np.ndarray) -> np.ndarray:
+        # The bin of each of the values (as np.searchsorted(self.edges,
+        # values, side='right')), computed from the logarithm of the values
+        # as the edges are evenly spaced on a log scale.
+        n_bins = self.edges.size - 1
+        log_low, log_high = np.log(self.edges[[0, -1]])
+        scale = n_bins / (log_high - log_low)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = np.log(values)
+        position *= scale
+        # Round up the values which are (almost) on an edge, and make the
+        # non-positive values (whose logarithm is -inf or NaN) underflow.
+        position += 1 + 1e-9 - log_low * scale
+        np.fmax(position, 0, out=position)
+        np.fmin(position, n_bins + 1, out=position)
+        bins = position.astype(np.intp)
+        # Correct the values which were rounded up past an edge.
+        bins -= values < np.concatenate([[-np.inf], self.edges, [np.inf]])[bins]
+        return bins
+
+    def add(self, values, weights: _Weights = None) -> None:
+        if weights is None:
+            values = np.ravel(np.asarray(values, dtype=float))
+        else:
+            values, weights = _as_weighted(values, weights)
+        if values.size == 0:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        # The values are binned chunk by chunk, which is much faster for
+        # large arrays.
+        for start in range(0, values.size, _CHUNK_SIZE):
+            chunk = slice(start, start + _CHUNK_SIZE)
+            self.counts += np.bincount(
+                self._bins(values[chunk]), weights=None if weights is None else weights[chunk],
+                minlength=self.counts.size,
+            )
+
+    @classmethod
+    def from_values(cls, values, weights: _Weights = None, **kwargs) -> "LogHistogram":
+        histogram = cls(**kwargs)
+        for chunk, chunk_weights in _chunks(*_as_weighted(values, weights), _CHUNK_SIZE):
+            histogram.add(chunk, chunk_weights)
+        return histogram
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only histograms with the same bins can be merged")
+        merged = LogHistogram.__new__(LogHistogram)
+        merged.edges = self.edges
+        merged.counts = self.counts + other.counts
+        merged.minimum = min(self.minimum, other.minimum)
+        merged.maximum = max(self.maximum, other.maximum)
+        return merged
+
+    def quantile(self, quantiles):
+        """
+        The estimated quantiles (a float or a sequence of floats in [0,
+        1]), interpolated (log-linearly) within the bin which contains
+        them. The underflow and overflow bins are taken to extend to the
+        smallest and largest samples, and are interpolated linearly.
+
+        The estimate is in the same bin as the quantile of the samples (the
+        smallest sample whose cumulative weight reaches it): in the bins,
+        its relative error is at most the ratio of consecutive edges minus
+        one, and below the first edge its absolute error is at most that
+        edge.
+
+        """
+        total = self.counts.sum()
+        if total == 0:
+            raise ValueError("The quantiles of an empty histogram are undefined")
+        boundaries = np.clip(
+            np.concatenate([[self.minimum], self.edges, [self.maximum]]), self.minimum, self.maximum,
+        )
+        cumulative = np.concatenate([[0.], np.cumsum(self.counts) / total])
+        quantiles = np.asarray(quantiles, dtype=float)
+        upper = np.clip(np.searchsorted(cumulative, quantiles, side='left'), 1, cumulative.size - 1)
+        bin_weight = cumulative[upper] - cumulative[upper - 1]
+        fraction = np.divide(
+            quantiles - cumulative[upper - 1], bin_weight,
+            out=np.zeros(np.shape(quantiles)), where=bin_weight > 0,
+        )
+        low, high = boundaries[upper - 1], boundaries[upper]
+        inner = (upper > 1) & (upper < cumulative.size - 1) & (low > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(
+                inner,
+                low * (high / low) ** fraction,
+                low + fraction * (high - low),
+            )
+
+    def exceedance_probability(self, threshold: float) -> float:
+        """
+        The probability that a sample is greater than ``threshold``,
+        interpolating (log-linearly) within the bin containing it.
+
+        The extent of the underflow and overflow bins is unknown, so for a
+        threshold below the first edge or above the last one the whole bin
+        containing it is counted: the result is then an upper bound of the
+        probability (e.g. 1 below the first edge).
+
+        """
+        total = self.counts.sum()
+        if total == 0:
+            return 0.
+        index = int(np.searchsorted(self.edges, threshold, side='right'))
+        above = self.counts[index + 1:].sum()
+        if 0 < index < self.edges.size:
+            low, high = np.log(self.edges[index - 1:index + 1])
+            fraction = (high - np.log(threshold)) / (high - low)
+            above += fraction * self.counts[index]
+        else:
+            above += self.counts[index]
+        return float(above / total)
+
+    def to_dict(self) -> dict:
+        """A JSON serialisable description of the histogram."""
+        return {
+            'edges': self.edges.tolist(),
+            'counts': self.counts[1:-1].tolist(),
+            'underflow': float(self.counts[0]),
+            'overflow': float(self.counts[-1]),
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LogHistogram":
+        histogram = cls.__new__(cls)
+        histogram.edges = np.asarray(data['edges'], dtype=float)
+        histogram.counts = np.concatenate(
+            [[data['underflow']], data['counts'], [data['overflow']]],
+        ).astype(float)
+        histogram.minimum = data['minimum']
+        histogram.maximum = data['maximum']
+        return histogram
+
+
+class QuantileSketch:
+    """
+    A mergeable sketch of a (weighted) distribution, from which quantiles
+    and exceedance probabilities can be estimated, in the style of a
+    merging t-digest.
+
+    The samples are summarised by at most ~``compression`` centroids, which
+    are smaller in the tails of the distribution so that extreme quantiles
+    remain accurate.
+
+    """
+    def __init__(self, compression: int = 200):
+        self.compression = compression
+        #: The means and the total weights of the centroids, by mean.
+        self.means: np.ndarray = np.empty(0)
+        self.weights: np.ndarray = np.empty(0)
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def add(self, values, weights: _Weights = None) -> None:
+        values, weights = _as_weighted(values, weights)
+        if values.size == 0:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, weights]),
+        )
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        keep = weights > 0
+        means, weights = means[keep], weights[keep]
+        if means.size == 0:
+            self.means, self.weights = means, weights
+            return
+        # Group the sorted points into clusters spanning at most one unit of
+        # the (arcsine) scale function, which is steepest in the tails.
+        quantiles = (np.cumsum(weights) - weights / 2) / weights.sum()
+        scale = self.compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1)
+        clusters = np.floor(scale - scale[0]).astype(int)
+        cluster_weights = np.bincount(clusters, weights=weights)
+        occupied = cluster_weights > 0
+        self.weights = cluster_weights[occupied]
+        self.means = np.bincount(clusters, weights=weights * means)[occupied] / self.weights
+
+    @classmethod
+    def from_values(cls, values, weights: _Weights = None, **kwargs) -> "QuantileSketch":
+        sketch = cls(**kwargs)
+        for chunk, chunk_weights in _chunks(*_as_weighted(values, weights), _CHUNK_SIZE):
+            sketch.add(chunk, chunk_weights)
+        return sketch
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        merged = QuantileSketch(max(self.compression, other.compression))
+        merged.minimum = min(self.minimum, other.minimum)
+        merged.maximum = max(self.maximum, other.maximum)
+        merged._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+        return merged
+
+    def _cdf_points(self) -> typing.Tuple[np.ndarray, np.ndarray]:
+        # The (value, cumulative probability) points between which the
+        # distribution function is interpolated.
+        cumulative = (np.cumsum(self.weights) - self.weights / 2) / self.weights.sum()
+        return (
+            np.concatenate([[self.minimum], self.means, [self.maximum]]),
+            np.concatenate([[0.], cumulative, [1.]]),
+        )
+
+    def quantile(self, quantiles):
+        """The estimated quantiles (a float or a sequence of floats in [0, 1])."""
+        if self.means.size == 0:
+            raise ValueError("The quantiles of an empty sketch are undefined")
+        values, cumulative = self._cdf_points()
+        return np.interp(quantiles, cumulative, values)
+
+    def exceedance_probability(self, threshold: float) -> float:
+        """The estimated probability that a sample is greater than ``threshold``."""
+        if self.means.size == 0:
+            return 0.
+        values, cumulative = self._cdf_points()
+        return float(1 - np.interp(threshold, values, cumulative, left=0., right=1.))
+
+    def to_dict(self) -> dict:
+        """A JSON serialisable description of the sketch."""
+        return {
+            'compression': self.compression,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data['compression'])
+        sketch.means = np.asarray(data['means'], dtype=float)
+        sketch.weights = np.asarray(data['weights'], dtype=float)
+        sketch.minimum = data['minimum']
+        sketch.maximum = data['maximum']
+        return sketch
+
+
+def distribution_summary(
+        values,
+        weights: _Weights = None,
+        percentiles: typing.Sequence[float] = (5, 50, 95),
+        thresholds: typing.Sequence[float] = (),
+) -> dict:
+    """
+    A JSON serialisable summary of the (weighted) distribution of the given
+    samples, computed with streaming sketches: the percentiles, the
+    probability of exceeding each of the thresholds and a histogram.
+
+    The exceedance probabilities are counted exactly from the samples, as
+    the interpolation of the sketch is too coarse far in the tail.
+
+    """
+    sketch = QuantileSketch.from_values(values, weights)
+    histogram = LogHistogram.from_values(values, weights)
+    return {
+        'percentiles': {
+            percentile: float(value) for percentile, value in
+            zip(percentiles, sketch.quantile(np.asarray(percentiles) / 100))
+        },
+        'exceedance': {
+            threshold: exceedance_probability(values, threshold, weights) for threshold in thresholds
+        },
+        'histogram': histogram.to_dict(),
+    }
+
+
+def percentile_bands(
+        curves: typing.Iterable[np.ndarray],
+        percentiles: typing.Sequence[float] = (5, 50, 95),
+        weights: _Weights = None,
+        **histogram_kwargs,
+) -> typing.Dict[float, np.ndarray]:
+    """
+    The (weighted) percentiles of each of the rows of ``curves`` (e.g. the
+    samples of a quantity at each of the times of a curve), estimated from
+    a :class:`LogHistogram` of each row (whose bins are given by
+    ``histogram_kwargs``, by default 600 bins from 1e-4 to 100, i.e. a
+    relative error of at most 2.3% within the bins). The rows are processed
+    one at a time, so that they can be generated lazily.
+
+    """
+    histogram_kwargs = {'low': 1e-4, 'high': 100., 'n_bins': 600, **histogram_kwargs}
+    quantiles = np.asarray(percentiles) / 100
+    bands: typing.List[np.ndarray] = []
+    for row in curves:
+        histogram = LogHistogram(**histogram_kwargs)
+        histogram.add(row, weights)
+        bands.append(np.atleast_1d(histogram.quantile(quantiles)))
+    values = np.array(bands).reshape(-1, len(percentiles))
+    return {percentile: values[:, index] for index, percentile in enumerate(percentiles)}
+
+
+def _ratio_means(values: np.ndarray, weights: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    # The (weighted) mean of the values in each of the groups.
+    sums = np.bincount(groups, weights=weights * values, minlength=n_groups)
+    return sums / np.bincount(groups, weights=weights, minlength=n_groups)
+
+
+def batch_means(values, weights: _Weights = None, n_batches: int = 30) -> np.ndarray:
+    """
+    The (weighted) means of ``n_batches`` consecutive batches of the
+    samples. As the samples are independent, so are the batch means.
+
+    """
+    values, weights = _as_weighted(values, weights)
+    groups = np.arange(values.size) * n_batches // values.size
+    return _ratio_means(values, weights, groups, n_batches)
+
+
+def _t_interval(estimate: float, standard_error: float, dof: int, level: float, method: str) -> ConfidenceInterval:
+    half_width = float(scipy.stats.t.ppf((1 + level) / 2, dof) * standard_error)
+    return ConfidenceInterval(estimate, estimate - half_width, estimate + half_width, level, method)
+
+
+def batch_means_interval(values, weights: _Weights = None, level: float = 0.95,
+                         n_batches: int = 30) -> ConfidenceInterval:
+    """The confidence interval of the (weighted) mean, from the batch means."""
+    means = batch_means(values, weights, n_batches)
+    return _t_interval(
+        weighted_mean(values, weights), float(np.std(means, ddof=1) / np.sqrt(n_batches)),
+        n_batches - 1, level, 'batch-means',
+    )
+
+
+def jackknife_interval(values, weights: _Weights = None, level: float = 0.95,
+                       n_groups: int = 50) -> ConfidenceInterval:
+    """
+    The confidence interval of the (weighted) mean, from a delete-a-group
+    jackknife: each of the ``n_groups`` leave-one-group-out estimates is
+    computed at once from the group totals.
+
+    """
+    values, weights = _as_weighted(values, weights)
+    groups = np.arange(values.size) * n_groups // values.size
+    sums = np.bincount(groups, weights=weights * values, minlength=n_groups)
+    totals = np.bincount(groups, weights=weights, minlength=n_groups)
+    leave_one_out = (sums.sum() - sums) / (totals.sum() - totals)
+    standard_error = np.sqrt((n_groups - 1) / n_groups * np.sum((leave_one_out - leave_one_out.mean()) ** 2))
+    return _t_interval(
+        float(sums.sum() / totals.sum()), float(standard_error), n_groups - 1, level, 'jackknife',
+    )
+
+
+def bootstrap_intervals(
+        samples: typing.Mapping[str, typing.Any],
+        weights: _Weights = None,
+        level: float = 0.95,
+        n_replicates: int = 1000,
+        time_budget: typing.Optional[float] = None,
+        min_replicates: int = 100,
+        batch_size: int = 16,
+        rng: typing.Optional[np.random.Generator] = None,
+) -> typing.Dict[str, ConfidenceInterval]:
+    """
+    The percentile bootstrap confidence intervals of the (weighted) means of
+    each of the given sample arrays, which must come from the same model
+    (i.e. have the same number of samples).
+
+    The resampled indices are drawn as a ``(batch_size, n_samples)`` matrix
+    at a time, and shared between all of the arrays. If a ``time_budget``
+    (in seconds) is given the resampling stops when it is exhausted; if
+    fewer than ``min_replicates`` replicates were computed by then, the
+    (much cheaper) batch-means intervals are returned instead.
+
+    """
+    start = time.perf_counter()
+    rng = rng or np.random.default_rng()
+    size = np.size(weights) if weights is not None else max(np.size(v) for v in samples.values())
+    samples = {
+        name: np.broadcast_to(np.asarray(values, dtype=float), (size,))
+        for name, values in samples.items()
+    }
+    arrays = samples
+    if weights is not None:
+        arrays = {name: values * weights for name, values in samples.items()}
+
+    replicates: typing.Dict[str, list] = {name: [] for name in arrays}
+    n_done = 0
+    while n_done < n_replicates:
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            break
+        n_batch = min(batch_size, n_replicates - n_done)
+        indices = rng.integers(0, size, (n_batch, size), dtype=np.int32)
+        denominator = weights[indices].sum(axis=1) if weights is not None else size
+        for name, values in arrays.items():
+            replicates[name].append(values[indices].sum(axis=1) / denominator)
+        n_done += n_batch
+
+    if n_done < min_replicates:
+        return {
+            name: batch_means_interval(values, weights, level)
+            for name, values in samples.items()
+        }
+
+    tail = (1 - level) / 2 * 100
+    intervals = {}
+    for name, values in samples.items():
+        lower, upper = np.percentile(np.concatenate(replicates[name]), [tail, 100 - tail])
+        intervals[name] = ConfidenceInterval(
+            weighted_mean(values, weights), float(lower), float(upper), level, 'bootstrap',
+        )
+    return intervals
+
+
+def difference_interval(batch_means_a, batch_means_b, level: float = 0.95) -> ConfidenceInterval:
+    """
+    The confidence interval of the difference between the means of two
+    models (``a - b``), from the same number of their batch means (see
+    :func:`batch_means`).
+
+    The batches are paired: the interval is that of the mean of the
+    batch-wise differences. This is valid whether the models are sampled
+    independently or from common random numbers (e.g. when stacked in a
+    single build, see :mod:`cara.monte_carlo.stacking`), in which case the
+    correlation between the paired batches narrows the interval.
+
+    """
+    a, b = np.asarray(batch_means_a, dtype=float), np.asarray(batch_means_b, dtype=float)
+    if a.shape != b.shape:
+        raise ValueError("The models must have the same number of batch means")
+    differences = a - b
+    return _t_interval(
+        float(differences.mean()), float(np.std(differences, ddof=1) / np.sqrt(differences.size)),
+        differences.size - 1, level, 'paired-batch-means',
+    )
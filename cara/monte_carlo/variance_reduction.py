@@ -0,0 +1,67 @@
+"""
+Control variates for the Monte Carlo exposure models.
+
+A control variate is a cheap quantity, evaluated for each sample of a model,
+which is correlated with the model output and whose expectation is known
+precisely. See :func:`cara.monte_carlo.statistics.control_variate_mean` for
+the corresponding estimator.
+
+"""
+import dataclasses
+import typing
+
+import numpy as np
+
+import cara.models
+import cara.monte_carlo as mc
+from . import models as mc_models
+
+
+def infection_probability_control(
+        mc_model: mc.ExposureModel,
+        model: cara.models.ExposureModel,
+        control_size: int = 1000000,
+) -> typing.Tuple[np.ndarray, float, float]:
+    """
+    A control variate for the infection probability of ``model``, which
+    must have been built from ``mc_model``.
+
+    The control is the infection probability with the (expensive, and
+    per-sample) normalised exposure replaced by its mean. For each sample it
+    therefore only depends on the emission rate, the inhalation rate, the mask
+    and the infectious dose, none of which require any concentration
+    calculation. The expectation of the control is estimated from an
+    independent sample of those quantities, of size ``control_size``.
+
+    Returns the samples of the control, its (estimated) expectation and the
+    standard error of that estimate, which must be accounted for in the
+    precision of the control variate estimate (see
+    :func:`cara.monte_carlo.statistics.control_variate_mean`).
+
+    """
+    mean_normed_exposure = np.mean(model._normed_exposure())
+
+    def control(exposure_model: cara.models.ExposureModel) -> np.ndarray:
+        emission_rate = exposure_model.concentration_model.infected.emission_rate_when_present()
+        return np.asarray(exposure_model._infection_probability(mean_normed_exposure * emission_rate))
+
+    def build(item):
+        return mc_models.MCModelBase._to_vectorized_form(item, control_size, mc_models._generate_samples)
+
+    # Only the population and deposition parts of this model are evaluated, so
+    # the concentration model need not be re-sampled.
+    cheap_model = dataclasses.replace(
+        model,
+        concentration_model=dataclasses.replace(
+            model.concentration_model,
+            infected=build(mc_model.concentration_model.infected),
+        ),
+        exposed=build(mc_model.exposed),
+        fraction_deposited=build(mc_model.fraction_deposited),
+    )
+    cheap_control = np.broadcast_to(control(cheap_model), (control_size, ))
+    return (
+        control(model),
+        float(np.mean(cheap_control)),
+        float(np.std(cheap_control, ddof=1) / np.sqrt(control_size)),
+    )
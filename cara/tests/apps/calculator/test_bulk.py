@@ -0,0 +1,46 @@
+import concurrent.futures
+from functools import partial
+import json
+
+import pytest
+
+from cara.apps.calculator import bulk, make_app
+
+
+def test_line_splitter():
+    lines = bulk.LineSplitter()
+    assert lines.feed(b'{"a": 1}\n{"b"') == [b'{"a": 1}']
+    assert lines.feed(b': 2}\n\n  \n{"c": 3}') == [b'{"b": 2}']
+    assert lines.close() == [b'{"c": 3}']
+    assert lines.close() == []
+
+
+def test_line_splitter__too_long():
+    lines = bulk.LineSplitter(max_line_bytes=10)
+    with pytest.raises(ValueError, match="longer than 10 bytes"):
+        lines.feed(b'{"a": "01234567890"')
+
+
+def test_parse_row(baseline_form_data):
+    assert bulk.parse_row(json.dumps(baseline_form_data).encode()).room_volume == float(baseline_form_data['room_volume'])
+    with pytest.raises(ValueError, match="JSON object"):
+        bulk.parse_row(b'[1, 2]')
+    with pytest.raises(ValueError, match="Invalid argument"):
+        bulk.parse_row(json.dumps(dict(baseline_form_data, room_area='10')).encode())
+
+
+def test_evaluate_row(baseline_form):
+    report_generator = make_app().settings['report_generator']
+    executor_factory = partial(concurrent.futures.ThreadPoolExecutor, 1)
+    line = bulk.evaluate_row(
+        report_generator, 3, baseline_form, executor_factory, statistics=['prob_inf'], scenarios=[],
+    )
+    assert line.endswith(b'\n')
+    response = json.loads(line)
+    assert response['row'] == 3
+    assert set(response['result']['statistics']) == {'prob_inf'}
+
+    response = json.loads(bulk.evaluate_row(
+        report_generator, 4, baseline_form, executor_factory, statistics=['mode'],
+    ))
+    assert response == {'row': 4, 'error': 'mode is not a statistic of the report'}
@@ -0,0 +1,90 @@
+import dataclasses
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from cara.apps.calculator import emulator
+
+
+@pytest.fixture
+def mechanical_form(baseline_form):
+    return dataclasses.replace(
+        baseline_form,
+        ventilation_type='mechanical_ventilation',
+        mechanical_ventilation_type='mech_type_air_changes',
+        air_changes=0.75,
+        uv_device='not-applicable',
+        volume_type='room_volume_explicit',
+        room_volume=75.,
+    )
+
+
+@pytest.fixture
+def risk_emulator(mechanical_form):
+    return emulator.Emulator.build(
+        mechanical_form,
+        volumes=[50., 200.],
+        air_exchanges=[0.25, 1., 4.],
+        durations=[1., 10.],
+        scenarios=[{}, {'mask_wearing_option': 'mask_on'}],
+        sample_size=2000,
+    )
+
+
+def test_drivers(mechanical_form):
+    volume, air_exchange, duration = emulator.drivers(mechanical_form)
+    assert volume == 75.
+    # The infiltration is included in the effective air exchange rate.
+    npt.assert_allclose(air_exchange, 1.)
+    # The presence from 9:00 to 18:00 without the lunch and coffee breaks.
+    npt.assert_allclose(duration, 9. - 1. - 4 * 10 / 60)
+
+
+def test_emulator(risk_emulator, mechanical_form):
+    assert len(risk_emulator.scenarios) == 2
+    table = risk_emulator.tables['probability_of_infection']
+    assert table.shape == (2, 2, 3, 2)
+    assert np.all(risk_emulator.error_bound >= 0)
+
+    scenario = emulator.scenario_key(mechanical_form)
+    # Exact at the nodes of the grid.
+    result = risk_emulator.evaluate(scenario, 50., 1., 10.)
+    npt.assert_allclose(result['probability_of_infection'], table[0, 0, 1, 1])
+
+    preview = risk_emulator.preview(mechanical_form)
+    assert table[0, 1, 1, 0] < preview['probability_of_infection'] < table[0, 0, 1, 1]
+    assert preview['probability_of_infection_p5'] <= preview['probability_of_infection']
+    npt.assert_allclose(preview['expected_new_cases'], preview['probability_of_infection'] * 9 / 100)
+
+    # Wearing masks reduces the risk.
+    masked = dataclasses.replace(mechanical_form, mask_wearing_option='mask_on')
+    assert risk_emulator.preview(masked)['probability_of_infection'] < preview['probability_of_infection']
+
+
+def test_emulator_out_of_range(risk_emulator, mechanical_form):
+    with pytest.raises(ValueError, match='volume .* is outside the range'):
+        risk_emulator.preview(dataclasses.replace(mechanical_form, room_volume=500.))
+    with pytest.raises(ValueError, match='not covered by the emulator'):
+        risk_emulator.preview(dataclasses.replace(mechanical_form, infected_people=2))
+
+
+def test_emulator_save_load(risk_emulator, mechanical_form, tmp_path):
+    path = tmp_path / 'emulator.npz'
+    risk_emulator.save(path)
+    loaded = emulator.Emulator.load(path)
+    assert loaded.scenarios == risk_emulator.scenarios
+    assert loaded.preview(mechanical_form) == risk_emulator.preview(mechanical_form)
+
+
+def test_emulator_error_bound(mechanical_form):
+    # The interpolation error is measured at random points of the drivers
+    # as well as at the centres of the cells, which alone underestimate it.
+    def error_bound(n_random_points):
+        np.random.seed(2000)
+        return emulator.Emulator.build(
+            mechanical_form, volumes=[50., 200.], air_exchanges=[0.25, 1., 4.], durations=[1., 10.],
+            sample_size=2000, n_random_points=n_random_points,
+        ).error_bound[0]
+
+    assert error_bound(3) > error_bound(0)
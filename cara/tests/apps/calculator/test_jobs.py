@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from cara.apps.calculator import jobs
+
+
+async def wait_until_finished(job: jobs.Job) -> jobs.Job:
+    async for job in job.changes():
+        pass
+    return job
+
+
+async def test_job_store():
+    store = jobs.JobStore()
+
+    async def run(progress):
+        await asyncio.sleep(0.01)
+        progress('sampling')
+        return 'report'
+
+    job = store.submit('form', run)
+    assert store.submit('form', run) is job
+    assert store.get(job.id) is job
+
+    job = await wait_until_finished(job)
+    assert job.status == jobs.DONE
+    assert job.result == 'report'
+    # The progress is forwarded by another thread.
+    for _ in range(100):
+        if job.stages:
+            break
+        await asyncio.sleep(0.01)
+    assert [stage for stage, _ in job.stages] == ['sampling']
+    assert job.to_dict()['stages'][0]['stage'] == 'sampling'
+
+    store.close()
+    # The progress of the jobs is forwarded by a new manager after a close.
+    job = await wait_until_finished(store.submit('another form', run))
+    assert job.status == jobs.DONE
+    store.close()
+
+
+async def test_job_store__failure():
+    store = jobs.JobStore()
+
+    async def run(progress):
+        raise ValueError("Invalid form")
+
+    job = await wait_until_finished(store.submit('form', run))
+    assert job.status == jobs.FAILED
+    assert job.error == "Invalid form"
+    # A failed job is retried.
+    assert store.submit('form', run) is not job
+
+
+async def test_job_store__bounded():
+    store = jobs.JobStore(max_jobs=1, ttl=0)
+    never = asyncio.Event()
+
+    async def run(progress):
+        await never.wait()
+
+    job = store.submit('first', run)
+    with pytest.raises(jobs.JobStoreFull):
+        store.submit('second', run)
+    never.set()
+    await wait_until_finished(job)
+    # The finished (and expired) job makes room for another.
+    store.submit('second', run)
+    assert store.get(job.id) is None
@@ -0,0 +1,70 @@
+import dataclasses
+
+import pytest
+
+from cara.apps.calculator import optimiser
+
+
+@pytest.fixture
+def mechanical_form(baseline_form):
+    return dataclasses.replace(
+        baseline_form,
+        ventilation_type='mechanical_ventilation',
+        mechanical_ventilation_type='mech_type_air_changes',
+        air_changes=0.,
+    )
+
+
+def test_optimise_air_changes(mechanical_form):
+    (no_ventilation, well_ventilated), n_builds = optimiser.evaluate_designs(
+        mechanical_form, [{'air_changes': 0.}, {'air_changes': 10.}], 5000,
+    )
+    assert n_builds == 1
+    target = (no_ventilation + well_ventilated) / 2
+
+    result = optimiser.optimise(
+        mechanical_form, {'air_changes': (0., 10.)}, target, sample_size=5000,
+    )
+    assert result.probability_of_infection <= target
+    assert 0. < result.design['air_changes'] < 10.
+    assert result.form.air_changes == result.design['air_changes']
+    assert result.n_builds > 1
+
+
+def test_evaluate_designs__structures(mechanical_form):
+    # Designs with other masks, and even with another type of ventilation,
+    # are stacked with the base design.
+    designs = [
+        {},
+        {'mask_wearing_option': 'mask_on', 'mask_type': 'Type I'},
+        {'mask_wearing_option': 'mask_on', 'mask_type': 'FFP2'},
+        {'ventilation_type': 'natural_ventilation'},
+        {'ventilation_type': 'no_ventilation'},
+    ]
+    probabilities, n_builds = optimiser.evaluate_designs(mechanical_form, designs, 5000)
+    assert n_builds == 1
+    no_mask, type_1, ffp2, natural_ventilation, no_ventilation = probabilities
+    assert ffp2 < type_1 < no_mask
+    assert natural_ventilation < no_ventilation
+
+
+def test_optimise_occupancy(mechanical_form):
+    result = optimiser.optimise(
+        mechanical_form, {'total_people': (2, 50)}, target=100.,
+        cost={'total_people': -1}, sample_size=1000,
+    )
+    # Any occupancy meets the target, so the largest is chosen.
+    assert result.design == {'total_people': 50}
+
+
+def test_optimise_unreachable(mechanical_form):
+    result = optimiser.optimise(
+        mechanical_form, {'air_changes': (0., 1.)}, target=0., sample_size=1000,
+    )
+    assert result.design is None
+    assert result.n_builds == 1
+
+
+def test_optimise_invalid_variable(mechanical_form):
+    with pytest.raises(ValueError, match='not a valid control variable'):
+        optimiser.optimise(mechanical_form, {'room_volume': (10., 100.)}, target=1.)
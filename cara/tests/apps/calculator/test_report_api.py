@@ -0,0 +1,93 @@
+import concurrent.futures
+from functools import partial
+import json
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from cara.apps.calculator import make_app, report_api
+from cara.apps.calculator.report_generator import ReportGenerator
+
+
+def test_parse_selection():
+    assert report_api.parse_selection(None) is None
+    assert report_api.parse_selection('') == []
+    assert report_api.parse_selection('prob_inf, times') == ['prob_inf', 'times']
+    assert report_api.parse_selection(['prob_inf']) == ['prob_inf']
+
+
+def test_negotiate_format():
+    assert report_api.negotiate_format(None) == 'json'
+    assert report_api.negotiate_format('json', 'application/msgpack') == 'json'
+    with pytest.raises(ValueError, match="Unknown format"):
+        report_api.negotiate_format('xml')
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_to_wire(binary):
+    data = {
+        'curve': [0.5, 1.5, 2.5],
+        'intervals': [[8, 12], [13, 17]],
+        'percentiles': {95: np.float64(0.25)},
+        'names': ['a', 'b'],
+        'mixed': [1., None],
+    }
+    wire = report_api.to_wire(data, binary)
+    npt.assert_array_equal(report_api.decode_array(wire['curve']), [0.5, 1.5, 2.5])
+    npt.assert_array_equal(report_api.decode_array(wire['intervals']), [[8, 12], [13, 17]])
+    assert wire['percentiles'] == {'95': 0.25}
+    assert wire['names'] == ['a', 'b']
+    assert wire['mixed'] == [1., None]
+    assert isinstance(wire['curve']['data'], bytes if binary else str)
+
+
+def test_encode__msgpack():
+    msgpack = pytest.importorskip('msgpack')
+    data = msgpack.unpackb(report_api.encode({'curve': np.arange(3.)}, 'msgpack'))
+    npt.assert_array_equal(report_api.decode_array(data['curve']), [0., 1., 2.])
+
+
+@pytest.fixture
+def report_generator() -> ReportGenerator:
+    return make_app().settings['report_generator']
+
+
+def test_report_data__selection(baseline_form, report_generator):
+    executor_factory = partial(concurrent.futures.ThreadPoolExecutor, 1)
+    data = report_generator.report_data(
+        baseline_form, executor_factory,
+        statistics=['prob_inf', 'expected_new_cases'], scenarios=['No BioV & nobody wears mask'],
+    )
+    assert set(data['statistics']) == {'prob_inf', 'expected_new_cases'}
+    # Without any time series, the scenarios have no concentration curve.
+    [scenario] = data['alternative_scenarios'].values()
+    assert scenario['concentrations'] == []
+    assert 'probability_of_infection_difference' in scenario
+
+    encoded = json.loads(report_api.encode(data, 'json'))
+    assert encoded['statistics']['prob_inf'] == pytest.approx(data['statistics']['prob_inf'])
+
+
+def test_report_data__time_series(baseline_form, report_generator):
+    executor_factory = partial(concurrent.futures.ThreadPoolExecutor, 1)
+    data = report_generator.report_data(
+        baseline_form, executor_factory, statistics=['times', 'concentrations'], scenarios=[],
+    )
+    assert data['alternative_scenarios'] == {}
+    assert len(data['statistics']['times']) == len(data['statistics']['concentrations'])
+
+
+def test_report_data__unknown(baseline_form, report_generator):
+    executor_factory = partial(concurrent.futures.ThreadPoolExecutor, 1)
+    with pytest.raises(ValueError, match="not a statistic"):
+        report_generator.report_data(baseline_form, executor_factory, statistics=['mode'])
+    with pytest.raises(ValueError, match="not an alternative scenario"):
+        report_generator.report_data(baseline_form, executor_factory, scenarios=['Outdoors'])
+
+
+def test_sample_stream(baseline_form, report_generator):
+    pyarrow = pytest.importorskip('pyarrow')
+    stream = report_api.sample_stream(report_generator, baseline_form, scenarios=['No BioV & nobody wears mask'])
+    table = pyarrow.ipc.open_stream(stream).read_all()
+    assert table.column('scenario').unique().to_pylist() == ['Base scenario', 'No BioV & nobody wears mask']
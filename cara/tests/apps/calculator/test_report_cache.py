@@ -0,0 +1,87 @@
+import concurrent.futures
+from functools import partial
+import os
+import pickle
+
+import pytest
+
+from cara.apps.calculator import make_app, report_cache
+from cara.apps.calculator.report_cache import ReportCache
+from cara.apps.calculator.report_generator import ReportGenerator
+
+
+def test_content_key():
+    assert report_cache.content_key({'a': 1, 'b': 2}) == report_cache.content_key({'b': 2, 'a': 1})
+    assert report_cache.content_key({'a': 1}) != report_cache.content_key({'a': 2})
+
+
+def test_memory_tier():
+    cache = ReportCache(max_memory_entries=2)
+    cache.put('ns', 'a', 1)
+    cache.put('ns', 'b', 2)
+    assert cache.get('ns', 'a') == 1
+    # "b" is now the least recently used entry.
+    cache.put('ns', 'c', 3)
+    assert cache.get('ns', 'b') is None
+    assert cache.get('ns', 'a') == 1
+    assert cache.get('other', 'a') is None
+    # A different cache doesn't share the entries.
+    assert ReportCache().get('ns', 'a') is None
+
+
+def test_disk_tier(tmp_path):
+    cache = ReportCache(tmp_path / 'cache.sqlite', max_memory_entries=1)
+    cache.put('ns', 'a', {'value': [1, 2]})
+    cache.put('ns', 'b', 'b')
+    # Served from the disk tier.
+    assert cache.get('ns', 'a') == {'value': [1, 2]}
+    # As by another process.
+    assert pickle.loads(pickle.dumps(cache)).get('ns', 'b') == 'b'
+    assert ReportCache(tmp_path / 'cache.sqlite').get('ns', 'b') == 'b'
+
+
+def test_ttl(tmp_path, monkeypatch):
+    now = 1000.
+    monkeypatch.setattr(report_cache.time, 'time', lambda: now)
+    cache = ReportCache(tmp_path / 'cache.sqlite', ttl=10)
+    cache.put('ns', 'a', 1)
+    now += 5
+    assert cache.get('ns', 'a') == 1
+    now += 10
+    assert cache.get('ns', 'a') is None
+    assert ReportCache(tmp_path / 'cache.sqlite', ttl=10).get('ns', 'a') is None
+
+
+def test_size_eviction(tmp_path):
+    cache = ReportCache(tmp_path / 'cache.sqlite', max_memory_entries=0, max_disk_bytes=2500)
+    # Incompressible values of about 1000 bytes each.
+    values = {key: os.urandom(1000) for key in 'abc'}
+    for key, value in values.items():
+        cache.put('ns', key, value)
+    assert cache.get('ns', 'a') is None
+    assert cache.get('ns', 'c') == values['c']
+
+
+@pytest.fixture
+def cached_generator(tmp_path):
+    generator: ReportGenerator = make_app().settings['report_generator']
+    return ReportGenerator(
+        generator.jinja_loader, generator.calculator_prefix,
+        report_cache=ReportCache(tmp_path / 'cache.sqlite'),
+    )
+
+
+def test_build_report__cached(baseline_form, cached_generator, monkeypatch):
+    executor_factory = partial(concurrent.futures.ThreadPoolExecutor, 1)
+    report = cached_generator.build_report("", baseline_form, executor_factory)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The report was recomputed")
+
+    monkeypatch.setattr(cached_generator, 'prepare_context', fail)
+    monkeypatch.setattr(type(baseline_form), 'build_mc_model', fail)
+    assert cached_generator.build_report("", baseline_form, executor_factory) == report
+
+    # A change of the templates only needs a new rendering of the context.
+    cached_generator._templates_key = 'another theme'
+    assert cached_generator.build_report("", baseline_form, executor_factory) == report
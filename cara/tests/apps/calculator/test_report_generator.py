@@ -1,11 +1,17 @@
 import concurrent.futures
+import dataclasses
 from functools import partial
+import threading
 import time
 
 import numpy.testing
 import numpy as np
 import pytest
 
+from cara import models
+import cara.monte_carlo as mc
+from cara.monte_carlo import stacking
+from cara.monte_carlo.sampleable import LogNormal
 from cara.apps.calculator import make_app
 from cara.apps.calculator.report_generator import ReportGenerator, readable_minutes
 import cara.apps.calculator.report_generator as rep_gen
@@ -88,3 +94,149 @@ def test_interesting_times_w_temp(exposure_model_w_outside_temp_changes):
         5., 5.4, 5.8, 6.2, 6.6, 7., 7.4, 7.8, 8.
     ]
     np.testing.assert_allclose(result, expected)
+
+
+def test_calculate_report_data__tail_sampling():
+    # The infection probability exceeds 1% and 5% in (about) 1 in 1000 and
+    # 1 in 20000 of the samples.
+    presence = models.SpecificInterval(((8., 12.), (13., 17.)))
+    mc_model = mc.ExposureModel(
+        concentration_model=mc.ConcentrationModel(
+            room=models.Room(volume=75),
+            ventilation=models.AirChange(active=models.SpecificInterval(((0., 24.),)), air_exch=1.),
+            infected=mc.InfectedPopulation(
+                number=1,
+                virus=mc.SARSCoV2(viral_load_in_sputum=LogNormal(np.log(1e3), 2.3), infectious_dose=100),
+                presence=presence,
+                mask=models.Mask.types['No mask'],
+                activity=models.Activity.types['Seated'],
+                expiration=models.Expiration.types['Talking'],
+            ),
+        ),
+        exposed=models.Population(
+            number=10, presence=presence,
+            activity=models.Activity.types['Seated'], mask=models.Mask.types['No mask'],
+        ),
+    )
+    np.random.seed(2000)
+    brute_force = mc_model.build_model(2000000).infection_probability()
+
+    size = 50000
+    data = rep_gen.calculate_report_data(
+        mc_model.build_model(size), statistics=rep_gen.TAIL_STATISTICS,
+        tail_model=rep_gen.tail_sampled_model(mc_model, size),
+    )
+    numpy.testing.assert_allclose(data['prob_inf_percentiles'][99], np.percentile(brute_force, 99), rtol=0.05)
+    exceedance = data['prob_inf_distribution']['exceedance']
+    numpy.testing.assert_allclose(exceedance[1.], np.mean(brute_force > 1.), rtol=0.15)
+    numpy.testing.assert_allclose(exceedance[5.], np.mean(brute_force > 5.), rtol=0.35)
+
+
+@pytest.mark.parametrize(
+    ["bootstrap", "method"],
+    [[False, 'batch-means'], [True, 'bootstrap']],
+)
+def test_calculate_report_data__confidence_intervals(baseline_form, bootstrap, method):
+    # The intervals are only bootstrapped on request.
+    data = rep_gen.calculate_report_data(
+        baseline_form.build_model(2000), statistics=('confidence_intervals',), bootstrap=bootstrap,
+    )
+    interval = data['confidence_intervals']['prob_inf']
+    assert interval['method'] == method
+    assert interval['lower'] <= interval['estimate'] <= interval['upper']
+
+
+def test_comparison_report__stacked(baseline_form):
+    # The scenarios differing only in their masks are evaluated in a single
+    # build, with the same samples: the masks can only reduce the risk.
+    scenarios = {
+        name: dataclasses.replace(baseline_form, mask_wearing_option=option).build_mc_model()
+        for name, option in [('with masks', 'mask_on'), ('without masks', 'mask_off')]
+    }
+    report = rep_gen.comparison_report(
+        scenarios, [8., 12.], partial(concurrent.futures.ThreadPoolExecutor, 1),
+    )
+    stats = report['stats']
+    assert stats['with masks']['probability_of_infection'] < stats['without masks']['probability_of_infection']
+    assert len(stats['with masks']['concentrations']) == 2
+
+
+def test_comparison_report__base(baseline_form, monkeypatch):
+    # The base scenario is built with the alternatives, even those without
+    # its UV device, so that they are compared from the same samples.
+    builds = []
+
+    def build_stacked_model(mc_models, *args):
+        builds.append(len(mc_models))
+        return build(mc_models, *args)
+
+    build = stacking.build_stacked_model
+    monkeypatch.setattr(stacking, 'build_stacked_model', build_stacked_model)
+    form = dataclasses.replace(baseline_form, uv_device='BR1000', uv_number_2=1, uv_speed_2=1200)
+    scenarios = {
+        'same': form.build_mc_model(),
+        'without UV device': dataclasses.replace(form, uv_device='None').build_mc_model(),
+    }
+    stats = rep_gen.comparison_report(
+        scenarios, [8., 12.], partial(concurrent.futures.ThreadPoolExecutor, 1), base=form.build_mc_model(),
+    )['stats']
+    assert builds == [3]
+    assert list(stats) == ['same', 'without UV device']
+    difference = stats['same']['probability_of_infection_difference']
+    assert difference['lower'] == difference['estimate'] == difference['upper'] == 0.
+    difference = stats['without UV device']['probability_of_infection_difference']
+    assert difference['method'] == 'paired-batch-means'
+    assert 0. < difference['lower'] < difference['upper'] < 1.1 * difference['lower']
+
+
+def test_comparison_report__timeout(baseline_form, monkeypatch):
+    monkeypatch.setattr(rep_gen, '_SCENARIOS_TIMEOUT', 0.01)
+    monkeypatch.setattr(rep_gen, 'stacked_scenario_statistics', lambda *args: time.sleep(0.5))
+    with pytest.raises(TimeoutError, match='alternative scenarios'):
+        rep_gen.comparison_report(
+            {'base': baseline_form.build_mc_model()}, [8.], partial(concurrent.futures.ThreadPoolExecutor, 1),
+        )
+
+
+def test_stream_report(baseline_form):
+    generator: ReportGenerator = make_app().settings['report_generator']
+    context, scenario_arguments = generator.streamed_context("", baseline_form)
+    alternative_scenarios = generator.alternative_scenarios(
+        baseline_form, executor_factory=partial(concurrent.futures.ThreadPoolExecutor, 1),
+        **scenario_arguments,
+    )
+    report = generator.render(dict(context, alternative_scenarios=alternative_scenarios))
+
+    # The alternative scenarios are only available once the first chunk
+    # has been written (or, if the rendering waits for them first, after
+    # a while).
+    scenarios: concurrent.futures.Future = concurrent.futures.Future()
+    timer = threading.Timer(5, lambda: scenarios.done() or scenarios.set_result(alternative_scenarios))
+    timer.start()
+    chunks = []
+
+    def write(chunk):
+        if not scenarios.done():
+            scenarios.set_result(alternative_scenarios)
+            chunks.append('first')
+        chunks.append(chunk)
+
+    generator.stream(dict(context, alternative_scenarios=rep_gen.Deferred(scenarios)), write)
+    timer.cancel()
+    assert chunks[0] == 'first'
+    scenario_name = next(iter(alternative_scenarios['stats']))
+    assert scenario_name not in chunks[1]
+    assert scenario_name in report
+    assert ''.join(chunks[1:]) == report
+
+
+def test_build_model__build_cache(baseline_form):
+    generator = ReportGenerator(make_app().settings['report_generator'].jinja_loader, '', build_cache_size=32)
+    model = generator.build_model(baseline_form)
+    assert generator.build_model(baseline_form) is model
+
+    # Only the sub-models which depend on the edited field are rebuilt.
+    edited = generator.build_model(dataclasses.replace(baseline_form, room_volume=2 * baseline_form.room_volume))
+    assert edited.concentration_model.room.volume == 2 * baseline_form.room_volume
+    assert edited.concentration_model.infected is model.concentration_model.infected
+    assert edited.exposed is model.exposed
@@ -0,0 +1,25 @@
+import concurrent.futures
+from functools import partial
+import io
+import zipfile
+
+from cara.apps.calculator import make_app, report_xlsx
+from cara.xlsx import XLSXWriter
+
+
+def test_write_report(baseline_form):
+    report_generator = make_app().settings['report_generator']
+    context = report_generator.build_context(
+        "", baseline_form, partial(concurrent.futures.ThreadPoolExecutor, 1),
+    )
+    data = io.BytesIO()
+    with XLSXWriter(data) as workbook:
+        report_xlsx.write_report(workbook, baseline_form, context)
+
+    with zipfile.ZipFile(data) as archive:
+        workbook_xml = archive.read('xl/workbook.xml').decode()
+        time_series = archive.read('xl/worksheets/sheet4.xml').decode()
+    for name in ['Inputs', 'Results', 'Scenarios', 'Time series']:
+        assert f'name="{name}"' in workbook_xml
+    # A header, and a row for each of the times.
+    assert time_series.count('<row ') == len(context['times']) + 1
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from cara.apps.calculator.single_flight import SingleFlight
+
+
+async def test_single_flight():
+    coalescer = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    results = await asyncio.gather(*[coalescer.run('key', compute) for _ in range(5)])
+    assert results == [1] * 5
+    assert coalescer.metrics() == {'leaders': 1, 'coalesced': 4, 'in_flight': 0}
+
+    # Once done, the computation is started again.
+    assert await coalescer.run('key', compute) == 2
+    assert await coalescer.run('other', compute) == 3
+    assert coalescer.leaders == 3
+
+
+async def test_single_flight__error():
+    coalescer = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("Failed")
+
+    results = await asyncio.gather(
+        *[coalescer.run('key', compute) for _ in range(2)], return_exceptions=True,
+    )
+    assert [str(result) for result in results] == ["Failed"] * 2
+    with pytest.raises(ValueError):
+        await coalescer.run('key', compute)
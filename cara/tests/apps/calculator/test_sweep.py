@@ -0,0 +1,70 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from cara.apps.calculator import sweep
+
+
+@pytest.fixture
+def mechanical_form(baseline_form):
+    return dataclasses.replace(
+        baseline_form,
+        ventilation_type='mechanical_ventilation',
+        mechanical_ventilation_type='mech_type_air_changes',
+        air_changes=1.,
+        volume_type='room_volume_explicit',
+        room_volume=75.,
+    )
+
+
+def test_sweep(mechanical_form):
+    result = sweep.sweep(
+        mechanical_form,
+        {'room_volume': [50, 100, 200], 'air_changes': [1, 5]},
+        sample_size=2000,
+    )
+    assert result.dimensions == ('room_volume', 'air_changes')
+    assert result.coordinates['room_volume'].tolist() == [50., 100., 200.]
+    # All of the cells have the same structure, so they are built at once.
+    assert result.n_builds == 1
+
+    probability = result.statistics['probability_of_infection']
+    assert probability.shape == (3, 2)
+    # The samples are shared by all of the cells, so the risk decreases
+    # monotonically despite the small sample size.
+    assert np.all(np.diff(probability, axis=0) < 0)
+    assert np.all(np.diff(probability, axis=1) < 0)
+    assert np.all(result.statistics['probability_of_infection_p5'] <= probability)
+    assert np.all(probability <= result.statistics['probability_of_infection_p95'])
+    assert set(result.to_dict()['statistics']) == {
+        'probability_of_infection', 'expected_new_cases',
+        'probability_of_infection_p5', 'probability_of_infection_p95',
+    }
+
+
+def test_sweep_duration(mechanical_form):
+    # The presence intervals aren't vectorised, so each duration is built
+    # separately.
+    result = sweep.sweep(
+        mechanical_form,
+        {'exposed_finish': [720, 1080], 'total_people': [5, 10]},
+        sample_size=1000,
+    )
+    assert result.n_builds == 2
+    new_cases = result.statistics['expected_new_cases']
+    assert new_cases.shape == (2, 2)
+    assert np.all(new_cases[:, 1] > new_cases[:, 0])
+
+
+def test_sweep_unstackable_cells(mechanical_form):
+    # Each cell is built on its own, from the same samples.
+    result = sweep.sweep(mechanical_form, {'exposed_finish': [720, 900, 1080]}, sample_size=1000)
+    assert result.n_builds == 3
+    assert np.all(np.diff(result.statistics['probability_of_infection']) > 0)
+    assert np.all(np.diff(result.statistics['probability_of_infection_p95']) > 0)
+
+
+def test_sweep_invalid_field(mechanical_form):
+    with pytest.raises(ValueError, match='not a field of the form'):
+        sweep.sweep(mechanical_form, {'volume': [10., 100.]})
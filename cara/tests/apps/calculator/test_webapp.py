@@ -1,9 +1,12 @@
+import asyncio
+import json
 from pathlib import Path
 
 import pytest
 import tornado.testing
 
 import cara.apps.calculator
+from cara.apps.calculator import model_generator
 from cara.apps.calculator.report_generator import generate_permalink
 
 _TIMEOUT = 20.
@@ -96,6 +99,64 @@ class TestOpenApp(tornado.testing.AsyncHTTPTestCase):
         assert response.code == 404
 
 
+async def test_report_coalescing(http_server_client):
+    responses = await asyncio.gather(*[
+        http_server_client.fetch('/calculator/baseline-model/result', request_timeout=_TIMEOUT)
+        for _ in range(3)
+    ])
+    assert len({response.body for response in responses}) == 1
+
+    response = await http_server_client.fetch('/calculator/metrics')
+    metrics = json.loads(response.body)['report_requests']
+    assert metrics['leaders'] + metrics['coalesced'] == 3
+    assert metrics['coalesced'] >= 1
+
+
+async def test_report_streaming(app, http_server_client):
+    app.settings['stream_reports'] = True
+    responses = await asyncio.gather(*[
+        http_server_client.fetch('/calculator/baseline-model/result', request_timeout=_TIMEOUT)
+        for _ in range(3)
+    ])
+    assert len({response.body for response in responses}) == 1
+
+    response = await http_server_client.fetch('/calculator/metrics')
+    metrics = json.loads(response.body)['report_requests']
+    # The main context and the alternative scenarios are each computed once.
+    assert metrics['leaders'] == 2
+    assert metrics['coalesced'] == 4
+
+    # The complete context is kept in the report cache.
+    form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
+    assert app.settings['report_generator'].cached_context('', form) is not None
+
+
+async def test_report_streaming__error(app, http_server_client, monkeypatch):
+    app.settings['stream_reports'] = True
+    report_generator = app.settings['report_generator']
+
+    def stream(context, write, chunk_size=1024):
+        write('<p>The main results</p>')
+        context['alternative_scenarios'].result()
+        raise ValueError("The rendering of the alternative scenarios failed")
+
+    monkeypatch.setattr(report_generator, 'stream', stream)
+    response = await http_server_client.fetch('/calculator/baseline-model/result', request_timeout=_TIMEOUT)
+    assert response.code == 200
+    body = response.body.decode()
+    assert body.startswith('<p>The main results</p>')
+    assert 'an error occurred' in body
+    # The incomplete report isn't cached.
+    form = model_generator.FormData.from_dict(model_generator.baseline_raw_form_data())
+    assert report_generator.cached_report(response.effective_url.split('/calculator')[0], form) is None
+
+
+async def test_unknown_report_job(http_server_client):
+    for url in ['/calculator/jobs/abc', '/calculator/jobs/abc/events', '/calculator/jobs/abc/result']:
+        resp = await http_server_client.fetch(url, raise_error=False)
+        assert resp.code == 404
+
+
 async def test_permalink_urls(http_server_client, baseline_form):
     base_url = 'proto://hostname/prefix'
     permalink_data = generate_permalink(base_url, "/calculator", baseline_form)
@@ -142,3 +203,39 @@ class TestError500(tornado.testing.AsyncHTTPTestCase):
         response = self.fetch('/')
         assert response.code == 500
         assert 'Unfortunately an error occurred when processing your request' in response.body.decode()
+
+
+@pytest.fixture
+def api_headers(app):
+    app.settings['api_tokens'] = frozenset(['a-token'])
+    return {'Authorization': 'Bearer a-token'}
+
+
+async def test_api__xsrf(http_server_client, api_headers, baseline_form_data):
+    # Without a valid API token, the XSRF cookie is required.
+    for headers in [{}, {'Authorization': 'Bearer another-token'}]:
+        resp = await http_server_client.fetch(
+            '/calculator/api/report', method='POST', raise_error=False,
+            headers=headers, body=json.dumps(baseline_form_data),
+        )
+        assert resp.code == 403
+
+
+async def test_report_data__invalid_format(http_server_client, api_headers, baseline_form_data):
+    resp = await http_server_client.fetch(
+        '/calculator/api/report', method='POST', raise_error=False,
+        headers={'Content-Type': 'application/json', **api_headers},
+        body=json.dumps(dict(baseline_form_data, format='xml')),
+    )
+    assert resp.code == 400
+
+
+async def test_batch__invalid_rows(http_server_client, api_headers):
+    resp = await http_server_client.fetch(
+        '/calculator/api/batch', method='POST', body=b'[1]\n\n{"room_volume": "x"}',
+        headers=api_headers,
+    )
+    assert resp.headers['Content-Type'] == 'application/x-ndjson'
+    responses = [json.loads(line) for line in resp.body.splitlines()]
+    assert [response['row'] for response in responses] == [0, 1]
+    assert all('error' in response for response in responses)
@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from cara import models
+from cara.data import sensors
+
+
+def co2_log(rates, minutes_per_rate=120):
+    # A CO2 log (one reading per minute) of successive decays from 1500 ppm
+    # at the given air exchange rates.
+    lines = ['time,co2']
+    minute = 0
+    for rate in rates:
+        for step in range(minutes_per_rate):
+            lines.append(f'{minute / 60},{420 + 1080 * np.exp(-rate * step / 60)}')
+            minute += 1
+    return io.StringIO('\n'.join(lines))
+
+
+def test_read_sensor_log():
+    log = sensors.read_sensor_log(io.StringIO(
+        'time,co2,airflow\n'
+        '2021-03-01T23:30:00,800,100\n'
+        '2021-03-02T00:15:00,,110\n'
+    ))
+    npt.assert_allclose(log.times, [23.5, 24.25])
+    npt.assert_allclose(log.values['co2'], [800, np.nan])
+    npt.assert_allclose(log.values['airflow'], [100, 110])
+
+
+def test_read_sensor_log__time_of_day():
+    log = sensors.read_sensor_log(io.StringIO('time,co2\n8:00,800\n8:30:00,700\n'), ['co2'])
+    npt.assert_allclose(log.times, [8, 8.5])
+
+
+def test_read_sensor_log__missing_column():
+    with pytest.raises(ValueError, match="no airflow column"):
+        sensors.read_sensor_log(io.StringIO('time,co2\n0,800\n'), ['airflow'])
+
+
+def test_air_exchange_from_co2():
+    log = sensors.read_sensor_log(co2_log([3., 1.]))
+    air_exch = sensors.air_exchange_from_co2(log.times, log.values['co2'])
+    assert air_exch.transition_times[1] == pytest.approx(2.)
+    npt.assert_allclose(air_exch.values, [3., 1.], rtol=1e-6)
+
+
+def test_compress():
+    function = models.PiecewiseConstant((0, 1, 2, 3, 4, 5), (1., 1.1, np.nan, 3., 3.05))
+    compressed = sensors.compress(function, tolerance=0.1)
+    assert compressed.transition_times == (0, 3, 5)
+    npt.assert_allclose(compressed.values, [1.05, 3.025])
+
+
+def test_ventilation_from_log__airflow():
+    source = io.StringIO('time,airflow\n' + ''.join(
+        f'{minute / 60},{150 + (minute % 2)}\n' for minute in range(240)
+    ))
+    ventilation = sensors.ventilation_from_log(source, volume=50., airflow_column='airflow')
+    room = models.Room(volume=50.)
+    # The alternating readings are compressed into a single segment.
+    assert ventilation.air_exch.transition_times == (0., 4.)
+    assert ventilation.air_exchange(room, 2.) == pytest.approx(3.01)
@@ -204,3 +204,26 @@ def test_infectious_dose_vectorisation():
     inf_probability = model.infection_probability()
     assert isinstance(inf_probability, np.ndarray)
     assert inf_probability.shape == (3, )
+
+
+def test_cumulative_exposure_curves(conc_model):
+    presence_interval = models.SpecificInterval(((0.5, 4.), (12., 14.)))
+    population = models.Population(
+        10, presence_interval, models.Mask.types['Type I'],
+        models.Activity(np.array([0.51, 0.57]), 0.57),
+    )
+    model = ExposureModel(conc_model, population, repeats=2)
+    times = [0., 1., 3., 6., 13., 24.]
+    exposures, probabilities = model.cumulative_exposure_curves(times)
+    assert exposures.shape == probabilities.shape == (6, 2)
+    np.testing.assert_allclose(exposures[0], 0.)
+    assert np.all(np.diff(probabilities, axis=0) >= 0)
+    np.testing.assert_allclose(exposures[-1], model.exposure())
+    np.testing.assert_allclose(probabilities[-1], model.infection_probability())
+    for index, time in enumerate(times[1:], start=1):
+        np.testing.assert_allclose(
+            exposures[index], model.exposure_between_bounds(0., time) * 2,
+        )
+
+    with pytest.raises(ValueError, match='increasing'):
+        model.cumulative_exposure_curves([1., 0.])
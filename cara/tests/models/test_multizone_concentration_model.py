@@ -0,0 +1,137 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+import scipy.linalg
+
+from cara import models
+import cara.monte_carlo as mc
+from cara.monte_carlo.sampleable import Normal
+
+
+@pytest.fixture
+def infected():
+    return models.InfectedPopulation(
+        number=1,
+        presence=models.SpecificInterval(((8., 12.), (13., 17.))),
+        mask=models.Mask.types['No mask'],
+        activity=models.Activity.types['Light activity'],
+        virus=models.Virus.types['SARS_CoV_2'],
+        expiration=models.Expiration.types['Breathing'],
+    )
+
+
+@pytest.fixture
+def always():
+    return models.PeriodicInterval(120, 120)
+
+
+def test_batched_expm():
+    rng = np.random.default_rng(2000)
+    matrices = rng.normal(size=(20, 4, 4)) * np.array([0.01, 1., 10.]).repeat([7, 7, 6])[:, None, None]
+    npt.assert_allclose(
+        models._batched_expm(matrices),
+        [scipy.linalg.expm(matrix) for matrix in matrices],
+        rtol=1e-10, atol=1e-12,
+    )
+
+
+def test_single_zone(infected):
+    # A single zone is the usual concentration model.
+    ventilation = models.AirChange(models.PeriodicInterval(120, 60), np.array([1., 2.]))
+    room = models.Room(np.array([50., 75.]))
+    single = models.ConcentrationModel(room, ventilation, infected)
+    multizone = models.MultiZoneConcentrationModel((room,), (ventilation,), infected)
+    for time in [7., 8.5, 10., 12., 12.7, 16., 18.]:
+        npt.assert_allclose(multizone.concentration(time, 0), single.concentration(time))
+    npt.assert_allclose(
+        multizone.integrated_concentration(9., 15.5, 0),
+        single.integrated_concentration(9., 15.5),
+    )
+
+
+def test_isolated_zones(infected, always):
+    multizone = models.MultiZoneConcentrationModel(
+        (models.Room(75.), models.Room(75.)),
+        (models.AirChange(always, 1.), models.AirChange(always, 1.)),
+        infected,
+    )
+    assert multizone.concentration(10., 0) > 0
+    assert multizone.concentration(10., 1) == 0
+    assert multizone.integrated_concentration(8., 17., 1) == 0
+
+
+def test_well_mixed_zones(infected, always):
+    # Zones which exchange a lot of air behave like a single zone.
+    single = models.ConcentrationModel(models.Room(100.), models.AirChange(always, 1.), infected)
+    flows = (
+        models.InterZoneFlow(always, 0, 1, 1e5),
+        models.InterZoneFlow(always, 1, 0, 1e5),
+    )
+    multizone = models.MultiZoneConcentrationModel(
+        (models.Room(25.), models.Room(75.)),
+        (models.AirChange(always, 1.), models.AirChange(always, 1.)),
+        infected, infected_zone=1, flows=flows,
+    )
+    for zone in (0, 1):
+        npt.assert_allclose(
+            multizone.integrated_concentration(8., 17., zone),
+            single.integrated_concentration(8., 17.),
+            rtol=1e-3,
+        )
+
+
+def test_corridor(infected, always):
+    # The air flows from the infected zone, through a corridor, to a third
+    # zone and back to the infected zone.
+    flows = (
+        models.InterZoneFlow(always, 0, 1, 100.),
+        models.InterZoneFlow(always, 1, 2, 100.),
+        models.InterZoneFlow(always, 2, 0, 100.),
+    )
+    multizone = models.MultiZoneConcentrationModel(
+        (models.Room(50.), models.Room(30.), models.Room(50.)),
+        tuple(models.AirChange(always, 0.5) for _ in range(3)),
+        infected, flows=flows,
+    )
+    concentrations = [multizone.concentration(12., zone) for zone in range(3)]
+    assert concentrations[0] > concentrations[1] > concentrations[2] > 0
+
+    # Without the return flow, nothing reaches the zones upstream of the
+    # infected one.
+    upstream = models.MultiZoneConcentrationModel(
+        multizone.zones, multizone.ventilations, infected, infected_zone=1, flows=flows[:2],
+    )
+    assert upstream.concentration(12., 0) == 0
+    assert upstream.concentration(12., 2) > 0
+
+
+def test_exposure_in_zone(infected, always):
+    mc_model = mc.MultiZoneConcentrationModel(
+        zones=(mc.Room(Normal(75., 5.)), mc.Room(Normal(75., 5.))),
+        ventilations=(models.AirChange(always, 1.), models.AirChange(always, 1.)),
+        infected=infected,
+        flows=(models.InterZoneFlow(always, 0, 1, 50.), models.InterZoneFlow(always, 1, 0, 50.)),
+    )
+    multizone = mc_model.build_model(100)
+    exposed = models.Population(
+        number=5,
+        presence=infected.presence,
+        mask=models.Mask.types['No mask'],
+        activity=models.Activity.types['Light activity'],
+    )
+    probabilities = [
+        models.ExposureModel(models.ZoneConcentrationModel(multizone, zone), exposed).infection_probability()
+        for zone in (0, 1)
+    ]
+    assert probabilities[0].shape == (100,)
+    assert np.all(probabilities[0] > probabilities[1])
+
+
+def test_invalid_zones(infected, always):
+    with pytest.raises(ValueError, match='same number of elements'):
+        models.MultiZoneConcentrationModel((models.Room(75.),), (), infected)
+    with pytest.raises(ValueError, match='There is no zone 2'):
+        models.MultiZoneConcentrationModel(
+            (models.Room(75.),), (models.AirChange(always, 1.),), infected,
+            flows=(models.InterZoneFlow(always, 0, 2, 10.),),
+        )
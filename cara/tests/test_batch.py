@@ -0,0 +1,90 @@
+import concurrent.futures
+import csv
+from functools import partial
+import json
+
+import numpy as np
+import pytest
+
+from cara import batch
+from cara.apps.calculator import model_generator
+
+
+@pytest.fixture
+def scenarios_path(tmp_path):
+    form_data = model_generator.baseline_raw_form_data()
+    rows = [
+        dict(form_data, id='room-a'),
+        dict(form_data, id='room-b', room_volume='x'),
+        dict(form_data, id='room-c', total_people='20'),
+    ]
+    path = tmp_path / 'scenarios.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return path
+
+
+def run(scenarios_path, output_dir, **kwargs):
+    return batch.run(
+        scenarios_path, output_dir, chunk_size=2,
+        executor_factory=partial(concurrent.futures.ThreadPoolExecutor, 2),
+        log=lambda message: None, **kwargs,
+    )
+
+
+def test_run(scenarios_path, tmp_path):
+    results_path = run(scenarios_path, tmp_path / 'out')
+    assert sorted(path.name for path in (tmp_path / 'out').glob('part-*')) == [
+        'part-000000.npz', 'part-000001.npz',
+    ]
+    with np.load(results_path) as results:
+        np.testing.assert_array_equal(results['row'], [0, 1, 2])
+        np.testing.assert_array_equal(results['id'], ['room-a', 'room-b', 'room-c'])
+        assert results['error'][0] == results['error'][2] == ''
+        assert 'could not convert' in results['error'][1]
+        assert np.isnan(results['prob_inf'][1])
+        assert 0 < results['prob_inf'][0] < results['prob_inf_p99'][0]
+        assert results['exposed_occupants'][2] == 19
+
+
+def test_run__resume(scenarios_path, tmp_path, monkeypatch):
+    output_dir = tmp_path / 'out'
+    run(scenarios_path, output_dir)
+    first_part = batch.part_path(output_dir, 0).read_bytes()
+    batch.part_path(output_dir, 1).unlink()
+
+    evaluated = []
+    evaluate_chunk = batch.evaluate_chunk
+    monkeypatch.setattr(batch, 'evaluate_chunk', lambda scenarios, *args: evaluated.append(scenarios) or evaluate_chunk(scenarios, *args))
+    run(scenarios_path, output_dir)
+    # Only the missing part is evaluated again.
+    assert [[row['id'] for row in scenarios] for scenarios in evaluated] == [['room-c']]
+    assert batch.part_path(output_dir, 0).read_bytes() == first_part
+    assert len(batch.read_results(output_dir)['row']) == 3
+
+
+def test_run__other_scenarios(scenarios_path, tmp_path):
+    run(scenarios_path, tmp_path / 'out')
+    with pytest.raises(ValueError, match="results of other scenarios"):
+        batch.run(scenarios_path, tmp_path / 'out', chunk_size=10)
+
+
+def test_read_scenarios__csv(tmp_path):
+    path = tmp_path / 'scenarios.csv'
+    with path.open('wt', newline='') as fh:
+        writer = csv.DictWriter(fh, ['id', 'room_volume'])
+        writer.writeheader()
+        writer.writerow({'id': 'a', 'room_volume': '50'})
+    assert list(batch.read_scenarios(path)) == [{'id': 'a', 'room_volume': '50'}]
+    with pytest.raises(ValueError, match="Unsupported"):
+        list(batch.read_scenarios(tmp_path / 'scenarios.xlsx'))
+
+
+def test_export_xlsx(scenarios_path, tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    run(scenarios_path, tmp_path / 'out')
+    batch.export_xlsx(tmp_path / 'out', tmp_path / 'results.xlsx')
+    rows = list(openpyxl.load_workbook(tmp_path / 'results.xlsx')['Results'].iter_rows(values_only=True))
+    assert rows[0] == ('row', 'id', *batch.STATISTICS, 'error')
+    assert [row[:2] for row in rows[1:]] == [(0, 'room-a'), (1, 'room-b'), (2, 'room-c')]
+    # The statistics of the scenario which couldn't be evaluated are empty.
+    assert rows[2][2] is None
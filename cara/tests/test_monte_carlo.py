@@ -6,6 +6,7 @@ import pytest
 import cara.models
 import cara.monte_carlo.models as mc_models
 import cara.monte_carlo.sampleable
+from cara.monte_carlo import build_cache, statistics, variance_reduction
 
 
 MODEL_CLASSES = [
@@ -87,3 +88,159 @@ def test_build_exposure_model(baseline_mc_exposure_model: cara.monte_carlo.Expos
     prob = model.exposure()
     assert isinstance(prob, np.ndarray)
     assert prob.shape == (7, )
+
+
+def test_build_weighted_exposure_model(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    baseline_mc_exposure_model.concentration_model.room.volume = cara.monte_carlo.sampleable.TailBiased(
+        cara.monte_carlo.sampleable.Normal(75, 20), pilot_size=1000,
+    )
+    model, weights = baseline_mc_exposure_model.build_weighted_model(7)
+    assert isinstance(model, cara.models.ExposureModel)
+    assert np.shape(model.exposure()) == (7, )
+    assert weights.shape == (7, )
+    assert np.all(weights > 0)
+
+
+def test_build_antithetic_exposure_model(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    model = baseline_mc_exposure_model.build_antithetic_model(8)
+    volume = model.concentration_model.room.volume
+    np.testing.assert_allclose(volume[:4] + volume[4:], 2 * 75)
+    assert model.exposure().shape == (8, )
+
+    with pytest.raises(ValueError, match='even sample size'):
+        baseline_mc_exposure_model.build_antithetic_model(7)
+
+
+def test_infection_probability_control(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    # A fixed volume, as the (normally distributed) volume of the baseline
+    # model is occasionally sampled close to (or below) zero.
+    baseline_mc_exposure_model.concentration_model.room = cara.monte_carlo.Room(volume=75)
+    np.random.seed(2000)
+    infected = baseline_mc_exposure_model.concentration_model.infected
+    baseline_mc_exposure_model.concentration_model.infected = cara.monte_carlo.InfectedPopulation(
+        number=infected.number,
+        virus=cara.monte_carlo.SARSCoV2(
+            viral_load_in_sputum=cara.monte_carlo.sampleable.LogNormal(np.log(1e8), 2.),
+            infectious_dose=50.,
+        ),
+        presence=infected.presence,
+        mask=infected.mask,
+        activity=infected.activity,
+        expiration=infected.expiration,
+    )
+    model = baseline_mc_exposure_model.build_model(2000)
+    control, control_mean, control_mean_error = variance_reduction.infection_probability_control(
+        baseline_mc_exposure_model, model, control_size=200000,
+    )
+    probability = model.infection_probability()
+    plain = statistics.mean_estimate(probability)
+    estimate = statistics.control_variate_mean(
+        probability, control, control_mean, control_mean_standard_error=control_mean_error,
+    )
+    assert control.shape == (2000, )
+    assert 0 < control_mean_error < plain.standard_error / 5
+    assert estimate.standard_error < plain.standard_error / 2
+    assert estimate.effective_sample_size > 4 * plain.effective_sample_size
+    assert abs(estimate.mean - plain.mean) < 3 * plain.standard_error
+
+
+def test_build_cache(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    cache = build_cache.BuildCache()
+    model = baseline_mc_exposure_model.build_model(7, cache=cache)
+    assert baseline_mc_exposure_model.build_model(7, cache=cache) is model
+    model.concentration_model.concentration(1.)
+
+    # Only the exposed population changed, so the concentration model (and
+    # its cached concentrations) is reused.
+    baseline_mc_exposure_model.exposed = dataclasses.replace(
+        baseline_mc_exposure_model.exposed, number=5,
+    )
+    new_model = baseline_mc_exposure_model.build_model(7, cache=cache)
+    assert new_model is not model
+    assert new_model.exposed.number == 5
+    assert new_model.concentration_model is model.concentration_model
+
+    # A rebuilt sub-model reuses the samples of its unchanged distributions.
+    baseline_mc_exposure_model.concentration_model.room = cara.monte_carlo.Room(
+        volume=baseline_mc_exposure_model.concentration_model.room.volume, humidity=0.3,
+    )
+    new_model = baseline_mc_exposure_model.build_model(7, cache=cache)
+    assert new_model.concentration_model is not model.concentration_model
+    assert new_model.concentration_model.room.volume is model.concentration_model.room.volume
+
+    # A new sample size needs a new build.
+    assert baseline_mc_exposure_model.build_model(8, cache=cache).exposure().shape == (8, )
+
+
+def test_build_cache_independent_occurrences():
+    dist = cara.monte_carlo.sampleable.Normal(1., 0.1)
+    model = cara.monte_carlo.Activity(dist, dist).build_model(7, cache=build_cache.BuildCache())
+    assert not np.array_equal(model.inhalation_rate, model.exhalation_rate)
+
+
+def test_build_plan(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    plan = baseline_mc_exposure_model.compile()
+    # The plan builds the same model as a recursive build of the tree.
+    np.random.seed(1)
+    model = cara.monte_carlo.MCModelBase._to_vectorized_form(
+        baseline_mc_exposure_model, 7, cara.monte_carlo.models._generate_samples,
+    )
+    np.random.seed(1)
+    plan_model = plan.build(7)
+    assert isinstance(plan_model, cara.models.ExposureModel)
+    np.testing.assert_array_equal(
+        plan_model.concentration_model.room.volume, model.concentration_model.room.volume,
+    )
+    np.testing.assert_array_equal(plan_model.exposure(), model.exposure())
+
+    # Sub-models without any distribution are only built once.
+    assert plan.build(7).exposed is plan_model.exposed
+
+    # As does build_model.
+    np.random.seed(1)
+    np.testing.assert_array_equal(baseline_mc_exposure_model.build_model(7).exposure(), model.exposure())
+
+
+def test_build_plan_multiple_ventilation():
+    window = cara.monte_carlo.SlidingWindow(
+        active=cara.models.PeriodicInterval(period=120, duration=120),
+        inside_temp=cara.models.PiecewiseConstant((0., 24.), (293,)),
+        outside_temp=cara.models.PiecewiseConstant((0., 24.), (283,)),
+        window_height=cara.monte_carlo.sampleable.Uniform(1., 2.), opening_length=0.6,
+    )
+    mc_model = cara.monte_carlo.MultipleVentilation((window, window))
+    model = mc_model.compile().build(7)
+    assert isinstance(model, cara.models.MultipleVentilation)
+    assert len(model.ventilations) == 2
+    assert model.air_exchange(cara.models.Room(75), 1.).shape == (7, )
+    assert not np.array_equal(
+        model.ventilations[0].window_height, model.ventilations[1].window_height,
+    )
+
+
+def test_sampled_population_number(baseline_mc_exposure_model: cara.monte_carlo.ExposureModel):
+    infected = baseline_mc_exposure_model.concentration_model.infected
+    baseline_mc_exposure_model.concentration_model.room = cara.monte_carlo.Room(volume=75)
+    baseline_mc_exposure_model.concentration_model.infected = cara.monte_carlo.InfectedPopulation(
+        number=cara.monte_carlo.sampleable.Binomial(10, 0.2),
+        virus=infected.virus,
+        presence=infected.presence,
+        mask=infected.mask,
+        activity=infected.activity,
+        expiration=infected.expiration,
+    )
+    baseline_mc_exposure_model.exposed = cara.monte_carlo.Population(
+        number=cara.monte_carlo.sampleable.Poisson(10),
+        presence=infected.presence,
+        mask=infected.mask,
+        activity=infected.activity,
+    )
+    model = baseline_mc_exposure_model.build_model(7)
+    number = model.concentration_model.infected.number
+    assert number.shape == (7, )
+
+    emission_rate = model.concentration_model.infected.emission_rate_when_present()
+    assert emission_rate.shape == (7, )
+    np.testing.assert_array_equal(emission_rate == 0, number == 0)
+    assert model.expected_new_cases().shape == (7, )
+    assert model.reproduction_number().shape == (7, )
@@ -0,0 +1,84 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+import cara.models
+import cara.monte_carlo as mc
+from cara.monte_carlo import sensitivity
+from cara.monte_carlo.sampleable import Normal, Uniform
+
+
+def test_model_inputs():
+    room = mc.Room(volume=Normal(75, 5), humidity=Uniform(0.3, 0.6))
+    assert [name for name, _ in sensitivity.model_inputs(room)] == ['volume', 'humidity']
+
+
+def test_sobol_indices__additive():
+    np.random.seed(2000)
+    # For an additive model, the first-order and total indices are the
+    # fractions of the variance due to each input: here 0.8 and 0.2.
+    room = mc.Room(volume=Normal(0, 2), humidity=Normal(0, 1))
+    indices = sensitivity.sobol_indices(
+        room, 20000, output=lambda model: model.volume + model.humidity,
+        rng=np.random.default_rng(2000),
+    )
+    assert indices.names == ('volume', 'humidity')
+    npt.assert_allclose(indices.first_order, [0.8, 0.2], atol=0.05)
+    npt.assert_allclose(indices.total, [0.8, 0.2], atol=0.05)
+    assert indices.first_order_interval.shape == (2, 2)
+    assert np.all(indices.total_interval[:, 0] <= indices.total)
+    assert np.all(indices.total <= indices.total_interval[:, 1])
+
+
+def test_sobol_indices__interaction():
+    np.random.seed(2000)
+    # With a product, all of the variance is due to the interaction.
+    room = mc.Room(volume=Normal(0, 1), humidity=Normal(0, 1))
+    indices = sensitivity.sobol_indices(
+        room, 20000, output=lambda model: model.volume * model.humidity,
+        rng=np.random.default_rng(2000),
+    )
+    npt.assert_allclose(indices.first_order, [0, 0], atol=0.05)
+    npt.assert_allclose(indices.total, [1, 1], atol=0.1)
+
+
+def test_sobol_indices__exposure_model():
+    mc_model = mc.ExposureModel(
+        concentration_model=mc.ConcentrationModel(
+            room=mc.Room(volume=Uniform(50, 100)),
+            ventilation=cara.models.AirChange(
+                active=cara.models.PeriodicInterval(period=120, duration=120),
+                air_exch=0.25,
+            ),
+            infected=mc.InfectedPopulation(
+                number=1,
+                virus=mc.SARSCoV2(
+                    viral_load_in_sputum=Uniform(1e8, 1e9),
+                    infectious_dose=50.,
+                ),
+                presence=cara.models.SpecificInterval(((0., 4.), (5., 8.))),
+                mask=cara.models.Mask.types['No mask'],
+                activity=cara.models.Activity.types['Light activity'],
+                expiration=cara.models.Expiration.types['Breathing'],
+            ),
+        ),
+        exposed=cara.models.Population(
+            number=10,
+            presence=cara.models.SpecificInterval(((0., 4.), (5., 8.))),
+            mask=cara.models.Mask.types['No mask'],
+            activity=cara.models.Activity.types['Light activity'],
+        ),
+    )
+    indices = sensitivity.sobol_indices(mc_model, 5000, n_bootstrap=50)
+    assert indices.names == (
+        'concentration_model.room.volume',
+        'concentration_model.infected.virus.viral_load_in_sputum',
+    )
+    # The viral load varies much more (relatively) than the volume.
+    assert indices.total[1] > indices.total[0]
+    assert set(indices.to_dict()) == set(indices.names)
+
+
+def test_sobol_indices__no_distribution():
+    with pytest.raises(ValueError, match="doesn't contain any distribution"):
+        sensitivity.sobol_indices(mc.Room(volume=75), 100)
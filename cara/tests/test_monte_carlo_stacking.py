@@ -0,0 +1,103 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+import cara.models
+import cara.monte_carlo as mc
+from cara.monte_carlo import stacking
+from cara.monte_carlo.sampleable import Normal
+
+
+def test_build_stacked_model():
+    volume = Normal(75, 5)
+    rooms = [mc.Room(volume=volume, humidity=humidity) for humidity in [0.3, 0.5, 0.7]]
+    model = stacking.build_stacked_model(rooms, 4)
+    assert isinstance(model, cara.models.Room)
+    npt.assert_array_equal(model.humidity, np.repeat([0.3, 0.5, 0.7], 4))
+
+    # The distribution is sampled once, and shared by all of the models.
+    volumes = stacking.unstack(model.volume, 3)
+    npt.assert_array_equal(volumes[0], volumes[1])
+    npt.assert_array_equal(volumes[0], volumes[2])
+
+
+def test_build_stacked_model__nested():
+    air_exch_dist = Normal(0.25, 0.01)
+    ventilations = [
+        mc.MultipleVentilation((
+            cara.models.AirChange(cara.models.PeriodicInterval(120, 120), air_exch),
+            mc.AirChange(cara.models.PeriodicInterval(120, 120), air_exch_dist),
+        ))
+        for air_exch in [1., 2.]
+    ]
+    model = stacking.build_stacked_model(ventilations, 5)
+    air_exchange = stacking.unstack(model.air_exchange(cara.models.Room(75), 1.), 2)
+    npt.assert_allclose(air_exchange[1] - air_exchange[0], 1.)
+
+
+def test_build_stacked_model__mixed():
+    # A value, a distribution and a plain model can be stacked with a Monte
+    # Carlo model.
+    dist = Normal(75, 5)
+    rooms = [mc.Room(dist), mc.Room(50.), cara.models.Room(60.), mc.Room(Normal(75, 5)), mc.Room(dist)]
+    volumes = stacking.unstack(stacking.build_stacked_model(rooms, 4).volume, 5)
+    npt.assert_array_equal(volumes[1:3], [[50.] * 4, [60.] * 4])
+    npt.assert_array_equal(volumes[0], volumes[4])
+    assert not np.array_equal(volumes[0], volumes[3])
+
+
+def test_build_stacked_model__different_ventilations():
+    # The ventilations missing from some of the multiple ventilations don't
+    # exchange any air for them.
+    always = cara.models.PeriodicInterval(120, 120)
+    hepa = mc.HEPAFilter(always, Normal(300, 10))
+    ventilations = [
+        mc.MultipleVentilation((cara.models.AirChange(always, 1.), hepa)),
+        mc.MultipleVentilation((cara.models.AirChange(always, 2.),)),
+        mc.MultipleVentilation((hepa, cara.models.AirChange(always, 0.25), cara.models.AirChange(always, 1.))),
+    ]
+    assert stacking.stackable_groups(ventilations) == [[0, 1, 2]]
+    model = stacking.build_stacked_model(ventilations, 5)
+    room = cara.models.Room(75)
+    air_exchange = stacking.unstack(model.air_exchange(room, 1.), 3)
+    hepa_air_exchange = stacking.unstack(model.ventilations[1].ventilation.air_exchange(room, 1.), 3)
+    npt.assert_allclose(air_exchange[0], 1. + hepa_air_exchange[0])
+    npt.assert_allclose(air_exchange[1], 2.)
+    npt.assert_allclose(air_exchange[2], 1.25 + hepa_air_exchange[0])
+
+
+def test_build_stacked_model__incompatible():
+    always = cara.models.PeriodicInterval(120, 120)
+    with pytest.raises(ValueError, match='different types for ventilation'):
+        stacking.build_stacked_model([
+            mc.ConcentrationModel(cara.models.Room(75), cara.models.AirChange(always, 1.), None),
+            mc.ConcentrationModel(cara.models.Room(75), cara.models.HEPAFilter(always, 1.), None),
+        ], 4)
+
+    intervals = [cara.models.SpecificInterval(((0., 1.),)), cara.models.SpecificInterval(((0., 2.),))]
+    with pytest.raises(ValueError, match='non-vectorised parameter active.present_times.0.1'):
+        stacking.build_stacked_model([cara.models.AirChange(active, 1.) for active in intervals], 4)
+
+
+def test_common_random_numbers():
+    dist = Normal(0, 1)
+    sample = stacking.CommonRandomNumbers()
+    first = mc.Activity(dist, dist)._build_model(5, sample)
+    sample.new_build()
+    second = mc.Activity(dist, dist)._build_model(5, sample)
+    assert not np.array_equal(first.inhalation_rate, first.exhalation_rate)
+    npt.assert_array_equal(first.inhalation_rate, second.inhalation_rate)
+    npt.assert_array_equal(first.exhalation_rate, second.exhalation_rate)
+
+
+def test_stackable_groups():
+    dist = Normal(75, 1)
+    ventilations = [
+        cara.models.AirChange(cara.models.PeriodicInterval(120, 120), 1.),
+        mc.HEPAFilter(cara.models.PeriodicInterval(120, 120), dist),
+        mc.AirChange(cara.models.PeriodicInterval(120, 120), dist),
+        cara.models.AirChange(cara.models.PeriodicInterval(120, 60), 1.),
+    ]
+    # The air exchange is vectorised, so it may differ between stacked
+    # ventilations (even as a distribution), but the intervals may not.
+    assert stacking.stackable_groups(ventilations) == [[0, 2], [1], [3]]
@@ -0,0 +1,262 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+from cara.monte_carlo import statistics
+
+
+def test_weighted_mean():
+    values = np.array([1., 2., 3., 4.])
+    assert statistics.weighted_mean(values) == 2.5
+    assert statistics.weighted_mean(values, np.array([1., 1., 1., 5.])) == 3.25
+    # Scalar values are broadcast against the weights.
+    assert statistics.weighted_mean(0., np.array([1., 2.])) == 0.
+
+
+@pytest.mark.parametrize("quantile", [0.05, 0.5, 0.95])
+def test_weighted_quantile__unit_weights(quantile):
+    values = np.random.normal(size=100000)
+    npt.assert_allclose(
+        statistics.weighted_quantile(values, quantile, np.ones(values.size)),
+        np.quantile(values, quantile),
+        atol=1e-3,
+    )
+
+
+def test_weighted_quantile__heavy_sample():
+    values = np.array([3., 1., 2.])
+    weights = np.array([1., 1., 8.])
+    npt.assert_allclose(statistics.weighted_quantile(values, 0.5, weights), 2.)
+    npt.assert_allclose(statistics.weighted_quantile(values, [0., 1.], weights), [1., 3.])
+
+
+def test_exceedance_probability():
+    values = np.array([1., 2., 3., 4.])
+    assert statistics.exceedance_probability(values, 2.5) == 0.5
+    assert statistics.exceedance_probability(values, 2.5, np.array([3., 3., 1., 1.])) == 0.25
+
+
+def test_mean_estimate():
+    values = np.random.normal(size=10000)
+    estimate = statistics.mean_estimate(values)
+    assert estimate.effective_sample_size == 10000
+    npt.assert_allclose(estimate.standard_error, 0.01, rtol=0.05)
+
+    weighted = statistics.mean_estimate(values, np.ones(10000))
+    npt.assert_allclose(weighted.effective_sample_size, 10000)
+    npt.assert_allclose(weighted.mean, estimate.mean)
+
+
+def test_effective_sample_size():
+    assert statistics.effective_sample_size(np.ones(10)) == 10
+    assert statistics.effective_sample_size(np.array([1., 0., 0., 0.])) == 1
+
+
+def test_antithetic_mean():
+    # A linear function of antithetic normal samples has no variance
+    # once averaged in pairs.
+    half = np.random.normal(size=1000)
+    values = np.concatenate([half, -half]) * 2 + 1
+    estimate = statistics.antithetic_mean(values)
+    npt.assert_allclose(estimate.mean, 1)
+    assert estimate.standard_error < 1e-12
+    assert estimate.effective_sample_size > 1e6
+
+
+def test_control_variate_mean():
+    control = np.random.uniform(0, 1, size=10000)
+    values = 3 * control + np.random.normal(scale=0.1, size=10000)
+    plain = statistics.mean_estimate(values)
+    estimate = statistics.control_variate_mean(values, control, control_mean=0.5)
+    npt.assert_allclose(estimate.mean, 1.5, atol=0.005)
+    assert estimate.standard_error < plain.standard_error / 5
+    assert estimate.effective_sample_size > 25 * 10000
+
+
+def test_control_variate_mean__estimated_control_mean():
+    # A control which is the quantity itself: the precision is that of the
+    # estimated control mean.
+    control = np.random.uniform(0, 1, size=10000)
+    estimate = statistics.control_variate_mean(
+        control, control, control_mean=0.5, control_mean_standard_error=0.01,
+    )
+    npt.assert_allclose(estimate.mean, 0.5)
+    npt.assert_allclose(estimate.standard_error, 0.01)
+
+
+def test_log_histogram():
+    values = np.random.default_rng(2000).lognormal(0, 2, 100000)
+    histogram = statistics.LogHistogram.from_values(values)
+    assert histogram.counts.sum() == values.size
+    npt.assert_allclose(histogram.exceedance_probability(10), np.mean(values > 10), atol=0.005)
+
+    # Merging the histograms of parts gives the histogram of the whole.
+    merged = statistics.LogHistogram.from_values(values[:1000]).merge(
+        statistics.LogHistogram.from_values(values[1000:]))
+    npt.assert_array_equal(merged.counts, histogram.counts)
+    restored = statistics.LogHistogram.from_dict(histogram.to_dict())
+    npt.assert_array_equal(restored.counts, histogram.counts)
+
+    with pytest.raises(ValueError, match='same bins'):
+        histogram.merge(statistics.LogHistogram(n_bins=10))
+
+
+def test_log_histogram__outside_the_bins():
+    histogram = statistics.LogHistogram.from_values(
+        np.array([0., 1e-3, 1., 200., 500.]), low=1e-2, high=100., n_bins=4,
+    )
+    # The samples of the overflow bin are above the last edge...
+    assert histogram.exceedance_probability(100.) == 0.4
+    # ... and may be above any threshold in it.
+    assert histogram.exceedance_probability(300.) == 0.4
+    # Likewise, below the first edge, all of the samples are counted.
+    assert histogram.exceedance_probability(1e-4) == 1.
+    assert histogram.exceedance_probability(-1.) == 1.
+    # Within the bins, the bin containing the threshold is interpolated.
+    npt.assert_allclose(histogram.exceedance_probability(10 ** 0.5), 0.4 + 0.2 * 0.5)
+
+
+def test_quantile_sketch():
+    values = np.random.default_rng(2000).lognormal(0, 2, 100000)
+    quantiles = [0.01, 0.05, 0.5, 0.95, 0.99]
+    sketch = statistics.QuantileSketch.from_values(values)
+    assert sketch.means.size <= sketch.compression
+    npt.assert_allclose(sketch.quantile(quantiles), np.quantile(values, quantiles), rtol=0.02)
+    npt.assert_allclose(sketch.exceedance_probability(10), np.mean(values > 10), atol=0.002)
+
+    merged = statistics.QuantileSketch.from_values(values[:30000]).merge(
+        statistics.QuantileSketch.from_values(values[30000:]))
+    npt.assert_allclose(merged.quantile(quantiles), np.quantile(values, quantiles), rtol=0.02)
+    restored = statistics.QuantileSketch.from_dict(sketch.to_dict())
+    npt.assert_array_equal(restored.quantile(quantiles), sketch.quantile(quantiles))
+
+
+def test_quantile_sketch__weighted():
+    values = np.array([1., 2., 3., 4.] * 1000)
+    weights = np.array([1., 1., 1., 5.] * 1000)
+    sketch = statistics.QuantileSketch.from_values(values, weights)
+    npt.assert_allclose(sketch.exceedance_probability(3.5), 5 / 8, atol=0.01)
+    npt.assert_allclose(
+        sketch.quantile(0.5), statistics.weighted_quantile(values, 0.5, weights), rtol=0.05,
+    )
+
+
+def test_distribution_summary():
+    values = np.random.default_rng(2000).uniform(0, 10, 100000)
+    summary = statistics.distribution_summary(values, thresholds=[5.])
+    npt.assert_allclose(
+        [summary['percentiles'][5], summary['percentiles'][50], summary['percentiles'][95]],
+        [0.5, 5., 9.5], rtol=0.02,
+    )
+    npt.assert_allclose(summary['exceedance'][5.], 0.5, atol=0.01)
+    assert sum(summary['histogram']['counts']) + summary['histogram']['underflow'] == values.size
+
+
+@pytest.mark.parametrize(
+    "interval_function", [
+        statistics.batch_means_interval,
+        statistics.jackknife_interval,
+        lambda values, weights=None: statistics.bootstrap_intervals(
+            {'values': values}, weights, rng=np.random.default_rng(2000))['values'],
+    ],
+)
+def test_mean_intervals(interval_function):
+    rng = np.random.default_rng(2000)
+    values = rng.lognormal(0, 1, 50000)
+    standard_error = np.std(values) / np.sqrt(values.size)
+    interval = interval_function(values)
+    assert interval.lower < interval.estimate < interval.upper
+    assert interval.estimate == pytest.approx(np.mean(values))
+    npt.assert_allclose(interval.upper - interval.lower, 2 * 1.96 * standard_error, rtol=0.3)
+
+    weights = rng.uniform(0.5, 1.5, values.size)
+    interval = interval_function(values, weights)
+    assert interval.estimate == pytest.approx(np.average(values, weights=weights))
+    assert interval.lower < interval.estimate < interval.upper
+
+
+def test_bootstrap_intervals__time_budget():
+    values = np.random.default_rng(2000).uniform(0, 1, 1000)
+    intervals = statistics.bootstrap_intervals(
+        {'a': values, 'b': 2 * values, 'c': 1.}, time_budget=0.,
+    )
+    # Without any time, the batch-means intervals are used.
+    assert intervals['a'].method == 'batch-means'
+    assert intervals['b'].estimate == pytest.approx(2 * intervals['a'].estimate)
+    assert intervals['c'].lower == intervals['c'].upper == 1.
+
+
+def test_difference_interval():
+    rng = np.random.default_rng(2000)
+    a = statistics.batch_means(rng.normal(1., 1., 30000))
+    b = statistics.batch_means(rng.normal(1.1, 1., 30000))
+    interval = statistics.difference_interval(a, b)
+    assert interval.lower < -0.1 < interval.upper
+    assert interval.upper < 0
+
+    # With common random numbers, the paired batches resolve a difference
+    # much smaller than the spread of either model.
+    values = rng.normal(1., 1., 30000)
+    interval = statistics.difference_interval(
+        statistics.batch_means(values), statistics.batch_means(values + 0.01 + rng.normal(0., 0.01, 30000)),
+    )
+    assert interval.lower < -0.01 < interval.upper
+    assert interval.upper - interval.lower < 0.001
+
+    with pytest.raises(ValueError, match='same number'):
+        statistics.difference_interval(np.ones(30), np.ones(20))
+
+
+def test_percentile_bands():
+    rng = np.random.default_rng(2000)
+    curves = rng.uniform(0, 1, (5, 1000)).cumsum(axis=0)
+    bands = statistics.percentile_bands(curves, (5, 95))
+    # The estimates are in the same (default) bins, 2.3% wide, as the
+    # percentiles of the samples.
+    for percentile in (5, 95):
+        exact = np.percentile(curves, percentile, axis=1, method='inverted_cdf')
+        npt.assert_allclose(bands[percentile], exact, rtol=10 ** (6 / 600) - 1)
+
+    # The rows can be generated lazily, and weighted.
+    weights = rng.uniform(0, 2, 1000)
+    bands = statistics.percentile_bands((row for row in curves), (50,), weights, n_bins=60)
+    npt.assert_allclose(
+        bands[50], [statistics.weighted_quantile(row, 0.5, weights) for row in curves], rtol=0.26,
+    )
+
+
+def test_percentile_bands__probability_curves():
+    # Probabilities of infection (in %) which start at 0 and span several
+    # orders of magnitude.
+    rng = np.random.default_rng(2000)
+    curves = np.cumsum(rng.lognormal(-3, 2, (20, 10000)), axis=0)
+    curves[0] = 0.
+    bands = statistics.percentile_bands(curves, (5, 50, 95))
+    for percentile, band in bands.items():
+        exact = np.percentile(curves, percentile, axis=1, method='inverted_cdf')
+        assert band[0] == 0.
+        npt.assert_allclose(band[1:], exact[1:], rtol=10 ** (6 / 600) - 1)
+
+
+def test_log_histogram__quantile():
+    rng = np.random.default_rng(2000)
+    values = np.concatenate([np.zeros(500), rng.lognormal(0, 3, 9500)])
+    histogram = statistics.LogHistogram.from_values(values, low=1e-2, high=100., n_bins=40)
+    quantiles = np.array([0.01, 0.1, 0.5, 0.9, 0.99])
+    estimates = histogram.quantile(quantiles)
+    exact = np.quantile(values, quantiles, method='inverted_cdf')
+    # Below the first edge, within the bins, and above the last edge (up
+    # to the largest sample).
+    assert 0 <= estimates[0] <= 1e-2
+    npt.assert_allclose(estimates[1:4], exact[1:4], rtol=10 ** (4 / 40) - 1)
+    assert 100 <= estimates[4] <= values.max()
+    assert histogram.quantile(0) == 0 and histogram.quantile(1) == values.max()
+
+    # The extreme samples are kept by the merges and the dictionaries.
+    merged = statistics.LogHistogram.from_values(values[:5000], low=1e-2, high=100., n_bins=40).merge(
+        statistics.LogHistogram.from_values(values[5000:], low=1e-2, high=100., n_bins=40))
+    npt.assert_array_equal(merged.quantile(quantiles), estimates)
+    restored = statistics.LogHistogram.from_dict(histogram.to_dict())
+    npt.assert_array_equal(restored.quantile(quantiles), estimates)
+    with pytest.raises(ValueError, match='empty'):
+        statistics.LogHistogram().quantile(0.5)
@@ -0,0 +1,72 @@
+import pickle
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+import cara.monte_carlo as mc
+from cara.monte_carlo.data import activity_distributions
+from cara.monte_carlo.sample_bank import SampleBank
+from cara.monte_carlo.sampleable import Normal
+
+
+@pytest.fixture
+def bank(tmp_path):
+    return SampleBank(tmp_path, bank_size=1000, include_standard_distributions=False)
+
+
+def test_bank_is_memory_mapped(bank, tmp_path):
+    dist = Normal(1., 0.1)
+    bank.register('normal', dist)
+    model = bank.build_model(mc.Activity(dist, dist), 100)
+
+    assert isinstance(model.inhalation_rate, np.memmap)
+    assert not model.inhalation_rate.flags.writeable
+    # Each occurrence of the distribution gets a different slice.
+    assert not np.array_equal(model.inhalation_rate, model.exhalation_rate)
+    assert len(list(tmp_path.glob('normal-*.npy'))) == 1
+
+
+def test_bank_is_deterministic(bank, tmp_path):
+    dist = Normal(1., 0.1)
+    bank.register('normal', dist)
+    model = bank.build_model(mc.Activity(dist, 0.5), 100)
+
+    # A new bank with the same directory re-uses the stored samples, and a
+    # new bank elsewhere regenerates exactly the same ones.
+    for directory in [tmp_path, tmp_path / 'other']:
+        other_bank = SampleBank(directory, bank_size=1000, include_standard_distributions=False)
+        other_bank.register('normal', dist)
+        other_model = other_bank.build_model(mc.Activity(dist, 0.5), 100)
+        npt.assert_array_equal(model.inhalation_rate, other_model.inhalation_rate)
+    npt.assert_allclose(np.mean(bank.bank('normal')), 1., atol=0.02)
+
+
+def test_bank_fallback(bank):
+    dist = Normal(1., 0.1)
+    unregistered = Normal(1., 0.1)
+    bank.register('normal', dist)
+
+    # Not enough samples in the bank, or not registered at all.
+    model = bank.build_model(mc.Activity(dist, unregistered), 2000)
+    assert not isinstance(model.inhalation_rate, np.memmap)
+    assert not isinstance(model.exhalation_rate, np.memmap)
+    assert model.inhalation_rate.shape == model.exhalation_rate.shape == (2000,)
+
+
+def test_standard_distributions(tmp_path):
+    bank = SampleBank(tmp_path, bank_size=1000)
+    model = bank.build_model(activity_distributions['Seated'], 100)
+    assert isinstance(model.inhalation_rate, np.memmap)
+    assert isinstance(model.exhalation_rate, np.memmap)
+    assert 'activity_distributions.Seated.inhalation_rate' in bank.distributions()
+
+
+def test_generate_in_background(bank, tmp_path):
+    bank.register('normal', Normal(1., 0.1))
+    bank.generate_in_background().join(timeout=60)
+    assert len(list(tmp_path.glob('normal-*.npy'))) == 1
+
+    # The bank can be sent to a worker while (or after) it is generated.
+    other_bank = pickle.loads(pickle.dumps(bank))
+    npt.assert_array_equal(other_bank.bank('normal'), bank.bank('normal'))
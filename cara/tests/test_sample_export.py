@@ -0,0 +1,74 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+
+import cara.models
+import cara.monte_carlo as mc
+from cara import dataclass_utils
+from cara.monte_carlo import sample_export
+from cara.monte_carlo.sampleable import Normal
+
+pyarrow = pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def scenarios():
+    infected = cara.models.InfectedPopulation(
+        number=1,
+        virus=cara.models.Virus.types['SARS_CoV_2'],
+        presence=cara.models.SpecificInterval(((0., 4.), (5., 8.))),
+        mask=cara.models.Mask.types['No mask'],
+        activity=cara.models.Activity.types['Light activity'],
+        expiration=cara.models.Expiration.types['Breathing'],
+    )
+    model = mc.ExposureModel(
+        mc.ConcentrationModel(
+            room=mc.Room(volume=Normal(75, 20)),
+            ventilation=cara.models.AirChange(cara.models.PeriodicInterval(120, 120), 1.),
+            infected=infected,
+        ),
+        exposed=cara.models.Population(
+            number=10, presence=infected.presence, activity=infected.activity, mask=infected.mask,
+        ),
+    ).build_model(100)
+    with_masks = dataclass_utils.nested_replace(model, {'exposed.mask': cara.models.Mask.types['FFP2']})
+    return {'Base scenario': model, 'FFP2 masks': with_masks}
+
+
+def test_sample_table(scenarios):
+    table = sample_export.sample_table(scenarios)
+    assert table.num_rows == 200
+    assert table.column_names == ['scenario'] + list(sample_export.SAMPLE_COLUMNS)
+    assert table.column('scenario').to_pylist() == ['Base scenario'] * 100 + ['FFP2 masks'] * 100
+
+    base = scenarios['Base scenario']
+    npt.assert_array_equal(
+        table.column('infection_probability').chunk(0).to_numpy(), base.infection_probability(),
+    )
+    # The values which aren't sampled are repeated.
+    npt.assert_array_equal(table.column('mask_efficiency').chunk(1).to_numpy(), 0.865)
+
+
+def test_float_column__zero_copy():
+    samples = np.linspace(0, 1, 10)
+    column = sample_export._float_column(samples, 10)
+    assert np.shares_memory(column.to_numpy(zero_copy_only=True), samples)
+
+
+@pytest.mark.parametrize('suffix', ['.arrow', '.parquet'])
+@pytest.mark.parametrize('memory_map', [True, False])
+def test_write_read_samples(scenarios, tmp_path, suffix, memory_map):
+    path = tmp_path / f'samples{suffix}'
+    sample_export.write_samples(path, scenarios)
+    table = sample_export.read_samples(path, memory_map=memory_map)
+    assert table.equals(sample_export.sample_table(scenarios))
+
+
+def test_write_samples__unsupported(scenarios, tmp_path):
+    with pytest.raises(ValueError, match="Unsupported"):
+        sample_export.write_samples(tmp_path / 'samples.csv', scenarios)
+
+
+def test_ipc_stream(scenarios):
+    table = pyarrow.ipc.open_stream(sample_export.ipc_stream(scenarios)).read_all()
+    assert table.equals(sample_export.sample_table(scenarios))
@@ -110,3 +110,68 @@ def test_logcustomkernel():
     correct_dist = function(np.array(selected_bins))
     assert len(samples) == sample_size
     npt.assert_allclose(selected_histogram, correct_dist, rtol=0.05)
+
+
+def test_tail_biased():
+    # test that the weighted samples of a tail-biased distribution give
+    # unbiased estimates of the mean and of the tail probability, with
+    # many more samples in the tail than plain sampling.
+    sample_size = 200000
+    distribution = sampleable.LogNormal(0., 1.)
+    biased = sampleable.TailBiased(distribution, quantile=0.99, tail_fraction=0.5)
+    samples, weights = biased.generate_weighted_samples(sample_size)
+
+    threshold = np.exp(2.3263478740408408)  # The 99th percentile.
+    assert len(samples) == len(weights) == sample_size
+    npt.assert_allclose(biased.tail_threshold(), threshold, rtol=0.02)
+    npt.assert_allclose(np.mean(samples > threshold), 0.5, atol=0.01)
+    npt.assert_allclose(np.average(samples > threshold, weights=weights), 0.01, rtol=0.03)
+    npt.assert_allclose(np.average(samples, weights=weights), np.exp(0.5), rtol=0.02)
+
+    # Plain sampling is not biased.
+    npt.assert_allclose(np.mean(biased.generate_samples(sample_size) > threshold), 0.01, atol=0.002)
+
+
+def test_tail_biased__tail_mass():
+    # A distribution with an atom at its 95th percentile: only 2% of the
+    # samples are above it.
+    distribution = sampleable.EmpiricalCounts([0, 1, 2], [0.9, 0.08, 0.02])
+    biased = sampleable.TailBiased(distribution, quantile=0.95, pilot_size=100000)
+    assert biased.tail_threshold() == 1
+    npt.assert_allclose(biased.tail_mass(), 0.02, atol=5 * biased.tail_mass_standard_error())
+    assert biased.tail_mass_standard_error() < 0.001
+
+    samples, weights = biased.generate_weighted_samples(100000)
+    npt.assert_allclose(np.average(samples == 2, weights=weights), 0.02, rtol=0.05)
+
+
+def test_unbiased_weights():
+    samples, weights = sampleable.Normal(1., 0.5).generate_weighted_samples(10)
+    assert samples.shape == (10, )
+    npt.assert_array_equal(weights, np.ones(10))
+
+
+def test_poisson():
+    samples = sampleable.Poisson(3.5).generate_samples(2000000)
+    assert samples.dtype.kind == 'i'
+    npt.assert_allclose([samples.mean(), samples.var()], [3.5, 3.5], rtol=0.01)
+
+
+def test_binomial():
+    # The number of infected amongst 50 occupants, with an incidence of 2%.
+    samples = sampleable.Binomial(50, 0.02).generate_samples(2000000)
+    assert samples.dtype.kind == 'i'
+    assert samples.min() >= 0 and samples.max() <= 50
+    npt.assert_allclose([samples.mean(), samples.var()], [1., 0.98], rtol=0.01)
+
+    with pytest.raises(ValueError, match='probability'):
+        sampleable.Binomial(50, 2.)
+
+
+def test_empirical_counts():
+    samples = sampleable.EmpiricalCounts([1, 2, 5], [2., 1., 1.]).generate_samples(2000000)
+    assert set(np.unique(samples)) == {1, 2, 5}
+    npt.assert_allclose(
+        [np.mean(samples == 1), np.mean(samples == 2), np.mean(samples == 5)],
+        [0.5, 0.25, 0.25], rtol=0.01,
+    )
@@ -0,0 +1,68 @@
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+
+import numpy as np
+import pytest
+
+from cara import xlsx
+
+_NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def read_sheets(data: bytes):
+    # The names and the rows of cell values of the sheets of a workbook.
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        names = [sheet.get('name') for sheet in workbook.iterfind('.//x:sheet', _NS)]
+        sheets = {}
+        for index, name in enumerate(names, start=1):
+            sheet = ET.fromstring(archive.read(f'xl/worksheets/sheet{index}.xml'))
+            sheets[name] = [
+                {cell.get('r'): ''.join(cell.itertext()) for cell in row.iterfind('x:c', _NS)}
+                for row in sheet.iterfind('.//x:row', _NS)
+            ]
+    return sheets
+
+
+@pytest.mark.parametrize('index, name', [(0, 'A'), (25, 'Z'), (26, 'AA'), (701, 'ZZ'), (702, 'AAA')])
+def test_column_name(index, name):
+    assert xlsx.column_name(index) == name
+
+
+def test_writer():
+    data = io.BytesIO()
+    with xlsx.XLSXWriter(data) as workbook:
+        with workbook.sheet('Results') as sheet:
+            sheet.append(['Room', 'Probability'], bold=True)
+            sheet.append(['<A & B>\x01', np.float64(0.25), None, float('nan'), True])
+        with workbook.sheet('results') as sheet:
+            sheet.append([1])
+        with workbook.sheet('a/b?'):
+            pass
+    sheets = read_sheets(data.getvalue())
+    assert list(sheets) == ['Results', 'results 2', 'a b ']
+    assert sheets['Results'] == [
+        {'A1': 'Room', 'B1': 'Probability'},
+        {'A2': '<A & B>', 'B2': '0.25', 'E2': '1'},
+    ]
+    assert sheets['results 2'] == [{'A1': '1'}]
+
+
+def test_writer__streamed(monkeypatch):
+    monkeypatch.setattr(xlsx, '_ROWS_PER_WRITE', 10)
+    data = io.BytesIO()
+    with xlsx.XLSXWriter(data) as workbook, workbook.sheet('Rows') as sheet:
+        for row in range(25):
+            sheet.append([row])
+            # At most a write's worth of rows is buffered.
+            assert len(sheet._rows) < 10
+    rows = read_sheets(data.getvalue())['Rows']
+    assert [row[f'A{index + 1}'] for index, row in enumerate(rows)] == [str(row) for row in range(25)]
+
+
+def test_writer__one_sheet_at_a_time():
+    with xlsx.XLSXWriter(io.BytesIO()) as workbook, workbook.sheet('First'):
+        with pytest.raises(RuntimeError, match="still being written"):
+            with workbook.sheet('Second'):
+                pass
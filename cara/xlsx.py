@@ -0,0 +1,227 @@
+"""
+A minimal streaming writer of XLSX workbooks, without dependencies.
+
+The rows of each sheet are written (as XML, compressed) to the workbook as
+they are appended, and the strings are written inline rather than in a
+shared table, so that the memory used doesn't depend on the number of
+rows. The sheets are written one after the other::
+
+    with XLSXWriter('results.xlsx') as workbook:
+        with workbook.sheet('Results') as sheet:
+            sheet.append(['Room', 'Probability of infection (%)'], bold=True)
+            for room, probability in results:
+                sheet.append([room, probability])
+
+Cells may be strings, numbers, booleans or None (an empty cell). The
+numbers which aren't finite (which XLSX can't represent) are left empty.
+
+"""
+import contextlib
+import functools
+import math
+import numbers
+from pathlib import Path
+import re
+import typing
+from xml.sax.saxutils import escape, quoteattr
+import zipfile
+
+import numpy as np
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+_PACKAGE_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# The second cell format (s="1") is bold.
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# The characters which XML 1.0 doesn't allow.
+_ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_INVALID_SHEET_NAME_CHARACTERS = re.compile(r'[\[\]:*?/\\]')
+
+#: The number of rows of a sheet buffered before being written.
+_ROWS_PER_WRITE = 1000
+
+
+@functools.lru_cache(maxsize=None)
+def column_name(index: int) -> str:
+    """The name (e.g. "A", "AB") of the column of the given (0-based) index."""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def _cell(reference: str, value: typing.Any, style: str) -> str:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real):
+        if not math.isfinite(value):
+            return ''
+        return f'<c r="{reference}"{style}><v>{value!r}</v></c>'
+    text = escape(_ILLEGAL_CHARACTERS.sub('', str(value)))
+    return f'<c r="{reference}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class Sheet:
+    def __init__(self, stream: typing.IO[bytes]):
+        self._stream = stream
+        self._rows: typing.List[str] = []
+        #: The number of rows appended so far.
+        self.n_rows = 0
+
+    def append(self, values: typing.Iterable[typing.Any], bold: bool = False) -> None:
+        """Append a row of the given cell values."""
+        self.n_rows += 1
+        style = ' s="1"' if bold else ''
+        cells = ''.join(
+            _cell(f'{column_name(column)}{self.n_rows}', value, style)
+            for column, value in enumerate(values)
+        )
+        self._rows.append(f'<row r="{self.n_rows}">{cells}</row>')
+        if len(self._rows) >= _ROWS_PER_WRITE:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._stream.write(''.join(self._rows).encode('utf-8'))
+        self._rows.clear()
+
+
+class XLSXWriter:
+    def __init__(self, file: typing.Union[str, Path, typing.IO[bytes]]):
+        """Write a workbook to the given path or (binary) file object."""
+        self._zip = zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._sheet_names: typing.List[str] = []
+        self._writing_sheet = False
+        self._closed = False
+
+    def __enter__(self) -> "XLSXWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _sheet_name(self, name: str) -> str:
+        # A valid (and unique) name for a sheet.
+        name = _INVALID_SHEET_NAME_CHARACTERS.sub(' ', name)[:31] or 'Sheet'
+        unique_name, suffix = name, 1
+        while unique_name.lower() in (existing.lower() for existing in self._sheet_names):
+            suffix += 1
+            unique_name = f'{name[:31 - len(str(suffix)) - 1]} {suffix}'
+        return unique_name
+
+    @contextlib.contextmanager
+    def sheet(self, name: str) -> typing.Iterator[Sheet]:
+        """
+        Add a sheet, whose rows are appended within the context. The sheets
+        are written one at a time.
+
+        """
+        if self._writing_sheet:
+            raise RuntimeError("The previous sheet is still being written")
+        self._sheet_names.append(self._sheet_name(name))
+        index = len(self._sheet_names)
+        self._writing_sheet = True
+        try:
+            with self._zip.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as stream:
+                stream.write(_SHEET_START.encode('utf-8'))
+                sheet = Sheet(stream)
+                yield sheet
+                sheet._flush()
+                stream.write(_SHEET_END.encode('utf-8'))
+        finally:
+            self._writing_sheet = False
+
+    def close(self) -> None:
+        """Write the parts describing the sheets, and close the workbook."""
+        if self._closed:
+            return
+        if not self._sheet_names:
+            # A workbook must have a sheet.
+            with self.sheet('Sheet'):
+                pass
+        indices = range(1, len(self._sheet_names) + 1)
+        self._zip.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(index=index) for index in indices),
+        ))
+        self._zip.writestr('_rels/.rels', _PACKAGE_RELATIONSHIPS)
+        self._zip.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name={quoteattr(name)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, name in zip(indices, self._sheet_names)
+        )))
+        self._zip.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELATIONSHIPS.format(sheets=''.join(
+            f'<Relationship Id="rId{index}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{index}.xml"/>'
+            for index in indices
+        )))
+        self._zip.writestr('xl/styles.xml', _STYLES)
+        self._zip.close()
+        self._closed = True
@@ -36,7 +36,14 @@ REQUIREMENTS: dict = {
         'tornado',
         'voila >=0.2.4',
     ],
-    'app': [],
+    'app': [
+        'msgpack',
+        'pyarrow',
+    ],
+    # The export of the per-sample values (cara.monte_carlo.sample_export).
+    'samples': [
+        'pyarrow',
+    ],
     'test': [
         'pytest',
         'pytest-mypy',